@@ -4,16 +4,24 @@ Flask REST API for pet breed and species identification
 """
 import os
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
+from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
+import io
+import json
 import time
 
 from config.settings import config
 from modules.petshop.breed_identifier import PetshopBreedIdentifier
 from modules.adoption.species_identifier import AdoptionSpeciesIdentifier
-from utils.image_processor import ImageProcessor
-from utils.cloudinary_uploader import CloudinaryUploader
+from utils.image_processor import ImageProcessor, allowed_file
+from utils.cloudinary_uploader import CloudinaryUploader, LocalUploader
+from utils.upload_queue import get_upload_queue, UploadQueueFull
+from utils import service_lifecycle
+from utils.result_cache import get_result_cache_stats
+from utils.embedding_index import get_embedding_index
+from utils.metrics import registry as metrics_registry, REQUEST_SECONDS
 from routes.recommendation_routes import recommendation_bp
 from routes.inventory_routes import inventory_bp
 
@@ -27,6 +35,7 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(config['development'])
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_REQUEST_MB'] * 1024 * 1024
 
 # Configure CORS for Node.js backend and frontend
 # Get allowed origins from environment or use defaults
@@ -45,7 +54,10 @@ CORS(app, origins=cors_origins, supports_credentials=True)
 petshop_identifier = PetshopBreedIdentifier()
 adoption_identifier = AdoptionSpeciesIdentifier()
 image_processor = ImageProcessor()
-cloudinary_uploader = CloudinaryUploader()
+if app.config['IMAGE_UPLOADER'] == 'local':
+    cloudinary_uploader = LocalUploader(os.path.join(app.config['UPLOAD_DIR'], 'local-uploads'))
+else:
+    cloudinary_uploader = CloudinaryUploader()
 
 # Check if we should save images to disk (default: false)
 SAVE_TO_DISK = app.config.get('SAVE_IMAGES_TO_DISK', False)
@@ -58,10 +70,125 @@ if SAVE_TO_DISK:
 else:
     logger.info("💾 Processing images in memory only (not saving to disk)")
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+def predecode_for_storage(upload):
+    """
+    Decode an upload at storage size before identifying it
+    
+    Identification then resizes the same pixels, so an image that is both
+    identified and stored is decoded once.
+    """
+    if not app.config['INGEST_ENABLED']:
+        return
+    try:
+        upload.decode_full(app.config['MAX_IMAGE_SIZE'])
+    except ValueError:
+        pass  # Reported by identification
+
+def prepare_stored_image(upload, filename):
+    """
+    Copy of an upload to store or upload: downscaled, EXIF stripped, re-encoded
+    
+    Args:
+        upload: UploadedImage
+        filename: Original filename
+        
+    Returns:
+        Tuple of (image bytes, filename with the stored format's extension);
+        the original upload if INGEST_ENABLED is off or re-encoding fails
+    """
+    if not app.config['INGEST_ENABLED']:
+        return upload.data, filename
+    try:
+        stored = image_processor.ingest(upload)
+    except ValueError as e:
+        logger.warning(f"⚠️ Storing original upload, ingest failed: {str(e)}")
+        return upload.data, filename
+    
+    base = os.path.splitext(filename or '')[0] or 'image'
+    logger.info(
+        f"🗜️ Ingested {filename}: {stored['original_bytes']} -> {len(stored['data'])} bytes "
+        f"({stored['width']}x{stored['height']} {stored['format']})"
+    )
+    return stored['data'], f"{base}.{stored['extension']}"
+
+def save_image_to_disk(image_bytes, filename, digest):
+    """
+    Write a stored image to UPLOAD_FOLDER, named by the upload's content hash
+    
+    Returns:
+        Saved file name (the same image uploaded twice is written once)
+    """
+    extension = os.path.splitext(filename or '')[1].lower() or '.jpg'
+    name = f"{digest[:32]}{extension}"
+    path = os.path.join(UPLOAD_FOLDER, name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(image_bytes)
+        os.replace(tmp_path, path)
+    return name
+
+def store_upload(upload, filename, top_prediction=None, upload_to_cloudinary=False):
+    """
+    Run the ingest pipeline once, then save to disk and/or queue the upload
+    
+    Args:
+        upload: UploadedImage
+        filename: Original filename
+        top_prediction: Best prediction (upload metadata)
+        upload_to_cloudinary: Queue a background upload
+        
+    Returns:
+        Dictionary with 'saved_image' and/or 'upload' / 'cloudinary_url' entries for the response
+    """
+    stored = {}
+    if not (SAVE_TO_DISK or upload_to_cloudinary):
+        return stored
+    
+    image_bytes, stored_filename = prepare_stored_image(upload, filename)
+    if SAVE_TO_DISK:
+        try:
+            stored['saved_image'] = save_image_to_disk(image_bytes, stored_filename, upload.digest)
+        except OSError as e:
+            logger.error(f"❌ Could not save image to disk: {str(e)}")
+    if upload_to_cloudinary and top_prediction:
+        stored['upload'] = queue_image_upload(image_bytes, stored_filename, top_prediction)
+        # Null while the upload is queued; the job status reports the URL once it is done
+        stored['cloudinary_url'] = None
+    return stored
+
+def queue_image_upload(image_bytes, filename, top_prediction):
+    """
+    Queue an identified image for upload and describe the job for the response
+    
+    Args:
+        image_bytes: Image to upload (the ingested copy, see store_upload)
+        filename: Original filename
+        top_prediction: Best prediction (stored as upload metadata)
+        
+    Returns:
+        Dictionary with job_id / status / status_url
+    """
+    if not cloudinary_uploader.enabled:
+        return {'status': 'disabled'}
+    
+    metadata = {
+        'breed': top_prediction['breed'],
+        'species': top_prediction['species'],
+        'confidence': top_prediction['confidence'],
+        'model': 'MobileNetV2'
+    }
+    try:
+        job_id = get_upload_queue(cloudinary_uploader).submit(image_bytes, filename, metadata)
+    except UploadQueueFull as e:
+        logger.warning(f"⚠️ {str(e)}, skipping upload")
+        return {'status': 'rejected', 'error': str(e)}
+    
+    return {
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/uploads/{job_id}"
+    }
 
 @app.route('/', methods=['GET'])
 def home():
@@ -73,15 +200,22 @@ def home():
         'model': 'MobileNetV2',
         'endpoints': {
             'petshop_breed': '/api/petshop/identify-breed',
+            'petshop_breed_batch': '/api/petshop/identify-breed/batch',
+            'petshop_breed_stream': '/api/petshop/identify-breed/stream',
             'petshop_species': '/api/petshop/identify-species',
+            'petshop_similar': '/api/petshop/similar',
+            'petshop_references': '/api/petshop/references',
+            'photo_duplicates': '/api/photos/check-duplicate',
             'adoption_identify': '/api/adoption/identify',
+            'identify_all': '/api/identify',
             'inventory_predict': '/api/inventory/analyze/<product_id>',
             'inventory_all': '/api/inventory/analyze/all',
             'inventory_critical': '/api/inventory/critical-items',
             'inventory_report': '/api/inventory/restock-report',
             'inventory_forecast': '/api/inventory/forecast/<product_id>',
             'inventory_seasonal': '/api/inventory/seasonal-analysis',
-            'health': '/health'
+            'health': '/health',
+            'metrics': '/metrics'
         },
         'features': [
             'Pet Breed Identification',
@@ -93,18 +227,71 @@ def home():
         ]
     })
 
+def initialize_services(background=False, preload_only=False):
+    """
+    Preload and warm up MobileNetV2 and load the adoption ML models
+    
+    Called by the dev server below and by the gunicorn hooks in
+    gunicorn.conf.py, so the first real request never pays for model loading.
+    With preload_only, just the shared model data is loaded (gunicorn master, before fork).
+    """
+    identifiers = [petshop_identifier, adoption_identifier]
+    if preload_only:
+        return service_lifecycle.preload_shared_models(petshop_identifier.model_loader)
+    if background:
+        return service_lifecycle.start_background_initialization(identifiers)
+    return service_lifecycle.initialize_services(identifiers)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Request latency per route (streamed responses: time to first byte)"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            endpoint=endpoint,
+            status=response.status_code
+        )
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of all worker processes, merged through METRICS_DIR (stage latencies, caches, batching)"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health', methods=['GET'])
 def health():
-    """Detailed health check"""
+    """Detailed health check (503 until the models are loaded and warmed up)"""
+    readiness = service_lifecycle.get_readiness()
+    if readiness['status'] == 'not_started':
+        # Started without a startup hook (e.g. serverless) - begin loading now
+        initialize_services(background=True)
+        readiness = service_lifecycle.get_readiness()
+    
+    components = readiness['components']
     return jsonify({
-        'success': True,
-        'status': 'healthy',
+        'success': readiness['ready'],
+        'status': 'healthy' if readiness['ready'] else readiness['status'],
         'timestamp': time.time(),
         'services': {
-            'petshop_identifier': 'ready',
-            'adoption_identifier': 'ready'
-        }
-    })
+            'petshop_identifier': components['breed_model'],
+            'adoption_identifier': components['breed_model'],
+            'adoption_ml': components['adoption_ml'],
+            'mongodb': components['mongodb']
+        },
+        'readiness': readiness,
+        'inference': petshop_identifier.model_loader.get_inference_stats(),
+        'micro_batching': petshop_identifier.model_loader.get_batching_stats(),
+        'result_cache': get_result_cache_stats(),
+        'embedding_index': get_embedding_index().get_stats(),
+        'uploads': get_upload_queue(cloudinary_uploader).get_stats()
+    }), 200 if readiness['ready'] else 503
 
 @app.route('/api/petshop/identify-breed', methods=['POST'])
 def petshop_identify_breed():
@@ -114,6 +301,7 @@ def petshop_identify_breed():
     Request:
         - image: Image file (multipart/form-data)
         - top_k: Number of predictions (optional, default=5)
+        - similar_k: Also return this many similar reference pets (optional, default=0)
         - upload_to_cloudinary: Upload to Cloudinary (optional, default=false)
         
     Response:
@@ -121,7 +309,9 @@ def petshop_identify_breed():
         - primary_breed: Most likely breed
         - primary_species: Most likely species
         - processing_time: Time taken for inference
-        - cloudinary_url: URL if uploaded to Cloudinary
+        - similar / similar_breeds: Nearest labelled reference pets (if similar_k > 0)
+        - upload: Background upload job (job_id, status, status_url) if upload_to_cloudinary
+        - cloudinary_url: null while the upload is queued (poll upload.status_url for it)
     """
     try:
         # Check if image file is present
@@ -145,51 +335,32 @@ def petshop_identify_breed():
                 'error': 'Invalid file type. Allowed: jpg, jpeg, png, webp'
             }), 400
         
-        # Validate image
-        try:
-            image_processor.validate_image(file)
-        except ValueError as e:
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 400
-        
-        # Get image as bytes (process in memory)
-        image_bytes = image_processor.get_image_bytes(file)
+        # Read the upload once; it is validated when it is decoded for the model
+        upload = image_processor.read_upload(file)
         
         # Get top_k parameter
         top_k = request.form.get('top_k', 5, type=int)
         upload_to_cloudinary = request.form.get('upload_to_cloudinary', 'false').lower() == 'true'
+        if upload_to_cloudinary or SAVE_TO_DISK:
+            predecode_for_storage(upload)
         
         # Identify breed (using in-memory image)
         logger.info(f"Processing breed identification request (in-memory)")
-        result = petshop_identifier.identify_breed(image_bytes, top_k=top_k)
-        
-        # Optionally upload to Cloudinary
-        cloudinary_url = None
-        if upload_to_cloudinary and result['success'] and result['predictions']:
-            top_prediction = result['predictions'][0]
-            metadata = {
-                'breed': top_prediction['breed'],
-                'species': top_prediction['species'],
-                'confidence': top_prediction['confidence'],
-                'model': 'MobileNetV2'
-            }
-            
-            cloudinary_result = cloudinary_uploader.upload_image(
-                image_bytes,
-                file.filename,
-                metadata
-            )
-            
-            if cloudinary_result:
-                cloudinary_url = cloudinary_result['url']
-                logger.info(f"✅ Image uploaded to Cloudinary: {cloudinary_url}")
+        result = petshop_identifier.identify_breed(upload, top_k=top_k)
         
         if result['success']:
             response_data = result.copy()
-            if cloudinary_url:
-                response_data['cloudinary_url'] = cloudinary_url
+            
+            # Optionally save / upload to Cloudinary in the background: the response does not wait for the upload
+            top_prediction = result['predictions'][0] if result['predictions'] else None
+            response_data.update(store_upload(upload, file.filename, top_prediction, upload_to_cloudinary))
+            
+            similar_k = request.form.get('similar_k', 0, type=int)
+            if similar_k > 0:
+                similar = petshop_identifier.find_similar(upload, k=similar_k)
+                if similar['success']:
+                    response_data['similar'] = similar['similar']
+                    response_data['similar_breeds'] = similar['breeds']
             
             return jsonify({
                 'success': True,
@@ -199,7 +370,7 @@ def petshop_identify_breed():
             return jsonify({
                 'success': False,
                 'error': result.get('error', 'Identification failed')
-            }), 500
+            }), 400 if result.get('invalid_image') else 500
             
     except Exception as e:
         logger.error(f"Error in breed identification: {str(e)}")
@@ -208,6 +379,216 @@ def petshop_identify_breed():
             'error': str(e)
         }), 500
 
+@app.route('/api/uploads/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """
+    Status of a background image upload
+    
+    Response:
+        - status: queued | uploading | done | failed
+        - result: Uploaded image info (url, public_id, ...) once done
+        - cloudinary_url: Uploaded image URL once done, else null
+        - attempts / error: Retry information
+    """
+    job = get_upload_queue(cloudinary_uploader).get_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown upload job'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': {**job, 'cloudinary_url': (job.get('result') or {}).get('url')}
+    }), 200
+
+@app.route('/api/petshop/identify-breed/batch', methods=['POST'])
+def petshop_identify_breed_batch():
+    """
+    Identify pet breeds for several images with one batched forward pass
+    
+    Request:
+        - images: Image files (multipart/form-data, repeat the field per image)
+        - top_k: Number of predictions per image (optional, default=5)
+        
+    Response:
+        - results: One identification result per uploaded image, in upload order
+        - total_processed: Number of images that were identified
+        - total_failed: Number of images that could not be decoded
+        - processing_time: Time taken for the whole batch
+    """
+    try:
+        files = request.files.getlist('images')
+        
+        if not files:
+            return jsonify({
+                'success': False,
+                'error': 'No image files provided'
+            }), 400
+        
+        max_images = app.config['MAX_BATCH_IMAGES']
+        if len(files) > max_images:
+            return jsonify({
+                'success': False,
+                'error': f'Too many images. Maximum per batch: {max_images}'
+            }), 400
+        
+        top_k = request.form.get('top_k', 5, type=int)
+        
+        # Read every upload into memory; rejected files keep their slot so
+        # results line up with the order the client sent them in
+        image_sources = []
+        rejected = {}
+        for index, file in enumerate(files):
+            if file.filename == '' or not allowed_file(file.filename):
+                rejected[index] = 'Invalid file type. Allowed: jpg, jpeg, png, webp'
+                continue
+            image_sources.append((index, image_processor.read_upload(file)))
+        
+        logger.info(f"Processing batch breed identification for {len(image_sources)} images (in-memory)")
+        result = petshop_identifier.batch_identify(
+            [upload for _, upload in image_sources],
+            top_k=top_k
+        )
+        
+        if not result['success']:
+            return jsonify({
+                'success': False,
+                'error': result.get('error', 'Batch identification failed')
+            }), 500
+        
+        results = [None] * len(files)
+        for (index, _), image_result in zip(image_sources, result['results']):
+            results[index] = image_result
+        for index, error in rejected.items():
+            results[index] = {
+                'success': False,
+                'error': error,
+                'predictions': []
+            }
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'results': results,
+                'total_processed': result['total_processed'],
+                'total_failed': result['total_failed'] + len(rejected),
+                'processing_time': result['processing_time']
+            }
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error in batch breed identification: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/petshop/identify-breed/stream', methods=['POST'])
+def petshop_identify_breed_stream():
+    """
+    Identify pet breeds for many images, streaming one NDJSON line per image
+    
+    Werkzeug parses the whole multipart body before this view runs (files
+    larger than 500 KB are spooled to temporary files), so the upload itself
+    is only bounded by MAX_REQUEST_MB. Decoding is what streams: images are
+    decoded and identified STREAM_CHUNK_SIZE at a time and each chunk's lines
+    are written before the next chunk is decoded, so decoded pixels stay
+    bounded and clients see results while the rest are still processing.
+    
+    Request:
+        - images: Image files (multipart/form-data, repeat the field per image)
+        - top_k: Number of predictions per image (optional, default=5)
+        
+    Response (application/x-ndjson):
+        - One line per image: {"index", "filename", ...identification result}
+        - A final summary line: {"done": true, "total_processed", "total_failed", "processing_time"}
+    """
+    files = request.files.getlist('images')
+    
+    if not files:
+        return jsonify({
+            'success': False,
+            'error': 'No image files provided'
+        }), 400
+    
+    max_images = app.config['MAX_STREAM_IMAGES']
+    if len(files) > max_images:
+        return jsonify({
+            'success': False,
+            'error': f'Too many images. Maximum per stream: {max_images}'
+        }), 400
+    
+    top_k = request.form.get('top_k', 5, type=int)
+    chunk_size = app.config['STREAM_CHUNK_SIZE']
+    
+    # Take ownership of the upload streams: the request closes its files when
+    # the view returns, but the generator below reads them after that
+    uploads = []
+    for file in files:
+        uploads.append(FileStorage(stream=file.stream, filename=file.filename,
+                                   name=file.name, content_type=file.content_type))
+        file.stream = io.BytesIO()
+    
+    def ndjson(record):
+        return json.dumps(record) + '\n'
+    
+    def generate():
+        start_time = time.time()
+        processed = failed = 0
+        
+        # Rejected file types are reported up front, before any decoding
+        accepted = []
+        for index, file in enumerate(uploads):
+            if file.filename == '' or not allowed_file(file.filename):
+                failed += 1
+                yield ndjson({
+                    'index': index,
+                    'filename': file.filename,
+                    'success': False,
+                    'error': 'Invalid file type. Allowed: jpg, jpeg, png, webp',
+                    'predictions': []
+                })
+            else:
+                accepted.append(index)
+        
+        def read_lazily():
+            # Each upload is read only when its chunk is about to be identified
+            for index in accepted:
+                upload = image_processor.read_upload(uploads[index])
+                uploads[index].close()
+                yield index, upload
+        
+        try:
+            for index, result in petshop_identifier.stream_identify(read_lazily(), top_k=top_k, chunk_size=chunk_size):
+                if result.get('success'):
+                    processed += 1
+                else:
+                    failed += 1
+                yield ndjson({'index': index, 'filename': uploads[index].filename, **result})
+        except Exception as e:
+            logger.error(f"Error in streaming breed identification: {str(e)}")
+            yield ndjson({'done': False, 'success': False, 'error': str(e)})
+            return
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        yield ndjson({
+            'done': True,
+            'success': True,
+            'total_processed': processed,
+            'total_failed': failed,
+            'processing_time': f"{time.time() - start_time:.3f}s"
+        })
+    
+    logger.info(f"Streaming breed identification for {len(files)} images (chunks of {chunk_size})")
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+    )
+
 @app.route('/api/petshop/identify-species', methods=['POST'])
 def petshop_identify_species():
     """
@@ -215,10 +596,12 @@ def petshop_identify_species():
     
     Request:
         - image: Image file
+        - mode: 'aggregate' or 'top1' (optional, default=SPECIES_MODE)
         
     Response:
         - species: Identified species
         - confidence: Confidence score
+        - distribution: Probability per species (aggregate mode)
     """
     try:
         if 'image' not in request.files:
@@ -235,11 +618,18 @@ def petshop_identify_species():
                 'error': 'Invalid file type'
             }), 400
         
-        # Get image as bytes (process in memory)
-        image_bytes = image_processor.get_image_bytes(file)
+        mode = request.form.get('mode', None)
+        if mode is not None and mode.lower() not in ('aggregate', 'top1'):
+            return jsonify({
+                'success': False,
+                'error': "Invalid mode. Allowed: aggregate, top1"
+            }), 400
+        
+        # Read the upload once (process in memory)
+        upload = image_processor.read_upload(file)
         
         # Identify species
-        result = petshop_identifier.identify_species_only(image_bytes)
+        result = petshop_identifier.identify_species_only(upload, mode)
         
         if result['success']:
             return jsonify({
@@ -250,7 +640,7 @@ def petshop_identify_species():
             return jsonify({
                 'success': False,
                 'error': result.get('error', 'Identification failed')
-            }), 500
+            }), 400 if result.get('invalid_image') else 500
             
     except Exception as e:
         logger.error(f"Error in species identification: {str(e)}")
@@ -259,6 +649,119 @@ def petshop_identify_species():
             'error': str(e)
         }), 500
 
+@app.route('/api/petshop/similar', methods=['POST'])
+def petshop_similar():
+    """
+    Find the most similar labelled reference pets by image embedding
+    
+    Request:
+        - image: Image file
+        - k: Number of similar pets to return (optional, default=5)
+        
+    Response:
+        - similar: Reference pets (breed, species, pet_id, similarity), most similar first
+        - breeds: Similarity-weighted breed ranking over those pets
+        - total_references: Size of the reference index
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided'
+            }), 400
+        
+        file = request.files['image']
+        
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type'
+            }), 400
+        
+        upload = image_processor.read_upload(file)
+        k = request.form.get('k', 5, type=int)
+        
+        result = petshop_identifier.find_similar(upload, k=k)
+        
+        if result['success']:
+            return jsonify({
+                'success': True,
+                'data': result
+            }), 200
+        return jsonify({
+            'success': False,
+            'error': result.get('error', 'Similarity search failed')
+        }), 400 if result.get('invalid_image') else 500
+        
+    except Exception as e:
+        logger.error(f"Error in similarity search: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/petshop/references', methods=['POST'])
+def petshop_add_reference():
+    """
+    Add a labelled reference image to the similarity index (takes effect immediately)
+    
+    Request:
+        - image: Image file
+        - breed: Known breed of the pet (required)
+        - species: Species of the pet (optional)
+        - pet_id: Backend id of the pet (optional)
+        
+    Response:
+        - reference_id: Id of the new reference
+        - total_references: Size of the reference index
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided'
+            }), 400
+        
+        file = request.files['image']
+        
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type'
+            }), 400
+        
+        breed = request.form.get('breed', '').strip()
+        if not breed:
+            return jsonify({
+                'success': False,
+                'error': 'breed is required'
+            }), 400
+        
+        upload = image_processor.read_upload(file)
+        result = petshop_identifier.add_reference(
+            upload,
+            breed,
+            species=request.form.get('species') or None,
+            pet_id=request.form.get('pet_id') or None
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 201
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f"Invalid image file: {str(e)}"
+        }), 400
+    except Exception as e:
+        logger.error(f"Error adding reference image: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/adoption/identify', methods=['POST'])
 def adoption_identify():
     """
@@ -285,17 +788,26 @@ def adoption_identify():
                 'error': 'Invalid file type'
             }), 400
         
-        # Get image as bytes (process in memory)
-        image_bytes = image_processor.get_image_bytes(file)
+        # Read the upload once (process in memory)
+        upload = image_processor.read_upload(file)
+        if SAVE_TO_DISK:
+            predecode_for_storage(upload)
         
         # Identify
-        result = adoption_identifier.identify(image_bytes)
+        result = adoption_identifier.identify(upload)
+        if result.get('success'):
+            result.update(store_upload(upload, file.filename))
         
         return jsonify({
             'success': True,
             'data': result
         }), 200
             
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f"Invalid image file: {str(e)}"
+        }), 400
     except Exception as e:
         logger.error(f"Error in adoption identification: {str(e)}")
         return jsonify({
@@ -303,6 +815,78 @@ def adoption_identify():
             'error': str(e)
         }), 500
 
+@app.route('/api/identify', methods=['POST'])
+def identify_all():
+    """
+    Every identification view of one upload from a single forward pass
+    
+    Request:
+        - image: Image file
+        - top_k: Number of breed predictions (optional, default=5)
+        - species: Filter breed suggestions by species (optional)
+        
+    Response:
+        - breed: Same as /api/petshop/identify-breed
+        - species: Same as /api/petshop/identify-species
+        - suggestions: Same as /api/petshop/breed-suggestions
+        - adoption: Same as /api/adoption/identify
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided'
+            }), 400
+        
+        file = request.files['image']
+        
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type'
+            }), 400
+        
+        upload = image_processor.read_upload(file)
+        top_k = request.form.get('top_k', 5, type=int)
+        species_filter = request.form.get('species', None)
+        if SAVE_TO_DISK:
+            predecode_for_storage(upload)
+        
+        start_time = time.time()
+        probabilities = petshop_identifier.model_loader.predict_image(upload)
+        
+        breed = petshop_identifier.result_from_probabilities(probabilities, top_k, start_time)
+        species = petshop_identifier.species_from_probabilities(probabilities, start_time=start_time)
+        suggestions = petshop_identifier.filter_by_species(
+            petshop_identifier.result_from_probabilities(probabilities, 10, start_time),
+            species_filter
+        )
+        adoption = adoption_identifier.result_from_probabilities(probabilities)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'breed': breed,
+                'species': species,
+                'suggestions': suggestions,
+                'adoption': adoption,
+                **store_upload(upload, file.filename),
+                'processing_time': f"{time.time() - start_time:.3f}s"
+            }
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error in combined identification: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/petshop/breed-suggestions', methods=['POST'])
 def breed_suggestions():
     """
@@ -331,11 +915,11 @@ def breed_suggestions():
                 'error': 'Invalid file type'
             }), 400
         
-        # Get image as bytes (process in memory)
-        image_bytes = image_processor.get_image_bytes(file)
+        # Read the upload once (process in memory)
+        upload = image_processor.read_upload(file)
         
         # Get suggestions
-        result = petshop_identifier.get_breed_suggestions(image_bytes, species_filter)
+        result = petshop_identifier.get_breed_suggestions(upload, species_filter)
         
         if result['success']:
             return jsonify({
@@ -346,7 +930,7 @@ def breed_suggestions():
             return jsonify({
                 'success': False,
                 'error': result.get('error', 'Failed to get suggestions')
-            }), 500
+            }), 400 if result.get('invalid_image') else 500
             
     except Exception as e:
         logger.error(f"Error getting breed suggestions: {str(e)}")
@@ -362,6 +946,10 @@ app.register_blueprint(recommendation_bp)
 from routes.adoption_routes import adoption_bp
 app.register_blueprint(adoption_bp)
 
+# Register Duplicate Photo Detection Blueprint
+from routes.photo_routes import photo_bp
+app.register_blueprint(photo_bp)
+
 # Register Inventory Prediction Blueprint (AI/ML Auto-Restock)
 app.register_blueprint(inventory_bp, url_prefix='/api/inventory')
 logger.info("✅ Inventory Prediction API registered at /api/inventory")
@@ -379,6 +967,14 @@ def not_found(error):
         'error': 'Endpoint not found'
     }), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    """Handle request bodies over MAX_REQUEST_MB"""
+    return jsonify({
+        'success': False,
+        'error': f"Request too large. Maximum: {app.config['MAX_REQUEST_MB']} MB"
+    }), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
@@ -392,36 +988,8 @@ if __name__ == '__main__':
     logger.info("🤖 Pet Care AI/ML Service Starting...")
     logger.info("=" * 60)
     
-    # Test MongoDB connection
-    try:
-        logger.info("Testing MongoDB connection...")
-        from config.database import get_db
-        db = get_db()
-        logger.info("✅ MongoDB connection successful")
-    except Exception as e:
-        logger.error(f"❌ MongoDB connection failed: {str(e)}")
-        logger.error("Recommendation features will not work!")
-    
-    # Initialize models on startup
-    try:
-        logger.info("Initializing AI models...")
-        petshop_identifier.initialize()
-        adoption_identifier.initialize()
-        logger.info("✅ All AI models initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize models: {str(e)}")
-        logger.error("Service will start but models will load on first request")
-    
-    # Bootstrap train adoption ML models (SVD, XGBoost, K-Means)
-    try:
-        logger.info("🧠 Auto-training Adoption ML models...")
-        from modules.adoption.bootstrap_training import bootstrap_train_all_models
-        train_results = bootstrap_train_all_models()
-        trained = sum(1 for r in train_results.values() if r.get('trained', False))
-        logger.info(f"✅ Adoption ML: {trained}/3 algorithms active")
-    except Exception as e:
-        logger.error(f"❌ Adoption ML bootstrap training failed: {str(e)}")
-        logger.error("Hybrid recommender will use content-based fallback")
+    # Load and warm up all models before accepting requests
+    initialize_services()
     
     logger.info("=" * 60)
     logger.info(f"🚀 Server starting on http://{app.config['FLASK_HOST']}:{app.config['FLASK_PORT']}")
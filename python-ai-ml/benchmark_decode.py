@@ -0,0 +1,197 @@
+"""
+=============================================================================
+  PetConnect Breed AI — Image Decode Benchmark
+=============================================================================
+  Compares the exact preprocessing path (full-resolution decode + LANCZOS)
+  with the fast path (JPEG draft/DCT-scaled decode + bilinear) and, for
+  reference, OpenCV's IMREAD_REDUCED_COLOR_* decoding, on a folder of
+  sample images.
+
+  Reported:
+    decode latency    — mean ms per image for decode + resize + scaling
+    pixel difference  — mean absolute difference vs the exact path ([-1, 1] scale)
+    top-1 agreement   — same top class as the exact path (unless --no-model)
+    top-5 agreement   — average overlap of the two top-5 class sets
+
+  Usage:
+    python benchmark_decode.py --images path/to/sample_pets
+    python benchmark_decode.py --images uploads --no-model
+    python benchmark_decode.py --images uploads --repeat 5 --limit 50
+
+=============================================================================
+"""
+
+import os, sys, argparse, time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from config.settings import Config
+from utils.image_processor import ImageProcessor
+
+IMAGE_EXTENSIONS = tuple(f'.{ext}' for ext in Config.ALLOWED_EXTENSIONS)
+TARGET_SIZE = Config.TARGET_SIZE
+
+# ─── colour helpers ───────────────────────────────────────────────────────────
+GREEN  = '\033[92m'
+YELLOW = '\033[93m'
+RED    = '\033[91m'
+CYAN   = '\033[96m'
+BOLD   = '\033[1m'
+RESET  = '\033[0m'
+
+
+def banner(text):
+    print(f"\n{BOLD}{CYAN}{'='*64}{RESET}")
+    print(f"{BOLD}{CYAN}  {text}{RESET}")
+    print(f"{BOLD}{CYAN}{'='*64}{RESET}")
+
+
+def ok(text):   print(f"  {GREEN}[OK]  {text}{RESET}")
+def warn(text): print(f"  {YELLOW}[!!]  {text}{RESET}")
+def fail(text): print(f"  {RED}[ERR] {text}{RESET}")
+def info(text): print(f"  {CYAN}[>>]  {text}{RESET}")
+
+
+# ─── decode paths ─────────────────────────────────────────────────────────────
+
+def decode_exact(image_bytes):
+    return ImageProcessor.load_and_preprocess_image(image_bytes, TARGET_SIZE, fast=False)
+
+
+def decode_fast(image_bytes):
+    return ImageProcessor.load_and_preprocess_image(image_bytes, TARGET_SIZE, fast=True)
+
+
+def decode_opencv(image_bytes):
+    """OpenCV reduced decode: pick the largest 1/2, 1/4, 1/8 scale that stays >= 2x target"""
+    import cv2
+
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    # PIL only parses the header here, so the size probe costs no decode
+    short_side = min(ImageProcessor.open_image(image_bytes).size)
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                 (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                 (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if short_side // factor >= TARGET_SIZE[0] * 2:
+            flag = reduced_flag
+            break
+
+    img = cv2.imdecode(buffer, flag)
+    img = cv2.resize(img, (TARGET_SIZE[1], TARGET_SIZE[0]), interpolation=cv2.INTER_AREA)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32)
+    return ImageProcessor.preprocess_input(img[np.newaxis])
+
+
+PATHS = {
+    'exact': decode_exact,
+    'fast': decode_fast,
+    'opencv': decode_opencv,
+}
+
+
+def load_images(image_dir, limit):
+    """Read up to `limit` image files from image_dir as raw bytes"""
+    paths = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def time_path(decode_fn, images, repeat):
+    """Decode every image `repeat` times, return (arrays from the first run, mean ms per image)"""
+    arrays, timings = [], []
+    for run in range(repeat):
+        for name, image_bytes in images:
+            start = time.perf_counter()
+            try:
+                array = decode_fn(image_bytes)
+            except Exception as e:
+                if run == 0:
+                    warn(f"{name}: {e}")
+                array = None
+            timings.append((time.perf_counter() - start) * 1000)
+            if run == 0:
+                arrays.append(array)
+    return arrays, float(np.mean(timings))
+
+
+def agreement(reference, candidate, k=5):
+    """Top-1 match rate and mean top-k overlap between two N x 1000 prediction arrays"""
+    ref_top = np.argsort(-reference, axis=1)[:, :k]
+    cand_top = np.argsort(-candidate, axis=1)[:, :k]
+    top1 = float(np.mean(ref_top[:, 0] == cand_top[:, 0]))
+    topk = float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]))
+    return top1, topk
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exact vs fast image decoding for MobileNetV2')
+    parser.add_argument('--images', required=True, help='Folder of sample pet images')
+    parser.add_argument('--limit', type=int, default=100, help='Maximum number of images to use')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs per image')
+    parser.add_argument('--no-model', action='store_true', help='Skip the model agreement check')
+    args = parser.parse_args()
+
+    banner("PetConnect — Image Decode Benchmark")
+    info(f"Images: {args.images}")
+
+    images = load_images(args.images, args.limit)
+    if not images:
+        fail("No usable images found")
+        sys.exit(1)
+    megapixels = []
+    for _, image_bytes in images:
+        img = ImageProcessor.open_image(image_bytes)
+        megapixels.append(img.size[0] * img.size[1] / 1e6)
+    ok(f"Loaded {len(images)} images (mean {np.mean(megapixels):.1f} MP)")
+
+    results = {}
+    for name, decode_fn in PATHS.items():
+        arrays, mean_ms = time_path(decode_fn, images, args.repeat)
+        if name != 'exact' and all(array is None for array in arrays):
+            warn(f"{name}: could not decode any image, leaving it out")
+            continue
+        results[name] = (arrays, mean_ms)
+        ok(f"{name:<7} {mean_ms:8.1f} ms/image")
+
+    # Only compare images every path could decode
+    exact_arrays = results['exact'][0]
+    usable = [i for i in range(len(images)) if all(arrays[i] is not None for arrays, _ in results.values())]
+    if not usable:
+        fail("No image was decoded by every path")
+        sys.exit(1)
+
+    model_loader = None
+    if not args.no_model:
+        from utils.model_loader import ModelLoader
+        model_loader = ModelLoader()
+        model_loader.get_model()
+        exact_preds = model_loader.predict(np.concatenate([exact_arrays[i] for i in usable]))
+
+    banner("Results")
+    print(f"  {'path':<10}{'ms/img':>10}{'speedup':>10}{'pix diff':>10}{'top-1':>10}{'top-5':>10}")
+    exact_ms = results['exact'][1]
+    for name, (arrays, mean_ms) in results.items():
+        batch = np.concatenate([arrays[i] for i in usable])
+        pixel_diff = float(np.mean(np.abs(batch - np.concatenate([exact_arrays[i] for i in usable]))))
+
+        top1_text = top5_text = '-'
+        if model_loader is not None:
+            top1, top5 = agreement(exact_preds, model_loader.predict(batch))
+            top1_text, top5_text = f"{top1*100:.1f}%", f"{top5*100:.1f}%"
+
+        print(f"  {name:<10}{mean_ms:>10.1f}{exact_ms / max(mean_ms, 1e-6):>9.2f}x"
+              f"{pixel_diff:>10.4f}{top1_text:>10}{top5_text:>10}")
+
+
+if __name__ == '__main__':
+    main()
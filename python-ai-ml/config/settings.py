@@ -15,15 +15,35 @@ class Config:
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     
     # Model Configuration
+    # 'MobileNetV2' serves the Keras model; 'MobileNetV2-TFLite' serves a converted TFLite copy;
+    # 'MobileNetV2-ONNX' serves an exported ONNX copy through onnxruntime
     MODEL_TYPE = os.getenv('MODEL_TYPE', 'MobileNetV2')
+    TFLITE_QUANTIZATION = os.getenv('TFLITE_QUANTIZATION', 'float16').lower()  # none | float16 | int8
+    INFERENCE_NUM_THREADS = int(os.getenv('INFERENCE_NUM_THREADS', 0))  # 0 = runtime default (TFLite interpreter / onnxruntime intra-op)
     MODEL_WEIGHTS = os.getenv('MODEL_WEIGHTS', 'imagenet')
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.5))
+    # How the Keras model is called: 'graph' (tf.function with fixed input signature),
+    # 'direct' (eager model(x) call) or 'predict' (Keras model.predict loop)
+    INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'graph').lower()
+    # How /identify-species decides: 'aggregate' (softmax mass summed per species over all
+    # ImageNet classes) or 'top1' (species of the single best breed prediction)
+    SPECIES_MODE = os.getenv('SPECIES_MODE', 'aggregate').lower()
     
     # Image Processing
     MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 1024))
+    # Largest request body accepted (Flask MAX_CONTENT_LENGTH). Multipart uploads are parsed in
+    # full before a view runs, so this also caps what one /identify-breed/stream request can hold.
+    MAX_REQUEST_MB = int(os.getenv('MAX_REQUEST_MB', 100))
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}
     TARGET_SIZE = (224, 224)  # MobileNetV2 input size
     SAVE_IMAGES_TO_DISK = os.getenv('SAVE_IMAGES_TO_DISK', 'false').lower() == 'true'
+    # Decode JPEGs at a reduced DCT scale and resize with bilinear instead of full decode + LANCZOS.
+    # Off until its top-1/top-5 agreement with the full decode has been measured on real photos.
+    FAST_DECODE = os.getenv('FAST_DECODE', 'false').lower() == 'true'
+    # Ingest pipeline for stored/uploaded copies: downscale to MAX_IMAGE_SIZE, strip EXIF, re-encode
+    INGEST_ENABLED = os.getenv('INGEST_ENABLED', 'true').lower() == 'true'  # false = store originals as uploaded
+    INGEST_FORMAT = os.getenv('INGEST_FORMAT', 'webp').lower()  # webp | jpeg
+    INGEST_QUALITY = int(os.getenv('INGEST_QUALITY', 82))
     
     # Cloudinary Configuration (Optional)
     CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME', '')
@@ -32,6 +52,14 @@ class Config:
     CLOUDINARY_UPLOAD_PRESET = os.getenv('CLOUDINARY_UPLOAD_PRESET', 'ai_identified_pets')
     CLOUDINARY_FOLDER = os.getenv('CLOUDINARY_FOLDER', 'ai-ml/identified-pets')
     
+    # Background image uploads (upload_to_cloudinary=true no longer blocks the response)
+    IMAGE_UPLOADER = os.getenv('IMAGE_UPLOADER', 'cloudinary').lower()  # cloudinary | local (tests/dev)
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+    UPLOAD_MAX_PENDING = int(os.getenv('UPLOAD_MAX_PENDING', 100))  # Further uploads are refused until some finish
+    UPLOAD_MAX_RETRIES = int(os.getenv('UPLOAD_MAX_RETRIES', 3))
+    UPLOAD_BACKOFF_SECONDS = float(os.getenv('UPLOAD_BACKOFF_SECONDS', 1.0))  # Doubled per retry
+    UPLOAD_STATUS_DIR = os.getenv('UPLOAD_STATUS_DIR', '')  # Job status dir shared by workers, '' = uploads/.upload_status
+    
     # Backend Integration
     BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5000')
     BACKEND_API_KEY = os.getenv('BACKEND_API_KEY', '')
@@ -40,9 +68,48 @@ class Config:
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'ai_service.log')
     
+    # Metrics: each process writes its values here and /metrics merges them, so any worker
+    # reports the whole service (gunicorn.conf.py sets one per master), '' = this process only
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))  # Longest delay before a worker's changes are visible
+    
     # Performance
     ENABLE_GPU = os.getenv('ENABLE_GPU', 'false').lower() == 'true'
     BATCH_SIZE = int(os.getenv('BATCH_SIZE', 1))
+    MAX_BATCH_IMAGES = int(os.getenv('MAX_BATCH_IMAGES', 32))  # Upper bound for /identify-breed/batch
+    # Streaming NDJSON identification: images per forward pass and upper bound per request
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 8))
+    MAX_STREAM_IMAGES = int(os.getenv('MAX_STREAM_IMAGES', 500))
+    # Micro-batching: concurrent requests share one forward pass of up to BATCH_SIZE images.
+    # Only useful with threaded workers (e.g. gunicorn --threads 4), sync workers serve one request at a time.
+    ENABLE_MICRO_BATCHING = os.getenv('ENABLE_MICRO_BATCHING', 'false').lower() == 'true'
+    MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', 5))
+    # Load the adoption models once in the gunicorn master so workers share them copy-on-write
+    # (MobileNetV2 runtimes are built per worker, see RENDER_CONFIG.md for what is shared)
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'false').lower() == 'true'
+    
+    # Identification result cache (keyed by a hash of the image bytes + request parameters)
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 512))
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv('RESULT_CACHE_TTL_SECONDS', 3600))  # 0 = never expire
+    RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', '')  # Optional on-disk tier shared by workers, '' = memory only
+    
+    # Reference-image embedding index (1280-d MobileNetV2 features of labelled pets)
+    EMBEDDING_INDEX_BACKEND = os.getenv('EMBEDDING_INDEX_BACKEND', 'exact').lower()  # exact | hnsw (needs hnswlib)
+    EMBEDDING_INDEX_PATH = os.getenv('EMBEDDING_INDEX_PATH', '')  # '' = models/pet_embeddings.npz
+    
+    # Duplicate photo detection (pHash/dHash BK-tree, optional embedding check)
+    DUPLICATE_INDEX_PATH = os.getenv('DUPLICATE_INDEX_PATH', '')  # '' = models/photo_hashes.jsonl
+    DUPLICATE_PHASH_THRESHOLD = int(os.getenv('DUPLICATE_PHASH_THRESHOLD', 10))  # Hamming distance out of 64 bits
+    DUPLICATE_DHASH_THRESHOLD = int(os.getenv('DUPLICATE_DHASH_THRESHOLD', 16))
+    DUPLICATE_USE_EMBEDDINGS = os.getenv('DUPLICATE_USE_EMBEDDINGS', 'false').lower() == 'true'  # One forward pass per check (shared with identify of the same upload)
+    DUPLICATE_EMBEDDING_THRESHOLD = float(os.getenv('DUPLICATE_EMBEDDING_THRESHOLD', 0.95))
+    
+    # Adoption matching: pets per /match/rank response that get match_reasons/warnings
+    # (the rest are scored and ranked, explanations left empty)
+    MATCH_EXPLAIN_TOP = int(os.getenv('MATCH_EXPLAIN_TOP', 50))
+    # Resident pet catalogue: match requests without a pets list score these pets
+    PET_CATALOGUE_PATH = os.getenv('PET_CATALOGUE_PATH', '')  # Snapshot shared by workers, '' = models/pet_catalogue.json
     
     # Paths
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
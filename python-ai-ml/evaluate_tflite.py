@@ -0,0 +1,135 @@
+"""
+=============================================================================
+  PetConnect Breed AI — TFLite vs Keras Agreement Check
+=============================================================================
+  Converts (or reuses the cached) TFLite MobileNetV2 for each quantization
+  mode and compares its predictions with the float32 Keras model on a folder
+  of sample images.
+
+  Reported per quantization mode:
+    top-1 agreement   — same top class as Keras
+    top-5 agreement   — average overlap of the two top-5 class sets
+    mean latency      — single-image inference time, Keras vs TFLite
+    model size        — .tflite file size on disk
+
+  Usage:
+    python evaluate_tflite.py --images path/to/sample_pets
+    python evaluate_tflite.py --images uploads --quant int8
+    python evaluate_tflite.py --images uploads --quant none float16 int8
+
+=============================================================================
+"""
+
+import os, sys, argparse, time
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from config.settings import Config
+from utils.image_processor import ImageProcessor
+from utils.inference_engines import TFLiteEngine, TFLITE_QUANTIZATIONS
+
+IMAGE_EXTENSIONS = tuple(f'.{ext}' for ext in Config.ALLOWED_EXTENSIONS)
+
+# ─── colour helpers ───────────────────────────────────────────────────────────
+GREEN  = '\033[92m'
+YELLOW = '\033[93m'
+RED    = '\033[91m'
+CYAN   = '\033[96m'
+BOLD   = '\033[1m'
+RESET  = '\033[0m'
+
+
+def banner(text):
+    print(f"\n{BOLD}{CYAN}{'='*64}{RESET}")
+    print(f"{BOLD}{CYAN}  {text}{RESET}")
+    print(f"{BOLD}{CYAN}{'='*64}{RESET}")
+
+
+def ok(text):   print(f"  {GREEN}[OK]  {text}{RESET}")
+def warn(text): print(f"  {YELLOW}[!!]  {text}{RESET}")
+def fail(text): print(f"  {RED}[ERR] {text}{RESET}")
+def info(text): print(f"  {CYAN}[>>]  {text}{RESET}")
+
+
+def load_samples(image_dir, limit):
+    """Preprocess up to `limit` images from image_dir into a list of 1x224x224x3 arrays"""
+    paths = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+
+    samples = []
+    for path in paths:
+        try:
+            samples.append(ImageProcessor.load_and_preprocess_image(path))
+        except ValueError as e:
+            warn(f"Skipping {os.path.basename(path)}: {e}")
+    return samples
+
+
+def run_model(predict_fn, samples):
+    """Run single-image inference over all samples, return (predictions, mean latency ms)"""
+    outputs, timings = [], []
+    for sample in samples:
+        start = time.perf_counter()
+        outputs.append(predict_fn(sample)[0])
+        timings.append((time.perf_counter() - start) * 1000)
+    # Drop the first call (graph/allocator warm-up) from the latency figure
+    steady = timings[1:] if len(timings) > 1 else timings
+    return np.stack(outputs), float(np.mean(steady))
+
+
+def agreement(reference, candidate, k=5):
+    """Top-1 match rate and mean top-k overlap between two N x 1000 prediction arrays"""
+    ref_top = np.argsort(-reference, axis=1)[:, :k]
+    cand_top = np.argsort(-candidate, axis=1)[:, :k]
+    top1 = float(np.mean(ref_top[:, 0] == cand_top[:, 0]))
+    topk = float(np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]))
+    return top1, topk
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare TFLite MobileNetV2 against the Keras model')
+    parser.add_argument('--images', required=True, help='Folder of sample pet images')
+    parser.add_argument('--quant', nargs='+', choices=TFLITE_QUANTIZATIONS, default=['float16', 'int8'],
+                        help='Quantization modes to evaluate (default: float16 int8)')
+    parser.add_argument('--limit', type=int, default=200, help='Maximum number of images to use')
+    args = parser.parse_args()
+
+    banner("PetConnect — TFLite Agreement Check")
+    info(f"Images: {args.images}")
+    info(f"Models: {Config.MODELS_DIR}")
+
+    samples = load_samples(args.images, args.limit)
+    if not samples:
+        fail("No usable images found")
+        sys.exit(1)
+    ok(f"Loaded {len(samples)} sample images")
+
+    from utils.model_loader import ModelLoader
+    keras_model = ModelLoader._build_keras_model()
+    keras_preds, keras_ms = run_model(lambda x: keras_model(x, training=False).numpy(), samples)
+    ok(f"Keras float32 baseline: {keras_ms:.1f} ms/image")
+
+    banner("Results")
+    print(f"  {'mode':<10}{'top-1':>10}{'top-5':>10}{'ms/img':>10}{'speedup':>10}{'size MB':>10}")
+    for quantization in args.quant:
+        model_path = os.path.join(Config.MODELS_DIR, TFLiteEngine.model_filename(quantization))
+        if not os.path.exists(model_path):
+            info(f"Converting {quantization} model...")
+            # Same two-output model the service converts, so the cached file can be served as-is
+            TFLiteEngine.convert(ModelLoader._with_features(keras_model), model_path, quantization)
+
+        engine = TFLiteEngine(model_path, num_threads=Config.INFERENCE_NUM_THREADS)
+        tflite_preds, tflite_ms = run_model(lambda x: engine.predict_outputs(x)[0], samples)
+        top1, top5 = agreement(keras_preds, tflite_preds)
+        size_mb = os.path.getsize(model_path) / (1024 * 1024)
+
+        print(f"  {quantization:<10}{top1*100:>9.1f}%{top5*100:>9.1f}%{tflite_ms:>10.1f}"
+              f"{keras_ms / max(tflite_ms, 1e-6):>9.2f}x{size_mb:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Gunicorn configuration for the AI/ML service
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+
+Each worker loads and warms up MobileNetV2 and the adoption ML models right
+after it boots, instead of on the first request it happens to serve.
+
+With PRELOAD_MODELS=true the app and the adoption models are loaded once in the
+master before forking, so workers share those pages copy-on-write. Each worker
+still builds its own MobileNetV2 runtime.
+
+Workers merge their /metrics through METRICS_DIR, so any worker answering a
+scrape reports the whole service.
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('PRELOAD_MODELS', 'false').lower() == 'true'
+
+# Workers write their metrics here and /metrics merges them (inherited through
+# the environment); by default one directory per master, removed on shutdown
+_default_metrics_dir = os.path.join(tempfile.gettempdir(), f"petcare-metrics-{os.getpid()}")
+metrics_dir = os.environ.setdefault('METRICS_DIR', _default_metrics_dir)
+
+
+def on_starting(server):
+    """Master: start with no metric files left over from a previous run"""
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+
+
+def on_exit(server):
+    """Master: remove the per-master metrics directory"""
+    if metrics_dir == _default_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def when_ready(server):
+    """Master: load shared model data before the first worker is forked"""
+    if not preload_app:
+        return
+    import app as service
+
+    service.initialize_services(preload_only=True)
+
+
+def post_worker_init(worker):
+    """Start model loading in the freshly booted worker"""
+    # Imported here: the worker has already loaded app.py, so this is the same module
+    import app as service
+
+    # Runs in a background thread so a slow first-time model download or
+    # bootstrap training cannot trip the worker boot timeout
+    service.initialize_services(background=True)
+    worker.log.info(f"🔥 Worker {worker.pid}: model warm-up started")
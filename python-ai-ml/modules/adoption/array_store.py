@@ -0,0 +1,66 @@
+"""
+Memory-mapped storage for large model arrays
+
+Big numpy arrays (SVD factor / predicted-rating matrices, K-Means centroids)
+are mirrored next to the model pickle as plain .npy files and served with
+mmap_mode='r'. Every gunicorn worker then maps the same page-cache pages
+instead of holding a private unpickled copy.
+
+    models/adoption_svd_model.pkl                    <- source of truth
+    models/adoption_svd_model.predicted_ratings.npy  <- shared read-only copy
+    ...
+
+The pickle stays the source of truth: a sidecar is only used when it matches
+the pickled array, so backups/rollbacks of the .pkl files keep working.
+"""
+
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def sidecar_path(model_path, name):
+    """Path of the .npy file mirroring array `name` of the model at model_path"""
+    base, _ = os.path.splitext(model_path)
+    return f"{base}.{name}.npy"
+
+
+def _write_sidecar(path, array):
+    """Write then rename, so workers mapping the old file keep a consistent view"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def share_arrays(model_path, arrays):
+    """
+    Swap in-memory model arrays for read-only memory maps of .npy sidecars
+
+    Args:
+        model_path: Path of the model pickle the arrays belong to
+        arrays: dict of name -> numpy array (None values are passed through)
+
+    Returns:
+        dict of name -> np.memmap (or the original array if mapping failed)
+    """
+    shared = {}
+    for name, array in arrays.items():
+        if array is None or not isinstance(array, np.ndarray):
+            shared[name] = array
+            continue
+
+        path = sidecar_path(model_path, name)
+        try:
+            mapped = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+            if mapped is None or mapped.shape != array.shape or not np.array_equal(mapped, array):
+                _write_sidecar(path, array)
+                mapped = np.load(path, mmap_mode='r')
+            shared[name] = mapped
+        except Exception as e:
+            logger.warning(f"Could not memory-map {name} for {model_path}: {e}")
+            shared[name] = array
+
+    return shared
@@ -16,6 +16,7 @@ import joblib
 import os
 from datetime import datetime
 import logging
+from .array_store import share_arrays
 
 logger = logging.getLogger(__name__)
 
@@ -511,14 +512,20 @@ class CollaborativeFilter:
         try:
             if os.path.exists(self.model_path):
                 model_data = joblib.load(self.model_path)
-                self.U = model_data['U']
+                # Serve the big matrices from memory-mapped .npy files shared by all workers
+                arrays = share_arrays(self.model_path, {
+                    'U': model_data['U'],
+                    'Vt': model_data['Vt'],
+                    'predicted_ratings': model_data['predicted_ratings']
+                })
+                self.U = arrays['U']
                 self.sigma = model_data['sigma']
-                self.Vt = model_data['Vt']
+                self.Vt = arrays['Vt']
                 self.user_index = model_data['user_index']
                 self.pet_index = model_data['pet_index']
                 self.global_mean = model_data['global_mean']
                 self.user_means = model_data['user_means']
-                self.predicted_ratings = model_data['predicted_ratings']
+                self.predicted_ratings = arrays['predicted_ratings']
                 self.n_factors = model_data.get('n_factors', 20)
                 self.trained = model_data['trained']
                 self.training_date = model_data['training_date']
@@ -17,6 +17,11 @@ import json
 import os
 from typing import List, Dict, Optional
 
+from .pet_features import (
+    CONTENT_FEATURES, EXERCISE_NEEDS, GROOMING_NEEDS, PetFeatures,
+    content_feature_vector, merged_profile, size_code
+)
+
 # Path for persisting adapted weights so they survive Flask restarts
 _WEIGHTS_STATE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'models', 'adoption_weights_state.json')
 
@@ -88,7 +93,23 @@ class HybridRecommender:
         Returns:
             float: Score 0-100
         """
-        score = 50.0  # Base score
+        return self.calculate_content_scores(user_profile, content_feature_vector(pet_profile).reshape(1, -1))[0]
+
+    def calculate_content_scores(self, user_profile, content_features):
+        """
+        Content-based scores of one user against many pets
+        
+        Args:
+            user_profile: User's adoption profile
+            content_features: (n_pets x len(CONTENT_FEATURES)) array of
+                content_feature_vector rows (see PetFeatures.content)
+            
+        Returns:
+            list: Score 0-100 per pet
+        """
+        pets = np.asarray(content_features, dtype=np.float64).reshape(-1, len(CONTENT_FEATURES))
+        column = dict(zip(CONTENT_FEATURES, pets.T))
+        score = np.full(len(pets), 50.0)  # Base score
         
         # Safely extract numeric values
         def _num(val, default=0):
@@ -102,10 +123,8 @@ class HybridRecommender:
         
         # Activity level match (0-20 points)
         user_activity = _num(user_profile.get('activityLevel'), 3)
-        pet_energy = _num(pet_profile.get('energyLevel'), 3)
-        activity_diff = abs(user_activity - pet_energy)
-        activity_score = max(0, 20 - (activity_diff * 5))
-        score += activity_score
+        activity_diff = np.abs(user_activity - column['energyLevel'])
+        score += np.fmax(0, 20 - (activity_diff * 5))
         
         # Size preference (0-15 points)
         # preferredSize can be an array in MongoDB (e.g., ['medium', 'large'])
@@ -114,74 +133,38 @@ class HybridRecommender:
             user_sizes = [str(s).lower() for s in raw_size_pref]
         else:
             user_sizes = [str(raw_size_pref).lower()]
-        pet_size = str(pet_profile.get('size', 'medium')).lower()
-        if pet_size in user_sizes:
-            score += 15
-        elif 'medium' in user_sizes or pet_size == 'medium':
-            score += 7
+        preferred = np.isin(column['size'], [size_code(size) for size in user_sizes])
+        medium = column['size'] == size_code('medium')
+        score += np.where(preferred, 15, np.where(('medium' in user_sizes) | medium, 7, 0))
         
         # Experience level vs trained level (0-15 points)
         user_exp = str(user_profile.get('experienceLevel', 'beginner')).lower()
-        pet_trained = str(pet_profile.get('trainedLevel', 'untrained')).lower()
-        
         exp_map = {'beginner': 1, 'first_time': 1, 'some_experience': 2, 'intermediate': 2, 'experienced': 3, 'advanced': 3, 'expert': 4}
-        trained_map = {'untrained': 1, 'basic': 2, 'intermediate': 3, 'advanced': 4}
-        
         user_exp_val = exp_map.get(user_exp, 1)
-        pet_trained_val = trained_map.get(pet_trained, 1)
-        
-        if user_exp_val >= pet_trained_val:
-            score += 15
-        else:
-            score += max(0, 15 - ((pet_trained_val - user_exp_val) * 5))
+        pet_trained_val = column['trainedLevel']
+        score += np.where(user_exp_val >= pet_trained_val, 15, np.fmax(0, 15 - ((pet_trained_val - user_exp_val) * 5)))
         
         # ===== CHILD SAFETY (CRITICAL) =====
         # Strong penalty if user has children but pet is NOT child-friendly
-        child_score = _num(pet_profile.get('childFriendlyScore'), 5)
-        has_children = bool(user_profile.get('hasChildren', False))
-        
-        if has_children:
-            if child_score >= 7:
-                score += 20  # Great with kids - full bonus
-            elif child_score >= 5:
-                score += 10  # OK with kids
-            elif child_score >= 3:
-                score -= 10  # Risky with kids - penalty
-            else:
-                score -= 25  # DANGEROUS for kids - strong penalty
+        child_score = column['childFriendlyScore']
+        if bool(user_profile.get('hasChildren', False)):
+            # Great with kids / OK with kids / risky (penalty) / DANGEROUS for kids (strong penalty)
+            score += np.select([child_score >= 7, child_score >= 5, child_score >= 3], [20, 10, -10], -25)
         else:
             score += 10  # No children - neutral bonus
         
         # ===== PET COMPATIBILITY =====
-        pet_friendly = _num(pet_profile.get('petFriendlyScore'), 5)
-        has_other_pets = bool(user_profile.get('hasOtherPets', False))
-        
-        if has_other_pets:
-            if pet_friendly >= 7:
-                score += 10  # Great with other pets
-            elif pet_friendly >= 5:
-                score += 5
-            elif pet_friendly >= 3:
-                score -= 5   # Risky
-            else:
-                score -= 15  # Not safe with other pets
+        pet_friendly = column['petFriendlyScore']
+        if bool(user_profile.get('hasOtherPets', False)):
+            score += np.select([pet_friendly >= 7, pet_friendly >= 5, pet_friendly >= 3], [10, 5, -5], -15)
         else:
             score += 5  # No other pets - neutral
         
         # ===== AGGRESSIVE TEMPERAMENT CHECK =====
-        temperament_tags = pet_profile.get('temperamentTags', [])
-        if not isinstance(temperament_tags, list):
-            temperament_tags = []
-        aggressive_tags = {'aggressive', 'bites', 'dangerous', 'attack', 'territorial', 'reactive'}
-        for tag in temperament_tags:
-            if str(tag).lower() in aggressive_tags:
-                score -= 20  # Aggressive pet penalty
-                break
+        score -= 20 * column['aggressive']  # Aggressive pet penalty
         
         # Space requirements (0-10 points)
         user_space = str(user_profile.get('livingSpace', user_profile.get('homeType', 'apartment'))).lower()
-        exercise_needs = str(pet_profile.get('exerciseNeeds', 'moderate')).lower()
-        
         space_scores = {
             'apartment': {'minimal': 10, 'moderate': 7, 'high': 3, 'very_high': 0},
             'house': {'minimal': 10, 'moderate': 10, 'high': 8, 'very_high': 6},
@@ -189,8 +172,9 @@ class HybridRecommender:
             'house_large': {'minimal': 10, 'moderate': 10, 'high': 10, 'very_high': 10},
             'farm': {'minimal': 10, 'moderate': 10, 'high': 10, 'very_high': 10}
         }
-        
-        score += space_scores.get(user_space, {}).get(exercise_needs, 5)
+        # Points per EXERCISE_NEEDS index; the last entry (index -1) is for other values
+        space_points = [space_scores.get(user_space, {}).get(need, 5) for need in EXERCISE_NEEDS] + [5]
+        score += np.take(space_points, column['exerciseNeeds'].astype(np.intp))
         
         # Time commitment (0-10 points)
         # Map workSchedule (actual MongoDB field) to a time-availability bucket.
@@ -208,35 +192,29 @@ class HybridRecommender:
             _schedule_time_map.get(_work_schedule)
             or str(user_profile.get('availableTime', 'moderate')).lower()
         )
-        grooming = str(pet_profile.get('groomingNeeds', 'moderate')).lower()
-        
         time_scores = {
             'limited': {'low': 10, 'moderate': 5, 'high': 0},
             'moderate': {'low': 10, 'moderate': 10, 'high': 5},
             'flexible': {'low': 10, 'moderate': 10, 'high': 10}
         }
-        
-        score += time_scores.get(user_time, {}).get(grooming, 5)
+        time_points = [time_scores.get(user_time, {}).get(need, 5) for need in GROOMING_NEEDS] + [5]
+        score += np.take(time_points, column['groomingNeeds'].astype(np.intp))
         
         # ===== BUDGET SCORING (0-10 points) =====
         # Compare pet adoptionFee against user's stated monthly budget.
         # adoptionFee is a one-time cost; budget is monthly — use 2x monthly as proxy ceiling.
-        adoption_fee = _num(pet_profile.get('adoptionFee'), 0)
+        adoption_fee = column['adoptionFee']
         user_budget = _num(user_profile.get('monthlyBudget') or user_profile.get('budget'), 0)
-        if user_budget > 0 and adoption_fee > 0:
+        if user_budget > 0:
             budget_ceiling = user_budget * 2   # user can typically afford 2 months' worth as one-time
-            if adoption_fee <= user_budget:
-                score += 10   # Well within budget
-            elif adoption_fee <= budget_ceiling:
-                score += 5    # Affordable stretch
-            elif adoption_fee <= budget_ceiling * 1.5:
-                score -= 5    # Over budget
-            else:
-                score -= 15   # Significantly over budget
+            # Well within budget / affordable stretch / over budget / significantly over budget
+            budget_points = np.select(
+                [adoption_fee <= user_budget, adoption_fee <= budget_ceiling, adoption_fee <= budget_ceiling * 1.5],
+                [10, 5, -5], -15
+            )
+            score += np.where(adoption_fee > 0, budget_points, 0)
         
-        logger.debug(f"Content score breakdown: activity={activity_score:.0f}, child={child_score}, pet_friendly={pet_friendly}, has_children={has_children}, final={min(100, max(0, score)):.1f}")
-        
-        return min(100, max(0, score))
+        return [min(100, max(0, value)) for value in score.tolist()]
     
     def recommend_hybrid(
         self,
@@ -244,7 +222,8 @@ class HybridRecommender:
         user_profile: Dict,
         available_pets: List[Dict],
         top_n: int = 10,
-        algorithm: str = 'hybrid'
+        algorithm: str = 'hybrid',
+        pet_features: Optional[PetFeatures] = None
     ) -> List[Dict]:
         """
         Generate hybrid recommendations combining all algorithms
@@ -255,6 +234,8 @@ class HybridRecommender:
             available_pets: List of available pets
             top_n: Number of recommendations
             algorithm: 'hybrid', 'content', 'collaborative', 'success', 'clustering'
+            pet_features: PetFeatures of available_pets if already built
+                (e.g. by the pet catalogue); built here otherwise
             
         Returns:
             List of ranked recommendations
@@ -287,9 +268,42 @@ class HybridRecommender:
                 else:
                     active_weights = self.weights.copy()
             
+            # Every pet is featurized once; the sub-models below read these arrays
+            # instead of parsing each pet's dict again
+            if pet_features is None:
+                pet_features = PetFeatures.from_pets(available_pets, self.xgb_model, self.kmeans_model)
+            
+            content_scores = None
+            if algorithm in ['hybrid', 'content']:
+                content_scores = self.calculate_content_scores(user_profile, pet_features.content)
+            
+            # FIX #3: Pass neutral 50.0 instead of content_score to prevent
+            # double-counting (content score already has its own 30% weight).
+            # XGBoost should predict success from raw user+pet features alone.
+            success_results = None
+            if algorithm in ['hybrid', 'success'] and self.algorithm_availability['success']:
+                try:
+                    # One scaler.transform / predict_proba for all pets
+                    success_results = self.xgb_model.predict_success_batch(
+                        user_profile,
+                        [pet.get('compatibilityProfile', {}) for pet in available_pets],
+                        50.0,  # Neutral — decouple XGBoost from content score bias
+                        pet_features=pet_features.success
+                    )
+                except Exception as e:
+                    logger.debug(f"Success prediction failed: {str(e)}")
+            
+            cluster_ids = None
+            cluster_affinities = {}  # Affinity depends only on the cluster: computed once per cluster
+            if algorithm in ['hybrid', 'clustering'] and self.algorithm_availability['clustering']:
+                try:
+                    cluster_ids = self.kmeans_model.assign_clusters(pet_features.clustering).tolist()
+                except Exception as e:
+                    logger.warning(f"Batch cluster assignment failed, assigning per pet: {str(e)}")
+            
             recommendations = []
             
-            for pet in available_pets:
+            for i, pet in enumerate(available_pets):
                 try:
                     pet_id = str(pet.get('_id', pet.get('petId', '')))
                     compat_profile = pet.get('compatibilityProfile', {})
@@ -297,22 +311,7 @@ class HybridRecommender:
                     # ── compatibilityProfile quality gate ──────────────────────────────
                     # Count how many numeric fields have usable values.
                     # Profiles with <4 valid numeric fields degrade ML accuracy significantly.
-                    _REQUIRED_NUMERIC_FIELDS = [
-                        'energyLevel', 'childFriendlyScore', 'petFriendlyScore',
-                        'strangerFriendlyScore', 'maxHoursAlone', 'estimatedMonthlyCost',
-                        'trainedLevel',
-                    ]
-                    def _is_numeric_valid(v):
-                        if v is None or v == '': return False
-                        if isinstance(v, bool): return True
-                        try:
-                            return float(v) >= 0
-                        except (TypeError, ValueError):
-                            return False
-                    _valid_count = sum(
-                        1 for f in _REQUIRED_NUMERIC_FIELDS
-                        if _is_numeric_valid(compat_profile.get(f))
-                    ) if compat_profile else 0
+                    _valid_count = int(pet_features.valid_fields[i])
                     _incomplete_profile = _valid_count < 4
                     # ──────────────────────────────────────────────────────────────────
                     
@@ -358,15 +357,9 @@ class HybridRecommender:
                     
                     # FIX #4: Merge root-level temperamentTags with compat_profile tags
                     # so aggressive pets are penalised whether tags live in the root
-                    # document OR inside compatibilityProfile.
-                    root_tags = pet.get('temperamentTags', [])
-                    compat_tags = compat_profile.get('temperamentTags', [])
-                    all_tags = list({str(t).lower() for t in (root_tags if isinstance(root_tags, list) else []) + (compat_tags if isinstance(compat_tags, list) else [])})
-                    merged_compat = {**compat_profile}
-                    if all_tags:
-                        merged_compat['temperamentTags'] = all_tags
-                    # Budget: include adoptionFee so calculate_content_score can score it
-                    merged_compat['adoptionFee'] = pet.get('adoptionFee', 0)
+                    # document OR inside compatibilityProfile (used by the XAI report;
+                    # the scores read the same merged profile through pet_features).
+                    merged_compat = merged_profile(pet)
 
                     # Flag incomplete profiles in explanations
                     if _incomplete_profile:
@@ -376,7 +369,7 @@ class HybridRecommender:
 
                     # 1. Content-Based Score (always available)
                     if algorithm in ['hybrid', 'content']:
-                        content_score = self.calculate_content_score(user_profile, merged_compat)
+                        content_score = content_scores[i]
                         # Cap incomplete-profile pets at 35 to avoid false high scores
                         if _incomplete_profile:
                             content_score = min(content_score, 35.0)
@@ -416,17 +409,10 @@ class HybridRecommender:
                             logger.warning(f"CF prediction failed for pet {pet_id}: {str(e)}")
                     
                     # 3. Success Prediction Score
-                    if algorithm in ['hybrid', 'success'] and self.algorithm_availability['success']:
+                    if success_results is not None:
                         try:
-                            # FIX #3: Pass neutral 50.0 instead of content_score to prevent
-                            # double-counting (content score already has its own 30% weight).
-                            # XGBoost should predict success from raw user+pet features alone.
-                            xgb_result = self.xgb_model.predict_success_probability(
-                                user_profile,
-                                compat_profile,
-                                50.0  # Neutral — decouple XGBoost from content score bias
-                            )
-                            # predict_success_probability returns dict: {successProbability, confidence, trained}
+                            xgb_result = success_results[i]
+                            # predict_success_batch returns one dict per pet: {successProbability, confidence, trained}
                             if isinstance(xgb_result, dict):
                                 success_pct = xgb_result.get('successProbability', 50.0)
                             else:
@@ -444,15 +430,21 @@ class HybridRecommender:
                     # 4. Clustering Score
                     if algorithm in ['hybrid', 'clustering'] and self.algorithm_availability['clustering']:
                         try:
-                            cluster_info = self.kmeans_model.assign_pet_to_cluster(merged_compat)
-                            cluster_id = cluster_info.get('clusterId', 0)
-                            cluster_affinity = self.kmeans_model.calculate_cluster_affinity(
-                                user_profile,
-                                cluster_id
-                            )
+                            if cluster_ids is not None:
+                                cluster_id = cluster_ids[i]
+                                cluster_name = self.kmeans_model.cluster_names.get(cluster_id, f'Cluster {cluster_id}')
+                            else:
+                                cluster_info = self.kmeans_model.assign_pet_to_cluster(merged_compat)
+                                cluster_id = cluster_info.get('clusterId', 0)
+                                cluster_name = cluster_info.get('clusterName', 'Unknown')
+                            if cluster_id not in cluster_affinities:
+                                cluster_affinities[cluster_id] = self.kmeans_model.calculate_cluster_affinity(
+                                    user_profile,
+                                    cluster_id
+                                )
+                            cluster_affinity = cluster_affinities[cluster_id]
                             scores['clustering'] = cluster_affinity
                             
-                            cluster_name = cluster_info.get('clusterName', 'Unknown')
                             logger.debug(f"K-Means: pet={pet.get('name','?')}, cluster={cluster_name}({cluster_id}), affinity={cluster_affinity:.1f}")
                             if cluster_affinity >= 70:
                                 explanations.append(f"Perfect match for {cluster_name}")
@@ -553,8 +545,11 @@ class HybridRecommender:
                     # Add cluster info if available
                     if scores['clustering'] > 0:
                         try:
-                            cluster_info = self.kmeans_model.assign_pet_to_cluster(merged_compat)
-                            recommendation['clusterName'] = cluster_info.get('clusterName', 'Unknown')
+                            if cluster_ids is not None:
+                                recommendation['clusterName'] = self.kmeans_model.cluster_names.get(cluster_ids[i], f'Cluster {cluster_ids[i]}')
+                            else:
+                                cluster_info = self.kmeans_model.assign_pet_to_cluster(merged_compat)
+                                recommendation['clusterName'] = cluster_info.get('clusterName', 'Unknown')
                         except:
                             pass
                     
@@ -837,7 +832,8 @@ class HybridRecommender:
         user_id: str,
         user_profile: Dict,
         available_pets: List[Dict],
-        top_n: int = 10
+        top_n: int = 10,
+        pet_features: Optional[PetFeatures] = None
     ) -> Dict:
         """
         Compare all algorithms side-by-side for research analysis
@@ -847,6 +843,7 @@ class HybridRecommender:
             user_profile: User profile
             available_pets: Available pets
             top_n: Number of results per algorithm
+            pet_features: PetFeatures of available_pets if already built
             
         Returns:
             dict: Comparison results
@@ -855,6 +852,10 @@ class HybridRecommender:
         
         results = {}
         
+        # Featurize once for all algorithms
+        if pet_features is None:
+            pet_features = PetFeatures.from_pets(available_pets, self.xgb_model, self.kmeans_model)
+        
         for algo in algorithms:
             # Skip if algorithm not available
             if algo != 'content' and algo != 'hybrid':
@@ -871,7 +872,8 @@ class HybridRecommender:
                     user_profile,
                     available_pets,
                     top_n,
-                    algorithm=algo
+                    algorithm=algo,
+                    pet_features=pet_features
                 )
                 
                 results[algo] = {
@@ -2,10 +2,119 @@
 Smart Pet-Adopter Matching Engine
 Uses content-based filtering to match users with compatible pets
 """
+import operator
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 
 
+EXPERIENCE_LEVELS = {'first_time': 1, 'some_experience': 2, 'experienced': 3, 'expert': 4}
+
+# (minimum overall score, compatibility level, color), best first
+COMPATIBILITY_LEVELS = [
+    (85, "Excellent Match", "green"),
+    (70, "Great Match", "blue"),
+    (55, "Good Match", "yellow"),
+    (None, "Fair Match", "orange")
+]
+
+
+def _number_column(values, default=np.nan) -> np.ndarray:
+    """Float column; None (and non-numeric values) become default"""
+    try:
+        # None converts to NaN
+        column = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan, dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+    if not np.isnan(default):
+        column[np.isnan(column)] = default
+    return column
+
+
+def _flag_column(values) -> np.ndarray:
+    """Truthiness as 1.0 / 0.0, NaN where the value is None"""
+    return np.array([np.nan if value is None else float(bool(value)) for value in values], dtype=np.float64)
+
+
+def _category_column(values) -> Tuple[np.ndarray, List]:
+    """Integer codes into a list of the distinct values (None included)"""
+    vocabulary = {}
+    codes = np.fromiter((vocabulary.setdefault(value, len(vocabulary)) for value in values),
+                        dtype=np.intp, count=len(values))
+    return codes, list(vocabulary)
+
+
+class PetColumns:
+    """
+    A pet list converted once into numpy columns
+    
+    Holds every compatibility field the six sub-scores read, so one user can
+    be scored against thousands of pets with array operations instead of a
+    Python call per pet.
+    """
+    
+    def __init__(self, pets: List[Dict]):
+        profiles = [pet.get('compatibilityProfile') or {} for pet in pets]
+        self.count = len(pets)
+        self.has_profile = np.array([bool(profile) for profile in profiles], dtype=bool)
+        
+        def field(name, default=None):
+            get = operator.methodcaller('get', name, default)
+            return list(map(get, profiles))
+        
+        self.pet_size, self.size_values = _category_column(field('size'))
+        self.needs_yard = _flag_column(field('needsYard'))
+        self.can_apartment = _flag_column(field('canLiveInApartment'))
+        self.min_home_size = _number_column(field('minHomeSize', 0), default=0.0)
+        
+        self.energy = _number_column(field('energyLevel'))
+        self.max_hours_alone = _number_column(field('maxHoursAlone'))
+        self.can_be_alone = _flag_column(field('canBeLeftAlone'))
+        
+        self.requires_experienced = _flag_column(field('requiresExperiencedOwner'))
+        training, training_values = _category_column(field('trainingNeeds'))
+        self.training_known = np.array([value is not None for value in training_values], dtype=bool)[training]
+        self.training_high = np.array([value == 'high' for value in training_values], dtype=bool)[training]
+        
+        self.child_friendly = _number_column(field('childFriendlyScore'))
+        self.pet_friendly = _number_column(field('petFriendlyScore'))
+        
+        self.adoption_fee = _number_column([pet.get('adoptionFee', 0) for pet in pets], default=0.0)
+        self.monthly_cost = _number_column(field('estimatedMonthlyCost'), default=100.0)
+        
+        self.species, self.species_values = _category_column(
+            [str(pet.get('species') or '').lower() for pet in pets]
+        )
+    
+    def __len__(self):
+        return self.count
+    
+    def take(self, indices) -> 'PetColumns':
+        """Columns of the pets at indices, without re-reading their dicts"""
+        indices = np.asarray(indices, dtype=np.intp)
+        subset = PetColumns.__new__(PetColumns)
+        for name, value in vars(self).items():
+            setattr(subset, name, value[indices] if isinstance(value, np.ndarray) else value)
+        subset.count = len(indices)
+        return subset
+    
+    def size_known(self) -> np.ndarray:
+        """Per-pet mask: compatibility size is set"""
+        return np.array([value is not None for value in self.size_values], dtype=bool)[self.pet_size]
+    
+    def size_in(self, sizes) -> np.ndarray:
+        """Per-pet mask: compatibility size is one of sizes"""
+        return np.array([value in sizes for value in self.size_values], dtype=bool)[self.pet_size]
+    
+    def species_in(self, species) -> np.ndarray:
+        """Per-pet mask: lower-cased species is one of species"""
+        return np.array([value in species for value in self.species_values], dtype=bool)[self.species]
+
+
 class PetAdopterMatcher:
     """
     Intelligent matching system for pet adoption
@@ -33,81 +142,47 @@ class PetAdopterMatcher:
         Returns:
             Dictionary with score and breakdown
         """
-        scores = {}
+        scores = self.score_columns(user_profile, PetColumns([pet_profile]))
+        match_result = self._score_only_details(scores, [0])[0]
+        match_result['match_reasons'], match_result['warnings'] = self.explain_match(user_profile, pet_profile)
+        return match_result
+    
+    def explain_match(self, user_profile: Dict, pet_profile: Dict) -> Tuple[List[str], List[str]]:
+        """
+        Reasons and warnings behind a match score (scores come from score_columns)
+        
+        Args:
+            user_profile: User's adoption profile data
+            pet_profile: Pet's compatibility profile data
+            
+        Returns:
+            Tuple of (top 5 match reasons, warnings)
+        """
         reasons = []
         warnings = []
         
-        # 1. Living Space Compatibility (20 points)
-        living_score, living_reasons = self._score_living_space(user_profile, pet_profile)
-        scores['living_space'] = living_score
-        reasons.extend(living_reasons)
-        
-        # 2. Activity Level Match (25 points)
-        activity_score, activity_reasons = self._score_activity_match(user_profile, pet_profile)
-        scores['activity'] = activity_score
-        reasons.extend(activity_reasons)
-        
-        # 3. Experience Match (15 points)
-        experience_score, exp_reasons = self._score_experience(user_profile, pet_profile)
-        scores['experience'] = experience_score
-        reasons.extend(exp_reasons)
-        
-        # 4. Family Safety (20 points)
-        family_score, family_reasons, family_warnings = self._score_family_compatibility(user_profile, pet_profile)
-        scores['family'] = family_score
+        # Same order as the score breakdown
+        reasons.extend(self._explain_living_space(user_profile, pet_profile))
+        reasons.extend(self._explain_activity_match(user_profile, pet_profile))
+        reasons.extend(self._explain_experience(user_profile, pet_profile))
+        family_reasons, family_warnings = self._explain_family_compatibility(user_profile, pet_profile)
         reasons.extend(family_reasons)
         warnings.extend(family_warnings)
+        reasons.extend(self._explain_budget(user_profile, pet_profile))
+        reasons.extend(self._explain_preferences(user_profile, pet_profile))
         
-        # 5. Budget Match (10 points)
-        budget_score, budget_reasons = self._score_budget(user_profile, pet_profile)
-        scores['budget'] = budget_score
-        reasons.extend(budget_reasons)
-        
-        # 6. Preference Match (10 points)
-        pref_score, pref_reasons = self._score_preferences(user_profile, pet_profile)
-        scores['preferences'] = pref_score
-        reasons.extend(pref_reasons)
-        
-        # Calculate weighted total
-        total_score = sum(scores.values())
-        
-        # Determine compatibility level
-        if total_score >= 85:
-            compatibility = "Excellent Match"
-            color = "green"
-        elif total_score >= 70:
-            compatibility = "Great Match"
-            color = "blue"
-        elif total_score >= 55:
-            compatibility = "Good Match"
-            color = "yellow"
-        else:
-            compatibility = "Fair Match"
-            color = "orange"
-        
-        return {
-            'overall_score': round(total_score, 1),
-            'compatibility_level': compatibility,
-            'color': color,
-            'score_breakdown': scores,
-            'match_reasons': reasons[:5],  # Top 5 reasons
-            'warnings': warnings,
-            'success_probability': self._predict_success_probability(total_score, user_profile, pet_profile)
-        }
+        return reasons[:5], warnings  # Top 5 reasons
     
-    def _score_living_space(self, user: Dict, pet: Dict) -> Tuple[float, List[str]]:
-        """Score based on living space compatibility"""
-        score = 0
+    def _explain_living_space(self, user: Dict, pet: Dict) -> List[str]:
+        """Reasons for the living space score"""
         reasons = []
-        max_score = 20
         
         adoption_profile = user.get('adoptionProfile', {})
         compat_profile = pet.get('compatibilityProfile', {})
         
         # Check if compatibility profile exists
         if not compat_profile:
-            reasons.append(f"⚠️ Pet compatibility profile not set - using neutral scoring")
-            return 10, reasons  # Return neutral score
+            return [f"⚠️ Pet compatibility profile not set - using neutral scoring"]
         
         home_type = adoption_profile.get('homeType')
         home_size = adoption_profile.get('homeSize', 0)
@@ -121,56 +196,42 @@ class PetAdopterMatcher:
         
         # Skip if critical fields are missing
         if pet_size is None or needs_yard is None or can_apartment is None:
-            reasons.append(f"⚠️ Incomplete pet profile - living space compatibility unknown")
-            return 10, reasons  # Neutral score
+            return [f"⚠️ Incomplete pet profile - living space compatibility unknown"]
         
         # Home type compatibility
         if home_type == 'apartment':
             if can_apartment and pet_size == 'small':
-                score += 10
                 reasons.append(f"✓ {pet.get('breed', 'Pet')} is perfect for apartment living")
             elif can_apartment and pet_size == 'medium':
-                score += 7
                 reasons.append(f"✓ {pet.get('breed', 'Pet')} can adapt to apartment life")
             elif not can_apartment:
-                score += 2
                 reasons.append(f"⚠️ {pet.get('breed', 'Pet')} may struggle in apartment")
         elif home_type in ['house', 'farm']:
-            score += 10
             reasons.append(f"✓ Your {home_type} provides great space")
         
         # Yard requirement
         if needs_yard:
             if has_yard:
-                score += 10
                 reasons.append(f"✓ You have a yard - perfect for {pet.get('breed', 'Pet')}!")
             else:
-                score += 3
                 reasons.append(f"⚠️ {pet.get('breed', 'Pet')} really needs a yard")
-        else:
-            score += 10
         
         # Home size check
-        if home_size and home_size >= min_home_size:
+        if home_size and home_size >= (min_home_size or 0):
             reasons.append(f"✓ Your home size ({home_size} sq ft) is adequate")
-        elif min_home_size > 0:
-            score = score * 0.8  # Reduce score slightly
         
-        return min(score, max_score), reasons
+        return reasons
     
-    def _score_activity_match(self, user: Dict, pet: Dict) -> Tuple[float, List[str]]:
-        """Score based on activity level compatibility"""
-        score = 0
+    def _explain_activity_match(self, user: Dict, pet: Dict) -> List[str]:
+        """Reasons for the activity score"""
         reasons = []
-        max_score = 25
         
         adoption_profile = user.get('adoptionProfile', {})
         compat_profile = pet.get('compatibilityProfile', {})
         
         # Check if compatibility profile exists
         if not compat_profile:
-            reasons.append(f"⚠️ Pet activity profile not set")
-            return 12, reasons  # Neutral score
+            return [f"⚠️ Pet activity profile not set"]
         
         user_activity = adoption_profile.get('activityLevel', 3)
         
@@ -182,49 +243,39 @@ class PetAdopterMatcher:
         
         # Skip if critical fields are missing
         if pet_energy is None or max_hours_alone is None or can_be_alone is None:
-            reasons.append(f"⚠️ Incomplete activity profile - using neutral scoring")
-            return 12, reasons  # Neutral score
+            return [f"⚠️ Incomplete activity profile - using neutral scoring"]
         
         # Activity level match
         activity_diff = abs(user_activity - pet_energy)
         if activity_diff == 0:
-            score += 15
             reasons.append(f"✓ Perfect activity match - you're both level {user_activity}")
         elif activity_diff == 1:
-            score += 12
             reasons.append(f"✓ Great activity compatibility")
         elif activity_diff == 2:
-            score += 8
             reasons.append(f"~ Activity levels mostly aligned")
         else:
-            score += 4
             reasons.append(f"⚠️ Different activity levels may require adjustment")
         
         # Alone time compatibility
         if not can_be_alone and hours_alone > 4:
-            score += 2
             reasons.append(f"⚠️ {pet.get('breed', 'Pet')} doesn't like being alone for long")
         elif hours_alone <= max_hours_alone:
-            score += 10
             reasons.append(f"✓ Your schedule works well for {pet.get('breed', 'Pet')}")
         else:
-            score += 5
             reasons.append(f"~ {pet.get('breed', 'Pet')} might need a pet sitter sometimes")
         
-        return min(score, max_score), reasons
+        return reasons
     
-    def _score_experience(self, user: Dict, pet: Dict) -> Tuple[float, List[str]]:
-        """Score based on experience level match"""
-        score = 0
+    def _explain_experience(self, user: Dict, pet: Dict) -> List[str]:
+        """Reasons for the experience score"""
         reasons = []
-        max_score = 15
         
         adoption_profile = user.get('adoptionProfile', {})
         compat_profile = pet.get('compatibilityProfile', {})
         
         # Check if compatibility profile exists
         if not compat_profile:
-            return 7, [f"⚠️ Pet experience requirements not set"]  # Neutral score
+            return [f"⚠️ Pet experience requirements not set"]
         
         experience = adoption_profile.get('experienceLevel', 'first_time')
         
@@ -235,54 +286,41 @@ class PetAdopterMatcher:
         
         # Skip if critical fields are missing
         if requires_experienced is None or training_needs is None:
-            return 7, [f"⚠️ Incomplete experience profile - using neutral scoring"]  # Neutral score
+            return [f"⚠️ Incomplete experience profile - using neutral scoring"]
         
-        experience_levels = {'first_time': 1, 'some_experience': 2, 'experienced': 3, 'expert': 4}
-        user_exp_level = experience_levels.get(experience, 1)
+        user_exp_level = EXPERIENCE_LEVELS.get(experience, 1)
         
         # Experience requirement
         if requires_experienced:
             if user_exp_level >= 3:
-                score += 10
                 reasons.append(f"✓ Your experience level is perfect for this pet")
             elif user_exp_level == 2:
-                score += 5
                 reasons.append(f"~ This pet may be challenging but manageable")
             else:
-                score += 2
                 reasons.append(f"⚠️ This pet needs an experienced owner")
         else:
-            score += 10
             reasons.append(f"✓ Great for your experience level")
         
         # Training needs
         if training_needs == 'high':
             if willing_to_train and user_exp_level >= 2:
-                score += 5
                 reasons.append(f"✓ You're ready to train {pet.get('breed', 'Pet')}")
-            elif willing_to_train:
-                score += 3
-            else:
-                score += 1
+            elif not willing_to_train:
                 reasons.append(f"⚠️ This pet needs training commitment")
-        else:
-            score += 5
         
-        return min(score, max_score), reasons
+        return reasons
     
-    def _score_family_compatibility(self, user: Dict, pet: Dict) -> Tuple[float, List[str], List[str]]:
-        """Score based on family safety and compatibility"""
-        score = 0
+    def _explain_family_compatibility(self, user: Dict, pet: Dict) -> Tuple[List[str], List[str]]:
+        """Reasons and warnings for the family safety score"""
         reasons = []
         warnings = []
-        max_score = 20
         
         adoption_profile = user.get('adoptionProfile', {})
         compat_profile = pet.get('compatibilityProfile', {})
         
         # Check if compatibility profile exists
         if not compat_profile:
-            return 10, [f"⚠️ Pet family compatibility not set"], []  # Neutral score
+            return [f"⚠️ Pet family compatibility not set"], []
         
         has_children = adoption_profile.get('hasChildren', False)
         children_ages = adoption_profile.get('childrenAges', [])
@@ -294,59 +332,45 @@ class PetAdopterMatcher:
         
         # Skip if critical fields are missing
         if child_friendly is None or pet_friendly is None:
-            return 10, [f"⚠️ Incomplete family compatibility profile"], []  # Neutral score
+            return [f"⚠️ Incomplete family compatibility profile"], []
         
         # Children compatibility
         if has_children:
             youngest = min(children_ages) if children_ages else 0
             if child_friendly >= 8:
-                score += 10
                 reasons.append(f"✓ Excellent with children!")
             elif child_friendly >= 6:
-                score += 7
                 reasons.append(f"✓ Good with children")
             elif child_friendly >= 4:
-                score += 4
                 reasons.append(f"~ May need supervision with young children")
                 if youngest < 5:
                     warnings.append(f"Careful supervision needed with children under 5")
             else:
-                score += 1
                 warnings.append(f"Not recommended for homes with children")
-        else:
-            score += 10
         
         # Other pets compatibility
         if has_other_pets:
             if pet_friendly >= 8:
-                score += 10
                 reasons.append(f"✓ Gets along great with other pets")
             elif pet_friendly >= 6:
-                score += 7
                 reasons.append(f"✓ Can live with other pets")
             elif pet_friendly >= 4:
-                score += 4
                 reasons.append(f"~ Slow introduction to other pets recommended")
             else:
-                score += 1
                 warnings.append(f"Prefers to be the only pet")
-        else:
-            score += 10
         
-        return min(score, max_score), reasons, warnings
+        return reasons, warnings
     
-    def _score_budget(self, user: Dict, pet: Dict) -> Tuple[float, List[str]]:
-        """Score based on budget compatibility"""
-        score = 0
+    def _explain_budget(self, user: Dict, pet: Dict) -> List[str]:
+        """Reasons for the budget score"""
         reasons = []
-        max_score = 10
         
         adoption_profile = user.get('adoptionProfile', {})
         compat_profile = pet.get('compatibilityProfile', {})
         
         # Check if compatibility profile exists
         if not compat_profile:
-            return 5, [f"⚠️ Pet cost information not set"]  # Neutral score
+            return [f"⚠️ Pet cost information not set"]
         
         monthly_budget = adoption_profile.get('monthlyBudget')
         max_adoption_fee = adoption_profile.get('maxAdoptionFee')
@@ -362,143 +386,337 @@ class PetAdopterMatcher:
         
         # Adoption fee check
         if max_adoption_fee is not None:
-            if adoption_fee <= max_adoption_fee:
-                score += 5
+            if (adoption_fee or 0) <= max_adoption_fee:
                 reasons.append(f"✓ Adoption fee (${adoption_fee}) within budget")
             else:
-                score += 1
                 reasons.append(f"⚠️ Adoption fee (${adoption_fee}) above your max")
-        else:
-            score += 5
         
         # Monthly cost check
         if monthly_budget is not None:
             if estimated_monthly <= monthly_budget:
-                score += 5
                 reasons.append(f"✓ Monthly costs (~${estimated_monthly}) fit your budget")
             elif estimated_monthly <= monthly_budget * 1.2:
-                score += 3
                 reasons.append(f"~ Monthly costs slightly above budget")
             else:
-                score += 1
                 reasons.append(f"⚠️ Monthly costs may strain your budget")
-        else:
-            score += 5
         
-        return min(score, max_score), reasons
+        return reasons
     
-    def _score_preferences(self, user: Dict, pet: Dict) -> Tuple[float, List[str]]:
-        """Score based on user preferences"""
-        score = 0
+    def _explain_preferences(self, user: Dict, pet: Dict) -> List[str]:
+        """Reasons for the preferences score"""
         reasons = []
-        max_score = 10
         
         adoption_profile = user.get('adoptionProfile', {})
         compat_profile = pet.get('compatibilityProfile', {})
         
         # Check if compatibility profile exists
         if not compat_profile:
-            return 5, [f"⚠️ Pet preferences profile not set"]  # Neutral score
+            return [f"⚠️ Pet preferences profile not set"]
         
         preferred_species = adoption_profile.get('preferredSpecies', [])
         preferred_size = adoption_profile.get('preferredSize', [])
         preferred_energy = adoption_profile.get('preferredEnergyLevel')
         
-        pet_species = pet.get('species', '').lower()
+        pet_species = (pet.get('species') or '').lower()
         # NO DEFAULTS - use actual values only
         pet_size = compat_profile.get('size')
         pet_energy = compat_profile.get('energyLevel')
         
         # Skip if critical fields are missing
         if pet_size is None or pet_energy is None:
-            return 5, [f"⚠️ Incomplete preference profile - using neutral scoring"]  # Neutral score
+            return [f"⚠️ Incomplete preference profile - using neutral scoring"]
         
         # Species preference
-        if preferred_species:
-            if pet_species in [s.lower() for s in preferred_species]:
-                score += 4
-                reasons.append(f"✓ Matches your species preference")
-            else:
-                score += 1
-        else:
-            score += 4
+        if preferred_species and pet_species in [s.lower() for s in preferred_species]:
+            reasons.append(f"✓ Matches your species preference")
         
         # Size preference
-        if preferred_size:
-            if pet_size in preferred_size:
-                score += 3
-                reasons.append(f"✓ {pet_size.capitalize()} size as preferred")
-            else:
-                score += 1
-        else:
-            score += 3
+        if preferred_size and pet_size in preferred_size:
+            reasons.append(f"✓ {pet_size.capitalize()} size as preferred")
         
         # Energy preference
-        if preferred_energy:
-            energy_diff = abs(preferred_energy - pet_energy)
-            if energy_diff <= 1:
-                score += 3
-                reasons.append(f"✓ Energy level matches preference")
-            else:
-                score += 1
-        else:
-            score += 3
+        if preferred_energy and abs(preferred_energy - pet_energy) <= 1:
+            reasons.append(f"✓ Energy level matches preference")
         
-        return min(score, max_score), reasons
+        return reasons
     
-    def _predict_success_probability(self, match_score: float, user: Dict, pet: Dict) -> float:
+    def score_columns(self, user_profile: Dict, columns: PetColumns) -> Dict[str, np.ndarray]:
         """
-        Predict adoption success probability based on match score and other factors
-        Simple rule-based for now, can be replaced with ML model trained on historical data
-        """
-        base_probability = match_score
+        All six sub-scores for every pet at once
         
-        # Adjust based on specific risk factors
-        adoption_profile = user.get('adoptionProfile', {})
+        Neutral scores are used where the pet profile (or a field a sub-score
+        needs) is missing; the _explain_* methods follow the same branches.
+        
+        Args:
+            user_profile: User's adoption profile data
+            columns: PetColumns of the pets to score
+            
+        Returns:
+            Dictionary of score_breakdown key -> array, plus 'total' and
+            'success_probability' arrays
+        """
+        profile = user_profile.get('adoptionProfile', {})
+        has_profile = columns.has_profile
+        
+        # 1. Living space
+        home_type = profile.get('homeType')
+        home_size = profile.get('homeSize', 0)
+        has_yard = profile.get('hasYard', False)
+        can_apartment = columns.can_apartment == 1
+        small = columns.size_in(('small',))
+        medium = columns.size_in(('medium',))
+        if home_type == 'apartment':
+            home_score = np.select(
+                [can_apartment & small, can_apartment & medium, ~can_apartment],
+                [10.0, 7.0, 2.0],
+                0.0
+            )
+        elif home_type in ['house', 'farm']:
+            home_score = np.full(len(columns), 10.0)
+        else:
+            home_score = np.zeros(len(columns))
+        yard_score = np.where(columns.needs_yard == 1, 10.0 if has_yard else 3.0, 10.0)
+        living = home_score + yard_score
+        if home_size:
+            small_home = ~(home_size >= columns.min_home_size) & (columns.min_home_size > 0)
+        else:
+            small_home = columns.min_home_size > 0
+        living = np.where(small_home, living * 0.8, living)
+        living_known = (columns.size_known()
+                        & ~np.isnan(columns.needs_yard) & ~np.isnan(columns.can_apartment))
+        living = np.where(has_profile & living_known, np.minimum(living, 20), 10.0)
+        
+        # 2. Activity
+        user_activity = profile.get('activityLevel', 3)
+        hours_alone = profile.get('hoursAlonePerDay', 8)
+        activity_diff = np.abs(user_activity - columns.energy)
+        activity = np.select(
+            [activity_diff == 0, activity_diff == 1, activity_diff == 2],
+            [15.0, 12.0, 8.0],
+            4.0
+        )
+        activity = activity + np.select(
+            [(columns.can_be_alone == 0) & (hours_alone > 4), hours_alone <= columns.max_hours_alone],
+            [2.0, 10.0],
+            5.0
+        )
+        activity_known = ~np.isnan(columns.energy) & ~np.isnan(columns.max_hours_alone) & ~np.isnan(columns.can_be_alone)
+        activity = np.where(has_profile & activity_known, np.minimum(activity, 25), 12.0)
+        
+        # 3. Experience
+        user_exp_level = EXPERIENCE_LEVELS.get(profile.get('experienceLevel', 'first_time'), 1)
+        willing_to_train = profile.get('willingToTrainPet', True)
+        if user_exp_level >= 3:
+            required_score = 10.0
+        elif user_exp_level == 2:
+            required_score = 5.0
+        else:
+            required_score = 2.0
+        if willing_to_train and user_exp_level >= 2:
+            training_score = 5.0
+        elif willing_to_train:
+            training_score = 3.0
+        else:
+            training_score = 1.0
+        experience = (np.where(columns.requires_experienced == 1, required_score, 10.0)
+                      + np.where(columns.training_high, training_score, 5.0))
+        experience_known = ~np.isnan(columns.requires_experienced) & columns.training_known
+        experience = np.where(has_profile & experience_known, np.minimum(experience, 15), 7.0)
+        
+        # 4. Family safety
+        def friendliness_score(scores):
+            return np.select([scores >= 8, scores >= 6, scores >= 4], [10.0, 7.0, 4.0], 1.0)
+        
+        family = (
+            (friendliness_score(columns.child_friendly) if profile.get('hasChildren', False) else 10.0)
+            + (friendliness_score(columns.pet_friendly) if profile.get('hasOtherPets', False) else 10.0)
+        )
+        family = np.broadcast_to(family, (len(columns),))
+        family_known = ~np.isnan(columns.child_friendly) & ~np.isnan(columns.pet_friendly)
+        family = np.where(has_profile & family_known, np.minimum(family, 20), 10.0)
+        
+        # 5. Budget
+        monthly_budget = profile.get('monthlyBudget')
+        max_adoption_fee = profile.get('maxAdoptionFee')
+        if max_adoption_fee is not None:
+            fee_score = np.where(columns.adoption_fee <= max_adoption_fee, 5.0, 1.0)
+        else:
+            fee_score = 5.0
+        if monthly_budget is not None:
+            cost_score = np.select(
+                [columns.monthly_cost <= monthly_budget, columns.monthly_cost <= monthly_budget * 1.2],
+                [5.0, 3.0],
+                1.0
+            )
+        else:
+            cost_score = 5.0
+        budget = np.where(has_profile, np.minimum(fee_score + cost_score, 10), 5.0)
         
-        # First-time owners with high-need pets = slight risk
-        if (adoption_profile.get('experienceLevel') == 'first_time' and 
-            pet.get('compatibilityProfile', {}).get('requiresExperiencedOwner', False)):
-            base_probability *= 0.85
+        # 6. Preferences
+        preferred_species = profile.get('preferredSpecies', [])
+        preferred_size = profile.get('preferredSize', [])
+        preferred_energy = profile.get('preferredEnergyLevel')
+        if preferred_species:
+            species_score = np.where(columns.species_in([s.lower() for s in preferred_species]), 4.0, 1.0)
+        else:
+            species_score = 4.0
+        size_score = np.where(columns.size_in(preferred_size), 3.0, 1.0) if preferred_size else 3.0
+        if preferred_energy:
+            energy_score = np.where(np.abs(preferred_energy - columns.energy) <= 1, 3.0, 1.0)
+        else:
+            energy_score = 3.0
+        preferences = np.broadcast_to(species_score + size_score + energy_score, (len(columns),))
+        preferences_known = columns.size_known() & ~np.isnan(columns.energy)
+        preferences = np.where(has_profile & preferences_known, np.minimum(preferences, 10), 5.0)
+        
+        # Same order as calculate_match_score's sum(scores.values())
+        total = living + activity + experience + family + budget + preferences
+        
+        # Success probability: first-time owners with high-need pets are a slight risk,
+        # a complete profile indicates a serious adopter
+        success = total.copy()
+        if profile.get('experienceLevel') == 'first_time':
+            success = np.where(columns.requires_experienced == 1, success * 0.85, success)
+        if profile.get('profileComplete', False):
+            success = success * 1.05
         
-        # Profile completeness indicates serious adopter
-        if adoption_profile.get('profileComplete', False):
-            base_probability *= 1.05
+        return {
+            'living_space': living,
+            'activity': activity,
+            'experience': experience,
+            'family': family,
+            'budget': budget,
+            'preferences': preferences,
+            'total': total,
+            'success_probability': success
+        }
+    
+    @staticmethod
+    def _compatibility(total_score: float) -> Tuple[str, str]:
+        """Compatibility level and color for an overall score"""
+        for threshold, level, color in COMPATIBILITY_LEVELS:
+            if threshold is None or total_score >= threshold:
+                return level, color
+    
+    @staticmethod
+    def _plain_numbers(values: np.ndarray) -> List:
+        """Array to a list of Python numbers, whole values as int"""
+        whole = values == np.floor(values)
+        numbers = values.astype(object)
+        numbers[whole] = values[whole].astype(np.int64).tolist()
+        return numbers.tolist()
+    
+    def _score_only_details(self, scores: Dict[str, np.ndarray], indices) -> List[Dict]:
+        """match_details of the given pets from score_columns output, without reason strings"""
+        keys = ('living_space', 'activity', 'experience', 'family', 'budget', 'preferences')
+        breakdowns = zip(*[self._plain_numbers(scores[key][indices]) for key in keys])
+        totals = scores['total'][indices]
+        levels = np.select(
+            [totals >= threshold for threshold, _, _ in COMPATIBILITY_LEVELS[:-1]],
+            np.arange(len(COMPATIBILITY_LEVELS) - 1),
+            len(COMPATIBILITY_LEVELS) - 1
+        ).tolist()
+        success = scores['success_probability'][indices].tolist()
+        
+        details = []
+        for total_score, level, breakdown, success_probability in zip(totals.tolist(), levels, breakdowns, success):
+            _, compatibility, color = COMPATIBILITY_LEVELS[level]
+            details.append({
+                'overall_score': round(total_score, 1),
+                'compatibility_level': compatibility,
+                'color': color,
+                'score_breakdown': dict(zip(keys, breakdown)),
+                'match_reasons': [],
+                'warnings': [],
+                'success_probability': min(round(success_probability, 1), 100)
+            })
+        return details
+    
+    def _rank(self, user_profile: Dict, pets: List[Dict], indices: np.ndarray,
+              scores: Dict[str, np.ndarray], explain_top: int) -> List[Dict]:
+        """Result entries for pets[indices] (already in rank order), explaining the first explain_top"""
+        details = self._score_only_details(scores, indices)
+        for index, match_result in zip(indices[:explain_top].tolist(), details):
+            match_result['match_reasons'], match_result['warnings'] = self.explain_match(user_profile, pets[index])
+        
+        return [
+            {
+                **pets[index],
+                'match_score': match_result['overall_score'],
+                'match_details': match_result
+            }
+            for index, match_result in zip(indices.tolist(), details)
+        ]
+    
+    @staticmethod
+    def _match_scores(scores: Dict[str, np.ndarray]) -> np.ndarray:
+        """Overall scores rounded as reported (ranking uses the reported value)"""
+        return np.array([round(total, 1) for total in scores['total'].tolist()])
+    
+    @staticmethod
+    def _top_indices(match_scores: np.ndarray, top_n: int) -> np.ndarray:
+        """
+        Indices of the top_n highest scores, best first, ties in input order
         
-        return min(round(base_probability, 1), 100)
+        np.partition finds the cut-off score in O(n); only the pets above it
+        (plus the earliest ties at it) are sorted.
+        """
+        count = len(match_scores)
+        if top_n >= count:
+            return np.argsort(-match_scores, kind='stable')
+        if top_n <= 0:
+            return np.array([], dtype=np.intp)
+        
+        cutoff = np.partition(match_scores, count - top_n)[count - top_n]
+        above = np.flatnonzero(match_scores > cutoff)
+        ties = np.flatnonzero(match_scores == cutoff)[:top_n - len(above)]
+        chosen = np.concatenate([above, ties])
+        return chosen[np.lexsort((chosen, -match_scores[chosen]))]
     
-    def rank_pets_for_user(self, user_profile: Dict, pets: List[Dict]) -> List[Dict]:
+    def rank_pets_for_user(self, user_profile: Dict, pets: List[Dict],
+                           explain_top: Optional[int] = None,
+                           columns: Optional[PetColumns] = None) -> List[Dict]:
         """
         Rank all available pets by compatibility for a specific user
         
+        Pets are ranked on the numeric scores of score_columns; reasons and
+        warnings are only built for the best explain_top pets.
+        
         Args:
             user_profile: User's profile data
             pets: List of pet profiles
+            explain_top: Number of top pets that get match_reasons/warnings
+                (None = all pets)
+            columns: PetColumns of pets if already built (e.g. the pet catalogue)
             
         Returns:
             List of pets with match scores, sorted by compatibility
         """
-        scored_pets = []
-        
-        for pet in pets:
-            match_result = self.calculate_match_score(user_profile, pet)
-            pet_with_score = {
-                **pet,
-                'match_score': match_result['overall_score'],
-                'match_details': match_result
-            }
-            scored_pets.append(pet_with_score)
+        if not pets:
+            return []
         
-        # Sort by match score (highest first)
-        scored_pets.sort(key=lambda x: x['match_score'], reverse=True)
+        scores = self.score_columns(user_profile, columns if columns is not None else PetColumns(pets))
         
-        return scored_pets
+        # Highest first; ties keep their input order
+        order = np.argsort(-self._match_scores(scores), kind='stable')
+        explain_top = len(pets) if explain_top is None else max(0, int(explain_top))
+        return self._rank(user_profile, pets, order, scores, explain_top)
     
-    def get_top_matches(self, user_profile: Dict, pets: List[Dict], top_n: int = 5) -> List[Dict]:
-        """Get top N best matches for user"""
-        ranked = self.rank_pets_for_user(user_profile, pets)
-        return ranked[:top_n]
-
+    def get_top_matches(self, user_profile: Dict, pets: List[Dict], top_n: int = 5,
+                        columns: Optional[PetColumns] = None) -> List[Dict]:
+        """
+        Get top N best matches for user
+        
+        Only the returned pets are sorted and explained. columns: PetColumns
+        of pets if already built.
+        """
+        if not pets:
+            return []
+        
+        top_n = max(0, int(top_n))
+        scores = self.score_columns(user_profile, columns if columns is not None else PetColumns(pets))
+        top = self._top_indices(self._match_scores(scores), top_n)
+        return self._rank(user_profile, pets, top, scores, top_n)
 
 # Singleton instance
 matcher = PetAdopterMatcher()
@@ -0,0 +1,290 @@
+"""
+Resident Pet Catalogue
+The backend pushes adoptable pets once (bulk load, then incremental upserts
+and deletes) and match requests only send the user profile. Pets are kept
+converted into PetColumns (matching engine) and PetFeatures (hybrid
+recommender), so a match request scores the catalogue without parsing or
+re-featurizing any pet JSON.
+
+The catalogue is mirrored to a JSON snapshot (write then rename) under a
+cross-process lock; every gunicorn worker reloads it when another worker
+changed it, so any worker can answer a match request with the latest pets.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import Config
+from .matching_engine import PetColumns
+from .pet_features import PetFeatureCache, PetFeatures
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single-process writes only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueConflict(Exception):
+    """Raised when an If-Match ETag no longer matches the catalogue"""
+
+
+def pet_id_of(pet: Dict) -> str:
+    """Catalogue key of a pet document ('_id', or 'petId' as the hybrid recommender accepts)"""
+    pet_id = pet.get('_id', pet.get('petId'))
+    return '' if pet_id is None else str(pet_id)
+
+
+class CatalogueSnapshot:
+    """One immutable version of the catalogue; requests keep using it while a newer one is built"""
+
+    def __init__(self, version: int, pets: List[Dict], digest: str, updated_at: Optional[float],
+                 feature_cache: PetFeatureCache):
+        self.version = version
+        self.pets = pets
+        self.digest = digest
+        self.updated_at = updated_at
+        pet_ids = [pet_id_of(pet) for pet in pets]
+        self.positions = {pet_id: i for i, pet_id in enumerate(pet_ids)}
+        self.columns = PetColumns(pets)
+        # Only pets added or changed since the previous version are featurized
+        self.features = feature_cache.featurize(pets, pet_ids)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}-{self.digest[:16]}"'
+
+    def __len__(self):
+        return len(self.pets)
+
+    def select(self, filters: Optional[Dict] = None) -> Tuple[List[Dict], PetColumns, PetFeatures]:
+        """
+        Pets matching filters, with their pre-built columns and features
+
+        Args:
+            filters: Optional dict of
+                petIds: only these pets (list of ids, or one id; in catalogue order)
+                species: species name or list of names
+                size: compatibility size or list of sizes
+                maxAdoptionFee: highest adoption fee
+
+        Returns:
+            Tuple of (pets, PetColumns of those pets, PetFeatures of those pets)
+        """
+        if not filters:
+            return self.pets, self.columns, self.features
+
+        mask = np.ones(len(self.pets), dtype=bool)
+
+        pet_ids = filters.get('petIds')
+        if isinstance(pet_ids, str):
+            pet_ids = [pet_ids]
+        if pet_ids is not None:
+            wanted = np.zeros(len(self.pets), dtype=bool)
+            wanted[[self.positions[str(pet_id)] for pet_id in pet_ids if str(pet_id) in self.positions]] = True
+            mask &= wanted
+
+        species = filters.get('species')
+        if species:
+            species = species if isinstance(species, list) else [species]
+            mask &= self.columns.species_in({str(s).lower() for s in species})
+
+        size = filters.get('size')
+        if size:
+            mask &= self.columns.size_in(size if isinstance(size, list) else [size])
+
+        max_fee = filters.get('maxAdoptionFee')
+        if max_fee is not None:
+            mask &= self.columns.adoption_fee <= float(max_fee)
+
+        indices = np.flatnonzero(mask)
+        return [self.pets[i] for i in indices.tolist()], self.columns.take(indices), self.features.take(indices)
+
+
+class PetCatalogue:
+    """Versioned store of adoptable pets shared by the match endpoints"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON snapshot shared by worker processes (None = this process only)
+        """
+        self.path = path or None
+        self._lock = threading.RLock()
+        self._file_state = None  # (mtime_ns, size) of the snapshot last read or written
+        self._feature_cache = PetFeatureCache()
+        self._snapshot = CatalogueSnapshot(0, [], self._digest(b'[]'), None, self._feature_cache)
+        self._read_snapshot()
+        logger.info(f"🐾 Pet catalogue: {len(self._snapshot)} pets (version {self._snapshot.version})")
+
+    @staticmethod
+    def _digest(payload: bytes) -> str:
+        return hashlib.sha256(payload).hexdigest()
+
+    # ─── snapshot file ───────────────────────────────────────────────────────
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _read_snapshot(self):
+        """Reload the snapshot file if another worker rewrote it since the last read"""
+        if not self.path:
+            return
+        with self._lock:
+            state = self._stat()
+            if state is None or state == self._file_state:
+                return
+            try:
+                with open(self.path, 'rb') as f:
+                    data = json.load(f)
+                pets = data.get('pets', [])
+                self._snapshot = CatalogueSnapshot(
+                    int(data.get('version', 0)),
+                    pets,
+                    data.get('digest') or self._digest(json.dumps(pets, sort_keys=True).encode()),
+                    data.get('updated_at'),
+                    self._feature_cache
+                )
+                self._file_state = state
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Could not read pet catalogue {self.path}: {str(e)}")
+
+    def _write_snapshot(self, snapshot: CatalogueSnapshot):
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': snapshot.version,
+                'digest': snapshot.digest,
+                'updated_at': snapshot.updated_at,
+                'pets': snapshot.pets
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._file_state = self._stat()
+
+    def _modify(self, change, if_match: Optional[str] = None) -> CatalogueSnapshot:
+        """
+        Apply change(pets dict) to the latest catalogue and publish it as a new version
+
+        Runs under a cross-process lock so concurrent writers on different
+        workers never lose each other's updates.
+        """
+        with self._lock:
+            lock_file = None
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                lock_file = open(f"{self.path}.lock", 'a')
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._read_snapshot()
+                current = self._snapshot
+                if if_match and if_match != '*' and if_match != current.etag:
+                    raise CatalogueConflict(f"Catalogue changed (current ETag {current.etag})")
+
+                pets = {pet_id_of(pet): pet for pet in current.pets}
+                change(pets)
+                pet_list = list(pets.values())
+
+                snapshot = CatalogueSnapshot(
+                    current.version + 1,
+                    pet_list,
+                    self._digest(json.dumps(pet_list, sort_keys=True).encode()),
+                    time.time(),
+                    self._feature_cache
+                )
+                if self.path:
+                    self._write_snapshot(snapshot)
+                self._snapshot = snapshot
+                return snapshot
+            finally:
+                if lock_file is not None:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    @staticmethod
+    def _keyed(pets: List[Dict]) -> Dict[str, Dict]:
+        keyed = {}
+        for pet in pets:
+            if not isinstance(pet, dict) or not pet_id_of(pet):
+                raise ValueError("Every pet needs an '_id' (or 'petId')")
+            keyed[pet_id_of(pet)] = pet
+        return keyed
+
+    # ─── public API ──────────────────────────────────────────────────────────
+
+    def snapshot(self) -> CatalogueSnapshot:
+        """Latest catalogue version (reloaded if another worker changed it)"""
+        self._read_snapshot()
+        return self._snapshot
+
+    def load(self, pets: List[Dict], if_match: Optional[str] = None) -> CatalogueSnapshot:
+        """
+        Replace the whole catalogue
+
+        Raises:
+            ValueError: a pet has no id
+            CatalogueConflict: if_match is not the current ETag
+        """
+        keyed = self._keyed(pets)
+
+        def replace(current):
+            current.clear()
+            current.update(keyed)
+
+        snapshot = self._modify(replace, if_match)
+        logger.info(f"🐾 Pet catalogue loaded: {len(snapshot)} pets (version {snapshot.version})")
+        return snapshot
+
+    def upsert(self, pets: List[Dict], if_match: Optional[str] = None) -> CatalogueSnapshot:
+        """Add pets or replace them by id (replaced pets keep their position)"""
+        keyed = self._keyed(pets)
+        return self._modify(lambda current: current.update(keyed), if_match)
+
+    def delete(self, pet_ids: List, if_match: Optional[str] = None) -> CatalogueSnapshot:
+        """Remove pets by id (unknown ids are ignored)"""
+        def remove(current):
+            for pet_id in pet_ids:
+                current.pop(str(pet_id), None)
+
+        return self._modify(remove, if_match)
+
+    def get_stats(self) -> Dict:
+        """Version and size for monitoring"""
+        snapshot = self.snapshot()
+        return {
+            'version': snapshot.version,
+            'etag': snapshot.etag,
+            'pets': len(snapshot),
+            'updatedAt': snapshot.updated_at,
+            'shared': bool(self.path),
+            'featureCacheHits': self._feature_cache.hits,
+            'featureCacheMisses': self._feature_cache.misses
+        }
+
+
+# Global instance
+_catalogue_instance = None
+_catalogue_lock = threading.Lock()
+
+def get_pet_catalogue():
+    """Get singleton pet catalogue instance"""
+    global _catalogue_instance
+    if _catalogue_instance is None:
+        with _catalogue_lock:
+            if _catalogue_instance is None:
+                _catalogue_instance = PetCatalogue(
+                    Config.PET_CATALOGUE_PATH or os.path.join(Config.MODELS_DIR, 'pet_catalogue.json')
+                )
+    return _catalogue_instance
@@ -14,6 +14,7 @@ import joblib
 import os
 from datetime import datetime
 import logging
+from .array_store import share_arrays
 
 logger = logging.getLogger(__name__)
 
@@ -444,6 +445,24 @@ class PetClusterer:
                 'error': str(e)
             }
     
+    def assign_clusters(self, feature_matrix):
+        """
+        Cluster ids for many pets from pre-extracted features
+
+        Args:
+            feature_matrix: (n_pets x len(feature_names)) array of extract_features rows
+
+        Returns:
+            numpy array of cluster ids (one scaler.transform / predict for all pets)
+        """
+        if not self.trained:
+            return np.zeros(len(feature_matrix), dtype=int)
+
+        features = np.asarray(feature_matrix, dtype=np.float64).reshape(-1, len(self.feature_names))
+        if len(features) == 0:
+            return np.zeros(0, dtype=int)
+        return self.model.predict(self.scaler.transform(features)).astype(int)
+
     def calculate_cluster_affinity(self, user_profile, pet_cluster_id):
         """
         Calculate how well a user's preferences match a pet cluster.
@@ -615,6 +634,12 @@ class PetClusterer:
                 
                 self.scaler = joblib.load(self.scaler_path)
                 
+                # Centroids are served from a memory-mapped .npy shared by all workers
+                if self.model is not None:
+                    self.model.cluster_centers_ = share_arrays(
+                        self.model_path, {'cluster_centers': self.model.cluster_centers_}
+                    )['cluster_centers']
+                
                 logger.info(f"Model loaded from {self.model_path}")
                 logger.info(f"Clusters: {self.optimal_k}, Names: {list(self.cluster_names.values())}")
                 return True
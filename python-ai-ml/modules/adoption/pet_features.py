@@ -0,0 +1,220 @@
+"""
+Pet Featurization for the Hybrid Recommender
+Every sub-model of the hybrid reads the same pet dicts: content scoring,
+XGBoost feature engineering and K-Means cluster features. PetFeatures turns a
+pet list into one contiguous float matrix per sub-model, so a recommendation
+request only does per-user work. PetFeatureCache keeps the rows per pet id +
+profile hash, so catalogue updates only featurize the pets that changed.
+"""
+
+import hashlib
+import json
+import threading
+import numpy as np
+from typing import Dict, List
+
+# Pet side of HybridRecommender.calculate_content_score, one column each
+CONTENT_FEATURES = [
+    'energyLevel', 'size', 'trainedLevel', 'childFriendlyScore', 'petFriendlyScore',
+    'aggressive', 'exerciseNeeds', 'groomingNeeds', 'adoptionFee'
+]
+EXERCISE_NEEDS = ['minimal', 'moderate', 'high', 'very_high']  # exerciseNeeds column: index, -1 = other
+GROOMING_NEEDS = ['low', 'moderate', 'high']  # groomingNeeds column: index, -1 = other
+TRAINED_LEVELS = {'untrained': 1, 'basic': 2, 'intermediate': 3, 'advanced': 4}
+AGGRESSIVE_TAGS = {'aggressive', 'bites', 'dangerous', 'attack', 'territorial', 'reactive'}
+
+# compatibilityProfile fields that must hold usable numbers for full-accuracy scoring
+REQUIRED_NUMERIC_FIELDS = [
+    'energyLevel', 'childFriendlyScore', 'petFriendlyScore',
+    'strangerFriendlyScore', 'maxHoursAlone', 'estimatedMonthlyCost',
+    'trainedLevel',
+]
+
+# Lower-cased size strings -> codes stored in the size column (shared by all matrices)
+_size_codes: Dict[str, int] = {}
+_size_codes_lock = threading.Lock()
+
+
+def size_code(size: str, add: bool = False) -> int:
+    """Code of a lower-cased size string (-1 if unknown and add is False)"""
+    code = _size_codes.get(size)
+    if code is None and add:
+        with _size_codes_lock:
+            code = _size_codes.setdefault(size, len(_size_codes))
+    return -1 if code is None else code
+
+
+def merged_profile(pet: Dict) -> Dict:
+    """
+    compatibilityProfile with root-level temperamentTags merged in and adoptionFee added
+
+    Aggressive pets are penalised whether tags live in the root document or
+    inside compatibilityProfile; adoptionFee lets content scoring rate budget.
+    """
+    compat_profile = pet.get('compatibilityProfile', {})
+    root_tags = pet.get('temperamentTags', [])
+    compat_tags = compat_profile.get('temperamentTags', [])
+    all_tags = list({str(t).lower() for t in (root_tags if isinstance(root_tags, list) else []) + (compat_tags if isinstance(compat_tags, list) else [])})
+    merged = {**compat_profile}
+    if all_tags:
+        merged['temperamentTags'] = all_tags
+    merged['adoptionFee'] = pet.get('adoptionFee', 0)
+    return merged
+
+
+def valid_field_count(compat_profile: Dict) -> int:
+    """Number of REQUIRED_NUMERIC_FIELDS with usable values"""
+    def is_numeric_valid(v):
+        if v is None or v == '': return False
+        if isinstance(v, bool): return True
+        try:
+            return float(v) >= 0
+        except (TypeError, ValueError):
+            return False
+
+    if not compat_profile:
+        return 0
+    return sum(1 for f in REQUIRED_NUMERIC_FIELDS if is_numeric_valid(compat_profile.get(f)))
+
+
+def _content_num(val, default=0):
+    """Number parsing of calculate_content_score (strings like 'yes' fall back to default)"""
+    if val is None: return float(default)
+    if isinstance(val, bool): return 1.0 if val else 0.0
+    if isinstance(val, (int, float)): return float(val)
+    if isinstance(val, str):
+        try: return float(val)
+        except ValueError: return float(default)
+    return float(default)
+
+
+def content_feature_vector(profile: Dict) -> np.ndarray:
+    """Pet side of calculate_content_score for a merged profile, in CONTENT_FEATURES order"""
+    tags = profile.get('temperamentTags', [])
+    if not isinstance(tags, list):
+        tags = []
+    exercise = str(profile.get('exerciseNeeds', 'moderate')).lower()
+    grooming = str(profile.get('groomingNeeds', 'moderate')).lower()
+    return np.array([
+        _content_num(profile.get('energyLevel'), 3),
+        size_code(str(profile.get('size', 'medium')).lower(), add=True),
+        TRAINED_LEVELS.get(str(profile.get('trainedLevel', 'untrained')).lower(), 1),
+        _content_num(profile.get('childFriendlyScore'), 5),
+        _content_num(profile.get('petFriendlyScore'), 5),
+        1.0 if any(str(tag).lower() in AGGRESSIVE_TAGS for tag in tags) else 0.0,
+        EXERCISE_NEEDS.index(exercise) if exercise in EXERCISE_NEEDS else -1,
+        GROOMING_NEEDS.index(grooming) if grooming in GROOMING_NEEDS else -1,
+        _content_num(profile.get('adoptionFee'), 0),
+    ], dtype=np.float64)
+
+
+def profile_hash(pet: Dict) -> str:
+    """Hash of everything featurization reads from a pet"""
+    payload = json.dumps(
+        [pet.get('compatibilityProfile'), pet.get('temperamentTags'), pet.get('adoptionFee')],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _featurize_pet(pet: Dict, success_predictor, clusterer):
+    """(content row, success row, clustering row, valid field count) of one pet"""
+    compat_profile = pet.get('compatibilityProfile', {})
+    # Pets without a usable profile get default rows; the recommender does not score them
+    merged = merged_profile(pet) if compat_profile and isinstance(compat_profile, dict) else {}
+    return (
+        content_feature_vector(merged),
+        success_predictor.pet_feature_vector(merged),
+        clusterer.extract_features(merged)[0],
+        valid_field_count(compat_profile) if merged else 0
+    )
+
+
+def _default_models(success_predictor, clusterer):
+    # Feature extraction only needs the classes' parsing rules, not trained models
+    if success_predictor is None:
+        from .success_predictor import SuccessPredictor
+        success_predictor = SuccessPredictor()
+    if clusterer is None:
+        from .pet_clustering import PetClusterer
+        clusterer = PetClusterer()
+    return success_predictor, clusterer
+
+
+class PetFeatures:
+    """
+    Feature matrices of a pet list, row i = pets[i]
+
+    Attributes:
+        content: (n x len(CONTENT_FEATURES)) for calculate_content_scores
+        success: (n x len(PET_FEATURES)) for SuccessPredictor.engineer_features_batch
+        clustering: (n x 8) PetClusterer.extract_features rows
+        valid_fields: REQUIRED_NUMERIC_FIELDS with usable values per pet
+    """
+
+    def __init__(self, content, success, clustering, valid_fields):
+        self.content = np.ascontiguousarray(content, dtype=np.float64)
+        self.success = np.ascontiguousarray(success, dtype=np.float64)
+        self.clustering = np.ascontiguousarray(clustering, dtype=np.float64)
+        self.valid_fields = np.asarray(valid_fields, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.valid_fields)
+
+    @classmethod
+    def from_rows(cls, rows: List, success_width: int, clustering_width: int) -> 'PetFeatures':
+        if not rows:
+            return cls(np.zeros((0, len(CONTENT_FEATURES))), np.zeros((0, success_width)),
+                       np.zeros((0, clustering_width)), [])
+        content, success, clustering, valid_fields = zip(*rows)
+        return cls(np.vstack(content), np.vstack(success), np.vstack(clustering), valid_fields)
+
+    @classmethod
+    def from_pets(cls, pets: List[Dict], success_predictor=None, clusterer=None) -> 'PetFeatures':
+        """Featurize a pet list (no caching, e.g. pets posted with a request)"""
+        success_predictor, clusterer = _default_models(success_predictor, clusterer)
+        rows = [_featurize_pet(pet, success_predictor, clusterer) for pet in pets]
+        return cls.from_rows(rows, len(success_predictor.pet_feature_vector({})), len(clusterer.feature_names))
+
+    def take(self, indices) -> 'PetFeatures':
+        """Features of the pets at indices"""
+        indices = np.asarray(indices, dtype=np.intp)
+        return PetFeatures(self.content[indices], self.success[indices], self.clustering[indices],
+                           self.valid_fields[indices])
+
+
+class PetFeatureCache:
+    """Feature rows per pet id, reused while the pet's profile hash is unchanged"""
+
+    def __init__(self, success_predictor=None, clusterer=None):
+        self.success_predictor, self.clusterer = _default_models(success_predictor, clusterer)
+        self._rows = {}  # pet id -> (profile hash, feature row tuple)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def featurize(self, pets: List[Dict], pet_ids: List[str]) -> PetFeatures:
+        """
+        PetFeatures of pets (ids given in the same order), featurizing only new or changed pets
+
+        Entries of pets no longer in the list are dropped.
+        """
+        rows = []
+        with self._lock:
+            cached = self._rows
+            fresh = {}
+            for pet_id, pet in zip(pet_ids, pets):
+                digest = profile_hash(pet)
+                entry = cached.get(pet_id)
+                if entry is not None and entry[0] == digest:
+                    self.hits += 1
+                else:
+                    entry = (digest, _featurize_pet(pet, self.success_predictor, self.clusterer))
+                    self.misses += 1
+                fresh[pet_id] = entry
+                rows.append(entry[1])
+            self._rows = fresh
+
+        return PetFeatures.from_rows(
+            rows, len(self.success_predictor.pet_feature_vector({})), len(self.clusterer.feature_names)
+        )
@@ -2,8 +2,12 @@
 Species identification service for Adoption module
 """
 import logging
+import time
+import numpy as np
 from utils.image_processor import ImageProcessor
 from utils.model_loader import ModelLoader
+from utils.result_cache import get_result_cache
+from utils.metrics import IDENTIFICATION_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -21,16 +25,48 @@ class AdoptionSpeciesIdentifier:
     
     def identify(self, image_source):
         """Identify species and breed for adoption pets"""
-        if self.model is None:
-            self.initialize()
+        start_time = time.time()
+        cache = get_result_cache() if self.image_processor.is_cacheable(image_source) else None
+        if cache is not None:
+            cache_key = cache.make_key(image_source, module='adoption', top_k=5,
+                                       **self.model_loader.cache_params())
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info("⚡ Species identification served from result cache")
+                IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='adoption', outcome='cache_hit')
+                return cached
         
-        img_array = self.image_processor.load_and_preprocess_image(image_source)
-        predictions = self.model.predict(img_array, verbose=0)
-        decoded = self.model_loader.decode_predictions(predictions, top=5)
+        try:
+            if self.model is None:
+                self.initialize()
+            
+            # Shares the forward pass with petshop identification of the same upload
+            probabilities = self.model_loader.predict_image(image_source)
+            result = self.result_from_probabilities(probabilities)
+        except ValueError:
+            # Raised by the image decode: the upload is not a readable image
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='adoption', outcome='invalid_image')
+            raise
+        except Exception:
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='adoption', outcome='error')
+            raise
+        if cache is not None:
+            cache.set(cache_key, result)
+        IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='adoption', outcome='success')
+        return result
+    
+    def result_from_probabilities(self, probabilities):
+        """Build the adoption identify result from an already computed probability vector"""
+        decoded = self.model_loader.decode_predictions(probabilities[np.newaxis], top=5)
         pet_info = self.model_loader.map_to_pet_info(decoded)
         
+        # Species summed over all ImageNet classes: steadier than the top breed's species
+        distribution = self.model_loader.species_probabilities(probabilities)
+        
         return {
             'success': True,
             'predictions': pet_info,
+            'species': max(distribution, key=distribution.get),
+            'species_distribution': distribution,
             'module': 'adoption'
         }
@@ -20,6 +20,14 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Pet-only inputs of engineer_features (see SuccessPredictor.pet_feature_vector)
+PET_FEATURES = [
+    'petSize_encoded', 'energyLevel', 'trainingNeeds_encoded', 'trainedLevel_encoded',
+    'childFriendlyScore', 'petFriendlyScore', 'strangerFriendlyScore',
+    'needsYard', 'canLiveInApartment', 'canBeLeftAlone', 'maxHoursAlone',
+    'estimatedMonthlyCost', 'noiseLevel_encoded'
+]
+
 
 class SuccessPredictor:
     """
@@ -77,28 +85,18 @@ class SuccessPredictor:
             return value.strip().lower() in ('true', 'yes', '1')
         return default
         
-    def engineer_features(self, user_profile, pet_profile, content_match_score):
+    def user_features(self, user_profile):
         """
-        Engineer features from user and pet profiles.
-        Uses _safe_num/_safe_bool for robust handling of real MongoDB data.
+        User half of engineer_features (same for every pet in a recommendation request)
         
-        Args:
-            user_profile: User's adoption profile
-            pet_profile: Pet's compatibility profile
-            content_match_score: Score from content-based matching
-            
         Returns:
-            numpy array of features
+            dict of feature name -> float
         """
-        # Ensure inputs are dicts
         if not isinstance(user_profile, dict):
             user_profile = {}
-        if not isinstance(pet_profile, dict):
-            pet_profile = {}
         
         features = {}
         
-        # === USER FEATURES ===
         # Living situation
         home_type_map = {'apartment': 1, 'house': 2, 'farm': 3, 'condo': 1.5}
         features['homeType_encoded'] = home_type_map.get(str(user_profile.get('homeType', 'house')).lower(), 2.0)
@@ -130,7 +128,22 @@ class SuccessPredictor:
         features['monthlyBudget'] = self._safe_num(user_profile.get('monthlyBudget'), 100)
         features['maxAdoptionFee'] = self._safe_num(user_profile.get('maxAdoptionFee'), 500)
         
-        # === PET FEATURES ===
+        return features
+    
+    def pet_feature_vector(self, pet_profile):
+        """
+        Pet half of engineer_features, in PET_FEATURES order
+        
+        Depends only on the pet, so it can be computed once per pet and cached.
+        
+        Returns:
+            numpy array of len(PET_FEATURES) floats
+        """
+        if not isinstance(pet_profile, dict):
+            pet_profile = {}
+        
+        features = {}
+        
         # Size & Energy
         size_map = {'small': 1, 'medium': 2, 'large': 3}
         features['petSize_encoded'] = size_map.get(str(pet_profile.get('size', 'medium')).lower(), 2.0)
@@ -158,22 +171,59 @@ class SuccessPredictor:
         noise_map = {'quiet': 1, 'moderate': 2, 'vocal': 3}
         features['noiseLevel_encoded'] = noise_map.get(str(pet_profile.get('noiseLevel', 'moderate')).lower(), 2.0)
         
+        return np.array([float(features[name]) for name in PET_FEATURES], dtype=np.float64)
+    
+    def engineer_features(self, user_profile, pet_profile, content_match_score):
+        """
+        Engineer features from user and pet profiles.
+        Uses _safe_num/_safe_bool for robust handling of real MongoDB data.
+        
+        Args:
+            user_profile: User's adoption profile
+            pet_profile: Pet's compatibility profile
+            content_match_score: Score from content-based matching
+            
+        Returns:
+            numpy array of features
+        """
+        return self.engineer_features_batch(
+            self.user_features(user_profile),
+            self.pet_feature_vector(pet_profile).reshape(1, -1),
+            content_match_score
+        )
+    
+    def engineer_features_batch(self, user_features, pet_vectors, content_match_score):
+        """
+        engineer_features for one user and many pets at once
+        
+        Args:
+            user_features: Output of user_features()
+            pet_vectors: (n_pets x len(PET_FEATURES)) array of pet_feature_vector() rows
+            content_match_score: Score from content-based matching (same for all pets)
+            
+        Returns:
+            (n_pets x n_features) numpy array, columns in feature_names order
+        """
+        pet_vectors = np.asarray(pet_vectors, dtype=np.float64).reshape(-1, len(PET_FEATURES))
+        count = len(pet_vectors)
+        
+        features = {name: np.full(count, float(value)) for name, value in user_features.items()}
+        features.update((name, pet_vectors[:, i]) for i, name in enumerate(PET_FEATURES))
+        
         # === INTERACTION FEATURES ===
-        features['contentMatchScore'] = self._safe_num(content_match_score, 50)
+        features['contentMatchScore'] = np.full(count, self._safe_num(content_match_score, 50))
         
         # Calculated compatibility features
-        features['activityMatch'] = 5.0 - abs(features['activityLevel'] - features['energyLevel'])
-        features['budgetMatch'] = 1.0 if features['monthlyBudget'] >= features['estimatedMonthlyCost'] else 0.0
-        features['yardMatch'] = 1.0 if (not features['needsYard'] or features['hasYard']) else 0.0
-        features['childSafety'] = features['childFriendlyScore'] if features['hasChildren'] else 10.0
-        features['petCompatibility'] = features['petFriendlyScore'] if features['hasOtherPets'] else 10.0
-        features['aloneTimeMatch'] = 1.0 if features['hoursAlonePerDay'] <= features['maxHoursAlone'] else 0.0
-        
-        # Convert to list in consistent order - ALL values guaranteed to be float
-        feature_list = [float(features[key]) for key in sorted(features.keys())]
-        self.feature_names = sorted(features.keys())
+        features['activityMatch'] = 5.0 - np.abs(features['activityLevel'] - features['energyLevel'])
+        features['budgetMatch'] = (features['monthlyBudget'] >= features['estimatedMonthlyCost']).astype(np.float64)
+        features['yardMatch'] = ((features['needsYard'] == 0) | (features['hasYard'] != 0)).astype(np.float64)
+        features['childSafety'] = features['childFriendlyScore'] if user_features['hasChildren'] else np.full(count, 10.0)
+        features['petCompatibility'] = features['petFriendlyScore'] if user_features['hasOtherPets'] else np.full(count, 10.0)
+        features['aloneTimeMatch'] = (features['hoursAlonePerDay'] <= features['maxHoursAlone']).astype(np.float64)
         
-        return np.array(feature_list, dtype=np.float64).reshape(1, -1)
+        # Columns in consistent (sorted) order - ALL values guaranteed to be float
+        self.feature_names = sorted(features.keys())
+        return np.column_stack([features[name] for name in self.feature_names])
     
     def prepare_training_data(self, training_data):
         """
@@ -343,45 +393,74 @@ class SuccessPredictor:
         Returns:
             dict: Success probability and confidence
         """
+        return self.predict_success_batch(user_profile, [pet_profile], content_match_score)[0]
+    
+    def predict_success_batch(self, user_profile, pet_profiles, content_match_score=50.0, pet_features=None):
+        """
+        Predict adoption success for one user and many pets
+        
+        Builds the (n_pets x n_features) matrix in one pass, scales it once and
+        calls predict_proba once, instead of one single-row call per pet.
+        
+        Args:
+            user_profile: User's adoption profile
+            pet_profiles: List of pet compatibility profiles
+            content_match_score: Score from content-based matching (same for all pets)
+            pet_features: Optional (n_pets x len(PET_FEATURES)) pet_feature_vector rows
+                already built for pet_profiles (the profiles are then not parsed)
+            
+        Returns:
+            list: One predict_success_probability-style dict per pet
+        """
         if not self.trained:
             # Return neutral prediction if not trained
             logger.warning("Model not trained, returning neutral prediction")
-            return {
+            return [{
                 'successProbability': 75.0,
                 'confidence': 50.0,
                 'trained': False
-            }
+            } for _ in pet_profiles]
         
         try:
+            if len(pet_profiles) == 0:
+                return []
+            
             # Engineer features
-            features = self.engineer_features(user_profile, pet_profile, content_match_score)
+            if pet_features is None:
+                pet_features = np.array([self.pet_feature_vector(profile) for profile in pet_profiles])
+            features = self.engineer_features_batch(self.user_features(user_profile), pet_features, content_match_score)
             
             # Scale features
             features_scaled = self.scaler.transform(features)
             
             # Predict probability
-            proba = self.model.predict_proba(features_scaled)[0]
-            success_prob = proba[1] * 100  # Probability of class 1 (success)
+            proba = self.model.predict_proba(features_scaled)
+            success_prob = proba[:, 1] * 100  # Probability of class 1 (success)
             
             # Confidence based on how decisive the prediction is
             # High confidence when probability is close to 0 or 100
-            confidence = abs(success_prob - 50) * 2
+            confidence = np.abs(success_prob - 50) * 2
             
-            return {
-                'successProbability': float(success_prob),
-                'failureProbability': float(proba[0] * 100),
-                'confidence': float(confidence),
-                'trained': True
-            }
+            return [
+                {
+                    'successProbability': success,
+                    'failureProbability': failure,
+                    'confidence': conf,
+                    'trained': True
+                }
+                for success, failure, conf in zip(
+                    success_prob.tolist(), (proba[:, 0] * 100).tolist(), confidence.tolist()
+                )
+            ]
             
         except Exception as e:
             logger.error(f"Error predicting success: {str(e)}")
-            return {
+            return [{
                 'successProbability': 75.0,
                 'confidence': 50.0,
                 'trained': True,
                 'error': str(e)
-            }
+            } for _ in pet_profiles]
     
     def get_feature_importance(self, top_n=10):
         """Get top N most important features"""
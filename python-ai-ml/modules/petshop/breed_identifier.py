@@ -4,8 +4,13 @@ Uses MobileNetV2 for real-time breed recognition
 """
 import logging
 import time
+import numpy as np
+from config.settings import Config
 from utils.image_processor import ImageProcessor
 from utils.model_loader import ModelLoader
+from utils.result_cache import get_result_cache
+from utils.embedding_index import get_embedding_index
+from utils.metrics import IDENTIFICATION_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -40,56 +45,51 @@ class PetshopBreedIdentifier:
         """
         start_time = time.time()
         
+        # Same photo uploaded again (or retried by the backend): skip decode + inference
+        cache = get_result_cache() if self.image_processor.is_cacheable(image_source) else None
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(image_source, module='petshop', top_k=top_k,
+                                       **self.model_loader.cache_params())
+            cached = cache.get(cache_key)
+            if cached is not None:
+                cached['processing_time'] = f"{time.time() - start_time:.6f}s"
+                cached['cached'] = True
+                logger.info("⚡ Breed identification served from result cache")
+                IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop', outcome='cache_hit')
+                return cached
+        
         try:
             # Ensure model is loaded
             if self.model is None:
                 self.initialize()
             
-            # Preprocess image (works with bytes, path, or file object)
-            logger.info("Processing image in memory...")
-            img_array = self.image_processor.load_and_preprocess_image(image_source)
-            
-            # Make prediction
+            # Class probabilities (upload, bytes, path, or file object); shared with
+            # the other identification views of the same upload. Decoding also
+            # validates the image.
             logger.info("Running inference...")
-            predictions = self.model.predict(img_array, verbose=0)
-            
-            # Decode predictions
-            decoded = self.model_loader.decode_predictions(predictions, top=top_k)
-            
-            # Map to pet information
-            pet_info = self.model_loader.map_to_pet_info(decoded)
-            
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            
-            # Filter results with confidence threshold
-            filtered_results = [
-                result for result in pet_info 
-                if result['confidence'] >= 0.1  # 10% minimum confidence
-            ]
+            probabilities = self.model_loader.predict_image(image_source)
             
-            # Determine primary species
-            primary_species = 'Unknown'
-            if filtered_results:
-                primary_species = filtered_results[0]['species']
-            
-            logger.info(f"✅ Identification complete in {processing_time:.3f}s")
-            logger.info(f"Top prediction: {filtered_results[0]['breed'] if filtered_results else 'Unknown'} "
-                       f"({filtered_results[0]['confidence']*100:.1f}%)" if filtered_results else "No confident predictions")
+            result = self.result_from_probabilities(probabilities, top_k, start_time)
+            if cache_key is not None:
+                cache.set(cache_key, result)
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop', outcome='success')
+            return result
             
+        except ValueError as e:
+            # Raised by the image decode: the upload is not a readable image
+            logger.warning(f"⚠️ Invalid image: {str(e)}")
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop', outcome='invalid_image')
             return {
-                'success': True,
-                'predictions': filtered_results,
-                'primary_species': primary_species,
-                'primary_breed': filtered_results[0]['breed'] if filtered_results else 'Unknown',
-                'confidence': filtered_results[0]['confidence'] if filtered_results else 0.0,
-                'processing_time': f"{processing_time:.3f}s",
-                'model': 'MobileNetV2',
-                'timestamp': time.time()
+                'success': False,
+                'error': f"Invalid image file: {str(e)}",
+                'invalid_image': True,
+                'predictions': [],
+                'processing_time': f"{time.time() - start_time:.3f}s"
             }
-            
         except Exception as e:
             logger.error(f"❌ Error identifying breed: {str(e)}")
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop', outcome='error')
             return {
                 'success': False,
                 'error': str(e),
@@ -97,58 +97,267 @@ class PetshopBreedIdentifier:
                 'processing_time': f"{time.time() - start_time:.3f}s"
             }
     
-    def identify_species_only(self, image_source):
+    def result_from_probabilities(self, probabilities, top_k=5, start_time=None):
+        """
+        Build an identify_breed result from an already computed probability vector
+        
+        Args:
+            probabilities: Array of shape (1000,) from ModelLoader.predict_image
+            top_k: Number of top predictions to return
+            start_time: When the request started (for processing_time)
+            
+        Returns:
+            Dictionary with predictions and metadata
+        """
+        decoded = self.model_loader.decode_predictions(probabilities[np.newaxis], top=top_k)
+        processing_time = time.time() - start_time if start_time is not None else 0.0
+        return self._build_result(decoded, processing_time)
+    
+    def _build_result(self, decoded, processing_time):
+        """
+        Turn decoded predictions for one image into the API result dictionary
+        
+        Args:
+            decoded: List of (class_id, class_name, probability) tuples
+            processing_time: Seconds spent on this image
+            
+        Returns:
+            Dictionary with predictions and metadata
+        """
+        # Map to pet information
+        pet_info = self.model_loader.map_to_pet_info(decoded)
+        
+        # Filter results with confidence threshold
+        filtered_results = [
+            result for result in pet_info 
+            if result['confidence'] >= 0.1  # 10% minimum confidence
+        ]
+        
+        # Determine primary species
+        primary_species = 'Unknown'
+        if filtered_results:
+            primary_species = filtered_results[0]['species']
+        
+        logger.info(f"✅ Identification complete in {processing_time:.3f}s")
+        logger.info(f"Top prediction: {filtered_results[0]['breed'] if filtered_results else 'Unknown'} "
+                   f"({filtered_results[0]['confidence']*100:.1f}%)" if filtered_results else "No confident predictions")
+        
+        return {
+            'success': True,
+            'predictions': filtered_results,
+            'primary_species': primary_species,
+            'primary_breed': filtered_results[0]['breed'] if filtered_results else 'Unknown',
+            'confidence': filtered_results[0]['confidence'] if filtered_results else 0.0,
+            'processing_time': f"{processing_time:.3f}s",
+            'model': 'MobileNetV2',
+            'timestamp': time.time()
+        }
+    
+    def identify_species_only(self, image_source, mode=None):
         """
         Identify only the species (Dog, Cat, Bird, etc.)
         
         Args:
             image_source: Image as bytes, file path, or file object
+            mode: 'aggregate' (species probability mass over all classes) or
+                'top1' (species of the top breed); defaults to Config.SPECIES_MODE
             
         Returns:
             Dictionary with species information
         """
+        start_time = time.time()
         try:
-            result = self.identify_breed(image_source, top_k=3)
-            
-            if result['success']:
-                return {
-                    'success': True,
-                    'species': result['primary_species'],
-                    'confidence': result['confidence'],
-                    'processing_time': result['processing_time']
-                }
-            else:
-                return result
-                
+            if self.model is None:
+                self.initialize()
+            
+            probabilities = self.model_loader.predict_image(image_source)
+            result = self.species_from_probabilities(probabilities, mode, start_time)
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop_species', outcome='success')
+            return result
+            
+        except ValueError as e:
+            logger.warning(f"⚠️ Invalid image: {str(e)}")
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop_species', outcome='invalid_image')
+            return {
+                'success': False,
+                'error': f"Invalid image file: {str(e)}",
+                'invalid_image': True
+            }
         except Exception as e:
             logger.error(f"Error identifying species: {str(e)}")
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop_species', outcome='error')
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def batch_identify(self, image_sources):
+    def species_from_probabilities(self, probabilities, mode=None, start_time=None):
         """
-        Identify breeds for multiple images
+        Species answer from an already computed probability vector
+        
+        In 'aggregate' mode the softmax is summed over every ImageNet class
+        mapped to each species, so e.g. an image split across five terrier
+        classes is still confidently a Dog. The distribution sums to 1, with
+        'Unknown' holding the mass of non-pet classes.
         
         Args:
-            image_sources: List of image sources (bytes, paths, or file objects)
+            probabilities: Array of shape (1000,) from ModelLoader.predict_image
+            mode: 'aggregate' or 'top1' (defaults to Config.SPECIES_MODE)
+            start_time: When the request started (for processing_time)
             
         Returns:
-            List of identification results
+            Dictionary with species, confidence and (aggregate mode) distribution
         """
-        results = []
+        mode = (mode or Config.SPECIES_MODE).lower()
+        if mode == 'top1':
+            return self.species_view(self.result_from_probabilities(probabilities, 3, start_time))
         
-        for image_source in image_sources:
-            result = self.identify_breed(image_source)
-            results.append(result)
+        distribution = self.model_loader.species_probabilities(probabilities)
+        species = max(distribution, key=distribution.get)
+        processing_time = time.time() - start_time if start_time is not None else 0.0
         
+        logger.info(f"✅ Species: {species} ({distribution[species]*100:.1f}% aggregated)")
         return {
             'success': True,
-            'results': results,
-            'total_processed': len(image_sources)
+            'species': species,
+            'confidence': distribution[species],
+            'distribution': distribution,
+            'mode': 'aggregate',
+            'processing_time': f"{processing_time:.3f}s"
         }
     
+    @staticmethod
+    def species_view(result):
+        """
+        Reduce a breed identification result to its species answer
+        
+        Args:
+            result: Result from identify_breed
+            
+        Returns:
+            Dictionary with species information (or the failed result as-is)
+        """
+        if not result['success']:
+            return result
+        return {
+            'success': True,
+            'species': result['primary_species'],
+            'confidence': result['confidence'],
+            'mode': 'top1',
+            'processing_time': result['processing_time']
+        }
+    
+    def batch_identify(self, image_sources, top_k=5):
+        """
+        Identify breeds for multiple images with a single forward pass
+        
+        All images are decoded and preprocessed first, stacked into one
+        N x 224 x 224 x 3 tensor and run through the model together.
+        Images that fail to decode get an error entry at their position
+        instead of failing the whole batch.
+        
+        Args:
+            image_sources: List of image sources (bytes, paths, or file objects)
+            top_k: Number of top predictions to return per image
+            
+        Returns:
+            Dictionary with per-image results (in input order) and batch metadata
+        """
+        start_time = time.time()
+        
+        try:
+            # Ensure model is loaded
+            if self.model is None:
+                self.initialize()
+            
+            batch, valid_indices, errors = self.image_processor.load_and_preprocess_batch(image_sources)
+            
+            results = [None] * len(image_sources)
+            for index, error in errors.items():
+                logger.warning(f"Skipping image {index} in batch: {error}")
+                results[index] = {
+                    'success': False,
+                    'error': error,
+                    'predictions': []
+                }
+            
+            if batch is not None:
+                logger.info(f"Running batched inference on {len(valid_indices)} images...")
+                predictions = self.model_loader.predict(batch)
+                decoded_batch = self.model_loader.decode_batch_predictions(predictions, top=top_k)
+                
+                # Amortise the shared batch time across the images in it
+                per_image_time = (time.time() - start_time) / len(valid_indices)
+                for index, decoded in zip(valid_indices, decoded_batch):
+                    results[index] = self._build_result(decoded, per_image_time)
+            
+            processing_time = time.time() - start_time
+            logger.info(f"✅ Batch of {len(image_sources)} images identified in {processing_time:.3f}s")
+            IDENTIFICATION_SECONDS.observe(processing_time, module='petshop_batch', outcome='success')
+            
+            return {
+                'success': True,
+                'results': results,
+                'total_processed': len(valid_indices),
+                'total_failed': len(errors),
+                'processing_time': f"{processing_time:.3f}s"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Error in batch identification: {str(e)}")
+            IDENTIFICATION_SECONDS.observe(time.time() - start_time, module='petshop_batch', outcome='error')
+            return {
+                'success': False,
+                'error': str(e),
+                'results': [],
+                'processing_time': f"{time.time() - start_time:.3f}s"
+            }
+
+    def stream_identify(self, image_sources, top_k=5, chunk_size=8):
+        """
+        Identify breeds for a stream of images, one batched forward pass per chunk
+
+        Sources are pulled from the iterable only chunk_size at a time and the
+        chunk's results are yielded before the next chunk is read, so memory
+        stays bounded by the chunk size however many images are sent, and a
+        slow consumer pauses decoding instead of letting results pile up.
+
+        Args:
+            image_sources: Iterable of (key, image_source) pairs; sources may be read lazily
+            top_k: Number of top predictions to return per image
+            chunk_size: Number of images per forward pass
+
+        Yields:
+            (key, result) pairs, in input order
+        """
+        chunk_size = max(1, int(chunk_size))
+        chunk = []
+
+        for item in image_sources:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield from self._identify_chunk(chunk, top_k)
+                chunk = []
+
+        if chunk:
+            yield from self._identify_chunk(chunk, top_k)
+
+    def _identify_chunk(self, chunk, top_k):
+        """Run batch_identify on one chunk of (key, source) pairs and pair results with keys"""
+        keys = [key for key, _ in chunk]
+        result = self.batch_identify([source for _, source in chunk], top_k=top_k)
+
+        if not result['success']:
+            for key in keys:
+                yield key, {
+                    'success': False,
+                    'error': result.get('error', 'Batch identification failed'),
+                    'predictions': []
+                }
+            return
+
+        yield from zip(keys, result['results'])
+
     def get_breed_suggestions(self, image_source, species_filter=None):
         """
         Get breed suggestions filtered by species
@@ -160,8 +369,20 @@ class PetshopBreedIdentifier:
         Returns:
             Filtered breed suggestions
         """
-        result = self.identify_breed(image_source, top_k=10)
+        return self.filter_by_species(self.identify_breed(image_source, top_k=10), species_filter)
+    
+    @staticmethod
+    def filter_by_species(result, species_filter=None):
+        """
+        Keep only the predictions of one species
         
+        Args:
+            result: Result from identify_breed
+            species_filter: Species to keep (e.g., 'Dog', 'Cat'); None keeps everything
+            
+        Returns:
+            The result with filtered predictions
+        """
         if not result['success']:
             return result
         
@@ -175,3 +396,72 @@ class PetshopBreedIdentifier:
             result['filtered_by'] = species_filter
         
         return result
+    
+    def add_reference(self, image_source, breed, species=None, pet_id=None, **extra):
+        """
+        Add a labelled reference image to the embedding index (no retraining)
+        
+        Args:
+            image_source: Image as bytes, file path, or file object
+            breed: Known breed label of the pet in the image
+            species: Species label (optional)
+            pet_id: Id of the pet in the backend (optional)
+            **extra: Any other JSON-serialisable metadata to return with matches
+            
+        Returns:
+            Dictionary with the new reference id and the index size
+        """
+        if self.model is None:
+            self.initialize()
+        
+        embedding = self.model_loader.embed_image(image_source)
+        index = get_embedding_index()
+        reference_id = index.add(embedding, {'breed': breed, 'species': species, 'pet_id': pet_id, **extra})
+        
+        logger.info(f"📚 Added reference #{reference_id} ({breed}) to the embedding index")
+        return {
+            'success': True,
+            'reference_id': reference_id,
+            'total_references': len(index)
+        }
+    
+    def find_similar(self, image_source, k=5):
+        """
+        Find the k most similar labelled reference pets
+        
+        Args:
+            image_source: Image as bytes, file path, or file object
+            k: Number of neighbours to return
+            
+        Returns:
+            Dictionary with the neighbours and a similarity-weighted breed ranking
+        """
+        start_time = time.time()
+        try:
+            if self.model is None:
+                self.initialize()
+            
+            index = get_embedding_index()
+            neighbours = index.search(self.model_loader.embed_image(image_source), k=k)
+            
+            return {
+                'success': True,
+                'similar': neighbours,
+                'breeds': index.vote_breeds(neighbours),
+                'total_references': len(index),
+                'processing_time': f"{time.time() - start_time:.3f}s"
+            }
+            
+        except ValueError as e:
+            logger.warning(f"⚠️ Invalid image: {str(e)}")
+            return {
+                'success': False,
+                'error': f"Invalid image file: {str(e)}",
+                'invalid_image': True
+            }
+        except Exception as e:
+            logger.error(f"❌ Error searching similar pets: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
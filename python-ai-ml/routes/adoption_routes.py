@@ -1,12 +1,88 @@
 """
 Adoption matching routes for AI/ML service
 """
-from flask import Blueprint, request, jsonify
+import math
+from flask import Blueprint, Response, request, jsonify
+from config.settings import Config
 from modules.adoption.matching_engine import matcher
 
 adoption_bp = Blueprint('adoption', __name__, url_prefix='/api/adoption')
 
 
+def _catalogue_filters(filters):
+    """
+    Validate and normalise the request's catalogue filters
+
+    Raises:
+        ValueError: a filter has the wrong type (the message is returned with a 400)
+    """
+    if filters is None:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object')
+    filters = dict(filters)
+
+    pet_ids = filters.get('petIds')
+    if isinstance(pet_ids, str):
+        filters['petIds'] = [pet_ids]
+    elif pet_ids is not None and not isinstance(pet_ids, list):
+        raise ValueError('filters.petIds must be a list of pet ids')
+
+    for name in ('species', 'size'):
+        value = filters.get(name)
+        if value is not None and not isinstance(value, str) and not (
+                isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise ValueError(f'filters.{name} must be a string or a list of strings')
+
+    max_fee = filters.get('maxAdoptionFee')
+    if max_fee is not None:
+        try:
+            max_fee = math.nan if isinstance(max_fee, bool) else float(max_fee)
+        except (TypeError, ValueError):
+            max_fee = math.nan
+        if not math.isfinite(max_fee):
+            raise ValueError('filters.maxAdoptionFee must be a number')
+        filters['maxAdoptionFee'] = max_fee
+
+    return filters
+
+
+def _explain_top(value):
+    """
+    Validate the request's explainTop (None explains every ranked pet)
+
+    Raises:
+        ValueError: not a non-negative whole number (the message is returned with a 400)
+    """
+    if value is None:
+        return None
+    try:
+        number = math.nan if isinstance(value, bool) else float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or number < 0 or not number.is_integer():
+        raise ValueError('explainTop must be a non-negative integer')
+    return int(number)
+
+
+def _catalogue_pets(data):
+    """
+    Pets of the resident catalogue matching the request's optional filters
+
+    Returns:
+        Tuple of (pets, their PetColumns, their PetFeatures, catalogue version)
+
+    Raises:
+        ValueError: invalid filters (answer with a 400)
+    """
+    from modules.adoption.pet_catalogue import get_pet_catalogue
+    
+    filters = _catalogue_filters(data.get('filters'))
+    snapshot = get_pet_catalogue().snapshot()
+    pets, columns, features = snapshot.select(filters)
+    return pets, columns, features, snapshot.version
+
+
 @adoption_bp.route('/match/calculate', methods=['POST'])
 def calculate_match():
     """
@@ -51,13 +127,15 @@ def rank_pets():
     Request body:
     {
         "userProfile": { ... },
-        "pets": [ ... ]
+        "pets": [ ... ],  // optional, default: the pet catalogue
+        "filters": { ... },  // optional, catalogue only: petIds, species, size, maxAdoptionFee
+        "explainTop": 50  // optional, pets that get match reasons (default MATCH_EXPLAIN_TOP)
     }
     """
     try:
         data = request.get_json()
         user_profile = data.get('userProfile')
-        pets = data.get('pets', [])
+        pets = data.get('pets')
         
         if not user_profile:
             return jsonify({
@@ -65,22 +143,42 @@ def rank_pets():
                 'message': 'userProfile is required'
             }), 400
         
+        try:
+            explain_top = _explain_top(data.get('explainTop', Config.MATCH_EXPLAIN_TOP))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        columns, catalogue_version = None, None
+        if pets is None:
+            try:
+                pets, columns, _, catalogue_version = _catalogue_pets(data)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+        
         if not pets:
             return jsonify({
                 'success': True,
                 'data': {
                     'rankedPets': [],
-                    'totalPets': 0
+                    'totalPets': 0,
+                    'catalogueVersion': catalogue_version
                 }
             })
         
-        ranked_pets = matcher.rank_pets_for_user(user_profile, pets)
+        ranked_pets = matcher.rank_pets_for_user(user_profile, pets, explain_top=explain_top, columns=columns)
         
         return jsonify({
             'success': True,
             'data': {
                 'rankedPets': ranked_pets,
-                'totalPets': len(ranked_pets)
+                'totalPets': len(ranked_pets),
+                'catalogueVersion': catalogue_version
             }
         })
     
@@ -99,14 +197,15 @@ def get_top_matches():
     Request body:
     {
         "userProfile": { ... },
-        "pets": [ ... ],
+        "pets": [ ... ],  // optional, default: the pet catalogue
+        "filters": { ... },  // optional, catalogue only: petIds, species, size, maxAdoptionFee
         "topN": 5  // optional, default 5
     }
     """
     try:
         data = request.get_json()
         user_profile = data.get('userProfile')
-        pets = data.get('pets', [])
+        pets = data.get('pets')
         top_n = data.get('topN', 5)
         
         if not user_profile:
@@ -115,23 +214,35 @@ def get_top_matches():
                 'message': 'userProfile is required'
             }), 400
         
+        columns, catalogue_version = None, None
+        if pets is None:
+            try:
+                pets, columns, _, catalogue_version = _catalogue_pets(data)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+        
         if not pets:
             return jsonify({
                 'success': True,
                 'data': {
                     'topMatches': [],
-                    'totalAvailable': 0
+                    'totalAvailable': 0,
+                    'catalogueVersion': catalogue_version
                 }
             })
         
-        top_matches = matcher.get_top_matches(user_profile, pets, top_n)
+        top_matches = matcher.get_top_matches(user_profile, pets, top_n, columns=columns)
         
         return jsonify({
             'success': True,
             'data': {
                 'topMatches': top_matches,
                 'totalAvailable': len(pets),
-                'showingTop': len(top_matches)
+                'showingTop': len(top_matches),
+                'catalogueVersion': catalogue_version
             }
         })
     
@@ -152,6 +263,158 @@ def health_check():
     })
 
 
+# ===== PET CATALOGUE (pets resident in the ML service) =====
+
+def _catalogue_response(snapshot, status=200, **extra):
+    """Catalogue version JSON with its ETag header"""
+    response = jsonify({
+        'success': True,
+        'data': {
+            'version': snapshot.version,
+            'etag': snapshot.etag,
+            'totalPets': len(snapshot),
+            'updatedAt': snapshot.updated_at,
+            **extra
+        }
+    })
+    response.headers['ETag'] = snapshot.etag
+    return response, status
+
+
+def _change_catalogue(change):
+    """Run a catalogue change, mapping If-Match conflicts to 412 and bad pets to 400"""
+    from modules.adoption.pet_catalogue import CatalogueConflict
+    
+    try:
+        return _catalogue_response(change(request.headers.get('If-Match')))
+    except CatalogueConflict as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 412
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+
+@adoption_bp.route('/catalogue', methods=['GET'])
+def get_catalogue():
+    """
+    Catalogue version/ETag (honours If-None-Match)
+    
+    Query: includePets=true also returns the pets
+    """
+    try:
+        from modules.adoption.pet_catalogue import get_pet_catalogue
+        
+        snapshot = get_pet_catalogue().snapshot()
+        if request.if_none_match.contains(snapshot.etag.strip('"')):
+            return Response(status=304, headers={'ETag': snapshot.etag})
+        
+        extra = {}
+        if request.args.get('includePets', 'false').lower() == 'true':
+            extra['pets'] = snapshot.pets
+        return _catalogue_response(snapshot, **extra)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+
+@adoption_bp.route('/catalogue', methods=['PUT'])
+def load_catalogue():
+    """
+    Replace the whole catalogue (If-Match: <etag> to guard against concurrent changes)
+    
+    Request body:
+    {
+        "pets": [ { "_id": "...", ... }, ... ]
+    }
+    """
+    try:
+        from modules.adoption.pet_catalogue import get_pet_catalogue
+        
+        data = request.get_json()
+        pets = data.get('pets')
+        if not isinstance(pets, list):
+            return jsonify({
+                'success': False,
+                'message': 'pets array is required'
+            }), 400
+        
+        return _change_catalogue(lambda if_match: get_pet_catalogue().load(pets, if_match))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+
+@adoption_bp.route('/catalogue/pets', methods=['POST'])
+def upsert_catalogue_pets():
+    """
+    Add pets or replace them by _id
+    
+    Request body:
+    {
+        "pets": [ { "_id": "...", ... }, ... ]
+    }
+    """
+    try:
+        from modules.adoption.pet_catalogue import get_pet_catalogue
+        
+        data = request.get_json()
+        pets = data.get('pets')
+        if not isinstance(pets, list) or not pets:
+            return jsonify({
+                'success': False,
+                'message': 'pets array is required'
+            }), 400
+        
+        return _change_catalogue(lambda if_match: get_pet_catalogue().upsert(pets, if_match))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+
+@adoption_bp.route('/catalogue/pets', methods=['DELETE'])
+def delete_catalogue_pets():
+    """
+    Remove pets (adopted, withdrawn) from the catalogue
+    
+    Request body:
+    {
+        "petIds": [ "...", ... ]
+    }
+    """
+    try:
+        from modules.adoption.pet_catalogue import get_pet_catalogue
+        
+        data = request.get_json()
+        pet_ids = data.get('petIds')
+        if not isinstance(pet_ids, list) or not pet_ids:
+            return jsonify({
+                'success': False,
+                'message': 'petIds array is required'
+            }), 400
+        
+        return _change_catalogue(lambda if_match: get_pet_catalogue().delete(pet_ids, if_match))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+
 # ===== NEW ML ENDPOINTS FOR HYBRID RECOMMENDER SYSTEM =====
 
 @adoption_bp.route('/ml/collaborative/train', methods=['POST'])
@@ -301,7 +564,8 @@ def get_hybrid_recommendations():
     {
         "userId": "...",
         "userProfile": { ... },
-        "availablePets": [ ... ],
+        "availablePets": [ ... ],  // optional, default: the pet catalogue
+        "filters": { ... },  // optional, catalogue only: petIds, species, size, maxAdoptionFee
         "topN": 10,  // optional
         "algorithm": "hybrid|content|collaborative|success|clustering"  // optional
     }
@@ -312,7 +576,7 @@ def get_hybrid_recommendations():
         data = request.get_json()
         user_id = data.get('userId')
         user_profile = data.get('userProfile')
-        available_pets = data.get('availablePets', [])
+        available_pets = data.get('availablePets')
         top_n = data.get('topN', 10)
         algorithm = data.get('algorithm', 'hybrid')
         
@@ -322,12 +586,23 @@ def get_hybrid_recommendations():
                 'message': 'userId and userProfile are required'
             }), 400
         
+        pet_features, catalogue_version = None, None
+        if available_pets is None:
+            try:
+                available_pets, _, pet_features, catalogue_version = _catalogue_pets(data)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+        
         if not available_pets:
             return jsonify({
                 'success': True,
                 'data': {
                     'recommendations': [],
-                    'algorithm': algorithm
+                    'algorithm': algorithm,
+                    'catalogueVersion': catalogue_version
                 }
             })
         
@@ -337,7 +612,8 @@ def get_hybrid_recommendations():
             user_profile,
             available_pets,
             top_n,
-            algorithm
+            algorithm,
+            pet_features=pet_features
         )
         
         return jsonify({
@@ -347,7 +623,8 @@ def get_hybrid_recommendations():
                 'algorithm': algorithm,
                 'totalAvailable': len(available_pets),
                 'showingTop': len(recommendations),
-                'currentWeights': hybrid_model.weights  # live weights (may differ after adaptation)
+                'currentWeights': hybrid_model.weights,  # live weights (may differ after adaptation)
+                'catalogueVersion': catalogue_version
             }
         })
         
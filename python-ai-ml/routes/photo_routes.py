@@ -0,0 +1,79 @@
+"""
+Photo routes for AI/ML service
+Duplicate / near-duplicate detection for listing photos
+"""
+import logging
+from flask import Blueprint, request, jsonify
+from utils.image_processor import ImageProcessor, allowed_file
+from utils.duplicate_detector import get_duplicate_detector
+
+logger = logging.getLogger(__name__)
+
+photo_bp = Blueprint('photos', __name__, url_prefix='/api/photos')
+
+
+@photo_bp.route('/check-duplicate', methods=['POST'])
+def check_duplicate():
+    """
+    Check a new upload against every photo seen before
+    
+    Request (multipart/form-data):
+        - image: Image file
+        - listing_id: Listing the photo belongs to (optional, returned with later matches)
+        - pet_id: Pet the photo shows (optional, returned with later matches)
+        - register: Remember this photo for future checks (optional, default=true)
+        
+    Response:
+        - is_duplicate: True if any earlier photo matched
+        - matches: Earlier photos (photo_id, listing_id, pet_id, match_type, distances), closest first
+        - photo_id: Id given to this photo (if registered)
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({
+                'success': False,
+                'error': 'No image file provided'
+            }), 400
+        
+        file = request.files['image']
+        if not allowed_file(file.filename):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type'
+            }), 400
+        
+        upload = ImageProcessor.read_upload(file)
+        metadata = {
+            key: request.form[key]
+            for key in ('listing_id', 'pet_id')
+            if request.form.get(key)
+        }
+        register = request.form.get('register', 'true').lower() == 'true'
+        
+        result = get_duplicate_detector().check(upload, register=register, **metadata)
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f"Invalid image file: {str(e)}"
+        }), 400
+    except Exception as e:
+        logger.error(f"Error checking duplicate photo: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@photo_bp.route('/stats', methods=['GET'])
+def duplicate_stats():
+    """Size and thresholds of the duplicate photo index"""
+    return jsonify({
+        'success': True,
+        'data': get_duplicate_detector().get_stats()
+    })
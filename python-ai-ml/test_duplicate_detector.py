@@ -0,0 +1,104 @@
+"""
+Test script for the duplicate photo detector
+Appends photos from several threads while others read the log, then checks
+that every log line was indexed exactly once and that a second detector on
+the same log (another worker process) assigns the same photo ids
+"""
+
+import io
+import os
+import random
+import tempfile
+import threading
+
+from PIL import Image
+
+from utils.duplicate_detector import DuplicateDetector
+
+WRITERS = 4
+READERS = 4
+PHOTOS_PER_WRITER = 25
+
+
+def random_photo(rng):
+    """Small noise image, so every photo has its own hashes"""
+    pixels = bytes(rng.getrandbits(8) for _ in range(32 * 32 * 3))
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (32, 32), pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_concurrent_appends():
+    """Test that appends and reads racing in one process keep the index in step with the log"""
+    print("=" * 60)
+    print("🧪 Testing Duplicate Detector")
+    print("=" * 60)
+
+    path = os.path.join(tempfile.mkdtemp(), 'photo_hashes.jsonl')
+    detector = DuplicateDetector(path)
+    photos = [[random_photo(random.Random(writer * 1000 + i)) for i in range(PHOTOS_PER_WRITER)]
+              for writer in range(WRITERS)]
+    probe = random_photo(random.Random(-1))
+    done = threading.Event()
+    errors = []
+
+    def write(writer):
+        try:
+            for i, photo in enumerate(photos[writer]):
+                detector.check(photo, writer=writer, index=i)
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            while not done.is_set():
+                detector.check(probe, register=False)
+        except Exception as e:
+            errors.append(e)
+
+    # Test 1: Concurrent appends and reads
+    print("\n🧵 Test 1: Concurrent Appends And Reads")
+    print("-" * 60)
+    readers = [threading.Thread(target=read) for _ in range(READERS)]
+    writers = [threading.Thread(target=write, args=(writer,)) for writer in range(WRITERS)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    with open(path, 'rb') as f:
+        log_lines = f.read().splitlines()
+    print(f"Log lines: {len(log_lines)}, indexed: {len(detector._records)}, "
+          f"offset: {detector._offset} of {os.path.getsize(path)} bytes")
+    assert not errors, errors
+    assert len(log_lines) == WRITERS * PHOTOS_PER_WRITER
+    assert len(detector._records) == len(log_lines)
+    assert detector._offset == os.path.getsize(path)
+    assert [record['photo_id'] for record in detector._records] == list(range(len(log_lines)))
+
+    # Test 2: Another worker reading the same log agrees on photo ids
+    print("\n📂 Test 2: Photo Ids Seen By Another Worker")
+    print("-" * 60)
+    other_worker = DuplicateDetector(path)
+    assert [record['sha256'] for record in other_worker._records] == \
+        [record['sha256'] for record in detector._records]
+    print(f"Other worker indexed {len(other_worker._records)} photos with the same ids")
+
+    # Test 3: The index still answers, and finds a registered photo
+    print("\n🔍 Test 3: Exact Duplicate After The Race")
+    print("-" * 60)
+    result = detector.check(photos[2][7], register=False)
+    exact = [match for match in result['matches'] if match['match_type'] == 'exact']
+    print(f"Exact matches: {[(match['photo_id'], match['writer'], match['index']) for match in exact]}")
+    assert len(exact) == 1 and exact[0]['writer'] == 2 and exact[0]['index'] == 7
+
+    print("\n" + "=" * 60)
+    print("✅ All tests completed successfully!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_concurrent_appends()
@@ -0,0 +1,127 @@
+"""
+Test script for the resident pet catalogue
+Loads, upserts and deletes pets with If-Match ETags, reads the snapshot back
+as another worker process would, and checks the catalogue filters
+"""
+
+import os
+import tempfile
+
+from modules.adoption.pet_catalogue import CatalogueConflict, PetCatalogue
+
+
+def sample_pet(pet_id, species, size, fee):
+    return {
+        '_id': pet_id,
+        'name': f'Pet {pet_id}',
+        'species': species,
+        'adoptionFee': fee,
+        'compatibilityProfile': {'size': size, 'energyLevel': 3}
+    }
+
+
+SAMPLE_PETS = [
+    sample_pet('p1', 'Dog', 'large', 150),
+    sample_pet('p2', 'Cat', 'small', 50),
+    sample_pet('p3', 'Dog', 'small', 0),
+    sample_pet('p4', 'Rabbit', 'small', 30),
+    sample_pet('p5', 'Dog', 'medium', 80),
+]
+
+
+def ids(pets):
+    return [pet['_id'] for pet in pets]
+
+
+def test_pet_catalogue():
+    """Test versioning, ETag conflicts, the shared snapshot and select filters"""
+    print("=" * 60)
+    print("🧪 Testing Pet Catalogue")
+    print("=" * 60)
+
+    path = os.path.join(tempfile.mkdtemp(), 'pet_catalogue.json')
+    catalogue = PetCatalogue(path)
+    assert catalogue.snapshot().version == 0 and len(catalogue.snapshot()) == 0
+
+    # Test 1: Load, upsert and delete each publish a new version
+    print("\n🐾 Test 1: Load / Upsert / Delete Versioning")
+    print("-" * 60)
+    loaded = catalogue.load(SAMPLE_PETS)
+    print(f"Loaded: version {loaded.version}, {len(loaded)} pets, ETag {loaded.etag}")
+    assert loaded.version == 1 and ids(loaded.pets) == ['p1', 'p2', 'p3', 'p4', 'p5']
+
+    upserted = catalogue.upsert([sample_pet('p2', 'Cat', 'medium', 40), sample_pet('p6', 'Cat', 'large', 20)],
+                                if_match=loaded.etag)
+    print(f"Upserted: version {upserted.version}, {len(upserted)} pets, ETag {upserted.etag}")
+    assert upserted.version == 2 and upserted.etag != loaded.etag
+    assert ids(upserted.pets) == ['p1', 'p2', 'p3', 'p4', 'p5', 'p6']
+    assert upserted.pets[1]['adoptionFee'] == 40
+
+    deleted = catalogue.delete(['p4', 'unknown'], if_match=upserted.etag)
+    print(f"Deleted: version {deleted.version}, {len(deleted)} pets, ETag {deleted.etag}")
+    assert deleted.version == 3 and ids(deleted.pets) == ['p1', 'p2', 'p3', 'p5', 'p6']
+    assert loaded.version == 1 and len(loaded) == 5  # older snapshots stay unchanged
+
+    try:
+        catalogue.upsert([{'name': 'No id'}])
+        raise AssertionError("A pet without an id was accepted")
+    except ValueError as e:
+        print(f"Rejected pet without id: {e}")
+    assert catalogue.snapshot().version == 3
+
+    # Test 2: A stale If-Match is refused
+    print("\n⚔️ Test 2: Stale If-Match")
+    print("-" * 60)
+    try:
+        catalogue.upsert([sample_pet('p7', 'Dog', 'small', 10)], if_match=loaded.etag)
+        raise AssertionError("A stale ETag was accepted")
+    except CatalogueConflict as e:
+        print(f"Conflict: {e}")
+    assert catalogue.snapshot().version == 3 and 'p7' not in ids(catalogue.snapshot().pets)
+    assert catalogue.upsert([sample_pet('p7', 'Dog', 'small', 10)], if_match='*').version == 4
+
+    # Test 3: Another worker on the same snapshot file sees the writes
+    print("\n📂 Test 3: Writes Seen By Another Worker")
+    print("-" * 60)
+    other_worker = PetCatalogue(path)
+    print(f"Other worker: version {other_worker.snapshot().version}, ETag {other_worker.snapshot().etag}")
+    assert other_worker.snapshot().etag == catalogue.snapshot().etag
+
+    other_worker.delete(['p7'], if_match=catalogue.snapshot().etag)
+    snapshot = catalogue.snapshot()
+    print(f"After the other worker's delete: version {snapshot.version}, {len(snapshot)} pets")
+    assert snapshot.version == 5 and 'p7' not in ids(snapshot.pets)
+    assert snapshot.etag == other_worker.snapshot().etag
+
+    # Test 4: select filters
+    print("\n🔍 Test 4: Select Filters")
+    print("-" * 60)
+    filter_cases = [
+        (None, ['p1', 'p2', 'p3', 'p5', 'p6']),
+        ({'petIds': ['p6', 'p1', 'missing']}, ['p1', 'p6']),
+        ({'petIds': 'p3'}, ['p3']),
+        ({'species': 'dog'}, ['p1', 'p3', 'p5']),
+        ({'species': ['Cat', 'rabbit']}, ['p2', 'p6']),
+        ({'size': 'small'}, ['p3']),
+        ({'size': ['medium', 'large']}, ['p1', 'p2', 'p5', 'p6']),
+        ({'maxAdoptionFee': 40}, ['p2', 'p3', 'p6']),
+        ({'species': 'dog', 'maxAdoptionFee': 100, 'size': ['small', 'medium']}, ['p3', 'p5']),
+    ]
+    for filters, expected in filter_cases:
+        pets, columns, features = snapshot.select(filters)
+        print(f"{filters}: {ids(pets)}")
+        assert ids(pets) == expected, (filters, ids(pets))
+        assert len(columns.adoption_fee) == len(pets)
+        assert list(columns.adoption_fee) == [float(pet['adoptionFee']) for pet in pets]
+
+    stats = catalogue.get_stats()
+    print(f"Stats: {stats}")
+    assert stats['version'] == 5 and stats['pets'] == 5 and stats['shared']
+
+    print("\n" + "=" * 60)
+    print("✅ All tests completed successfully!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_pet_catalogue()
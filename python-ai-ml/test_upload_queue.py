@@ -0,0 +1,94 @@
+"""
+Test script for the background upload queue
+Drives an upload through failed attempts, retry and success against the
+LocalUploader, and reads its status back as another worker process would
+"""
+
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from utils.cloudinary_uploader import LocalUploader
+from utils.upload_queue import UploadQueue
+
+
+class FlakyUploader(LocalUploader):
+    """LocalUploader whose first `failures` uploads raise, like a flaky network"""
+
+    def __init__(self, directory, failures=2):
+        super().__init__(directory)
+        self.failures = failures
+        self.attempts = 0
+
+    def upload(self, image_bytes, filename, metadata=None):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError(f"Simulated upload failure #{self.attempts}")
+        return super().upload(image_bytes, filename, metadata)
+
+
+def sample_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (200, 120, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_upload_queue():
+    """Test retry then success, and the shared job status"""
+    print("=" * 60)
+    print("🧪 Testing Upload Queue")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp()
+    status_dir = os.path.join(work_dir, '.upload_status')
+    uploader = FlakyUploader(os.path.join(work_dir, 'local-uploads'), failures=2)
+    upload_queue = UploadQueue(uploader, max_workers=1, max_retries=3,
+                               backoff_seconds=0.01, status_dir=status_dir)
+
+    # Test 1: Two failed attempts, then success
+    print("\n🔁 Test 1: Retry Then Success")
+    print("-" * 60)
+    job_id = upload_queue.submit(sample_image(), 'pet.jpg', {'breed': 'Beagle'})
+    job = upload_queue.wait(job_id, timeout=10)
+    print(f"Status: {job['status']} after {job['attempts']} attempts")
+    print(f"Result: {job['result']}")
+    assert job['status'] == 'done'
+    assert job['attempts'] == 3
+    assert job['error'] is None
+    assert job['result']['width'] == 64 and job['result']['height'] == 48
+    assert os.path.exists(os.path.join(uploader.directory, f"{job['result']['public_id']}.jpg"))
+
+    stats = upload_queue.get_stats()
+    print(f"Stats: {stats}")
+    assert stats['completed'] == 1 and stats['failed'] == 0 and stats['retries'] == 2
+
+    # Test 2: Another worker answers the status request from the shared directory
+    print("\n📂 Test 2: Status From Another Worker")
+    print("-" * 60)
+    other_worker = UploadQueue(uploader, status_dir=status_dir)
+    shared_job = other_worker.get_job(job_id)
+    print(f"Status seen by the other worker: {shared_job['status']}")
+    assert shared_job['status'] == 'done'
+    assert shared_job['result']['url'] == job['result']['url']
+
+    # Test 3: Retries exhausted
+    print("\n❌ Test 3: Retries Exhausted")
+    print("-" * 60)
+    uploader.attempts = 0
+    uploader.failures = 10
+    job_id = upload_queue.submit(sample_image(), 'pet.jpg')
+    job = upload_queue.wait(job_id, timeout=10)
+    print(f"Status: {job['status']} after {job['attempts']} attempts ({job['error']})")
+    assert job['status'] == 'failed'
+    assert job['attempts'] == 4
+    assert upload_queue.get_stats()['failed'] == 1
+
+    print("\n" + "=" * 60)
+    print("✅ All tests completed successfully!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    test_upload_queue()
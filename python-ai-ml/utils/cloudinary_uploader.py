@@ -4,6 +4,7 @@ Upload identified pet images to Cloudinary (optional)
 """
 import os
 import logging
+import uuid
 from io import BytesIO
 
 logger = logging.getLogger(__name__)
@@ -57,47 +58,63 @@ class CloudinaryUploader:
             return None
         
         try:
-            folder = os.getenv('CLOUDINARY_FOLDER', 'ai-ml/identified-pets')
-            
-            # Prepare upload options
-            upload_options = {
-                'folder': folder,
-                'resource_type': 'image',
-                'format': 'jpg',
-                'quality': 'auto',
-                'fetch_format': 'auto'
-            }
-            
-            # Add metadata as context
-            if metadata:
-                context = {
-                    'breed': metadata.get('breed', 'Unknown'),
-                    'species': metadata.get('species', 'Unknown'),
-                    'confidence': str(metadata.get('confidence', 0)),
-                    'model': metadata.get('model', 'MobileNetV2')
-                }
-                upload_options['context'] = '|'.join([f"{k}={v}" for k, v in context.items()])
-            
-            # Upload to Cloudinary
-            result = self.cloudinary.uploader.upload(
-                image_bytes,
-                **upload_options
-            )
-            
-            logger.info(f"✅ Image uploaded to Cloudinary: {result['secure_url']}")
-            
-            return {
-                'url': result['secure_url'],
-                'public_id': result['public_id'],
-                'format': result['format'],
-                'width': result['width'],
-                'height': result['height']
-            }
-            
+            return self.upload(image_bytes, filename, metadata)
         except Exception as e:
             logger.error(f"❌ Failed to upload to Cloudinary: {str(e)}")
             return None
     
+    def upload(self, image_bytes, filename, metadata=None):
+        """
+        Upload image to Cloudinary, raising on failure (used by the retrying UploadQueue)
+        
+        Args:
+            image_bytes: Image data as bytes
+            filename: Original filename
+            metadata: Dict with breed, species, confidence, etc.
+            
+        Returns:
+            Dict with Cloudinary URL and public_id
+        """
+        if not self.enabled:
+            raise RuntimeError("Cloudinary is not configured")
+        
+        folder = os.getenv('CLOUDINARY_FOLDER', 'ai-ml/identified-pets')
+        
+        # Prepare upload options
+        upload_options = {
+            'folder': folder,
+            'resource_type': 'image',
+            'format': 'jpg',
+            'quality': 'auto',
+            'fetch_format': 'auto'
+        }
+        
+        # Add metadata as context
+        if metadata:
+            context = {
+                'breed': metadata.get('breed', 'Unknown'),
+                'species': metadata.get('species', 'Unknown'),
+                'confidence': str(metadata.get('confidence', 0)),
+                'model': metadata.get('model', 'MobileNetV2')
+            }
+            upload_options['context'] = '|'.join([f"{k}={v}" for k, v in context.items()])
+        
+        # Upload to Cloudinary
+        result = self.cloudinary.uploader.upload(
+            image_bytes,
+            **upload_options
+        )
+        
+        logger.info(f"✅ Image uploaded to Cloudinary: {result['secure_url']}")
+        
+        return {
+            'url': result['secure_url'],
+            'public_id': result['public_id'],
+            'format': result['format'],
+            'width': result['width'],
+            'height': result['height']
+        }
+    
     def delete_image(self, public_id):
         """
         Delete image from Cloudinary
@@ -117,3 +134,60 @@ class CloudinaryUploader:
         except Exception as e:
             logger.error(f"❌ Failed to delete from Cloudinary: {str(e)}")
             return False
+
+
+class LocalUploader:
+    """
+    Stand-in for CloudinaryUploader that writes images to a local directory
+    
+    Same interface and result shape, no network: for tests and local
+    development (IMAGE_UPLOADER=local).
+    """
+    
+    def __init__(self, directory, base_url='/uploads/local'):
+        """
+        Args:
+            directory: Where uploaded images are written
+            base_url: URL prefix reported for written files
+        """
+        self.directory = directory
+        self.base_url = base_url.rstrip('/')
+        self.enabled = True
+        os.makedirs(directory, exist_ok=True)
+        logger.info(f"ℹ️ Local image uploader writing to {directory}")
+    
+    def upload(self, image_bytes, filename, metadata=None):
+        """Write the image under a unique name and return Cloudinary-shaped info"""
+        from PIL import Image
+        
+        public_id = uuid.uuid4().hex
+        extension = os.path.splitext(filename or '')[1].lower() or '.jpg'
+        path = os.path.join(self.directory, f"{public_id}{extension}")
+        
+        with open(path, 'wb') as f:
+            f.write(image_bytes)
+        width, height = Image.open(BytesIO(image_bytes)).size
+        
+        return {
+            'url': f"{self.base_url}/{public_id}{extension}",
+            'public_id': public_id,
+            'format': extension.lstrip('.'),
+            'width': width,
+            'height': height
+        }
+    
+    def upload_image(self, image_bytes, filename, metadata=None):
+        """Same as upload(), returning None on failure like CloudinaryUploader"""
+        try:
+            return self.upload(image_bytes, filename, metadata)
+        except Exception as e:
+            logger.error(f"❌ Local upload failed: {str(e)}")
+            return None
+    
+    def delete_image(self, public_id):
+        """Delete a previously written image"""
+        for name in os.listdir(self.directory):
+            if os.path.splitext(name)[0] == public_id:
+                os.remove(os.path.join(self.directory, name))
+                return True
+        return False
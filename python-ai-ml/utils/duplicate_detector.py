@@ -0,0 +1,280 @@
+"""
+Duplicate / near-duplicate pet photo detection
+Every checked upload is remembered by its SHA-256 (exact copies), its 64-bit
+pHash/dHash (re-encoded, resized or lightly edited copies) and optionally its
+MobileNetV2 embedding (crops, different shots of the same scene). pHashes
+live in a BK-tree, so a lookup only visits the part of the tree within the
+Hamming threshold instead of every photo ever seen.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from config.settings import Config
+from utils.image_processor import ImageProcessor, UploadedImage
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single-process writes only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two integer hashes"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance"""
+
+    def __init__(self):
+        # Node: [hash, [items with exactly this hash], {distance: child node}]
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item):
+        """Insert item under hash value"""
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """
+        All items whose hash is within max_distance of value
+
+        By the triangle inequality only children at distance d +/- max_distance
+        of a node can contain matches, so the rest of the tree is skipped.
+
+        Returns:
+            List of (distance, item), closest first
+        """
+        if self._root is None:
+            return []
+
+        matches = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, item) for item in node[1])
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for child_distance, child in node[2].items() if low <= child_distance <= high)
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class DuplicateDetector:
+    """Remembers every checked photo and finds earlier copies of new uploads"""
+
+    def __init__(self, path, phash_threshold=10, dhash_threshold=16,
+                 use_embeddings=False, embedding_threshold=0.95):
+        """
+        Args:
+            path: Append-only JSON-lines log of seen photos
+            phash_threshold: Max pHash Hamming distance (of 64 bits) for a near-duplicate
+            dhash_threshold: Max dHash distance confirming a pHash candidate
+            use_embeddings: Also search MobileNetV2 embeddings (one forward pass per check, shared
+                with identification of the same upload)
+            embedding_threshold: Min cosine similarity for an embedding match
+        """
+        self.path = path
+        self.phash_threshold = phash_threshold
+        self.dhash_threshold = dhash_threshold
+        self.use_embeddings = use_embeddings
+        self.embedding_threshold = embedding_threshold
+
+        self._records = []
+        self._by_digest = {}
+        self._tree = BKTree()
+        self._offset = 0
+        self._lock = threading.RLock()
+        self._embedding_index = None
+
+        self._read_new_records()
+        logger.info(f"🖼️ Duplicate detector: {len(self._records)} photos indexed")
+
+    # ─── log ─────────────────────────────────────────────────────────────────
+
+    def _index_record(self, record):
+        record['photo_id'] = len(self._records)
+        self._records.append(record)
+        self._by_digest.setdefault(record['sha256'], []).append(record['photo_id'])
+        self._tree.add(int(record['phash'], 16), record['photo_id'])
+
+    def _read_new_records(self):
+        """Index lines appended to the log (by this or another worker) since the last read"""
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    f.seek(self._offset)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break  # Partially written line: picked up on the next read
+                        self._offset += len(line)
+                        self._index_record(json.loads(line))
+            except FileNotFoundError:
+                pass
+
+    def _append_record(self, record):
+        """Append one record to the log under a cross-process lock"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # self._lock is held until the record is indexed: a concurrent _read_new_records
+        # must not index the flushed line before the offset has moved past it
+        with self._lock, open(self.path, 'ab') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # Index everything other workers appended first, so photo ids stay in log order
+                self._read_new_records()
+                line = (json.dumps(record) + '\n').encode()
+                f.write(line)
+                f.flush()
+                self._offset += len(line)
+                self._index_record(record)
+                return record['photo_id']
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _get_embedding_index(self):
+        if self._embedding_index is None:
+            from utils.embedding_index import EmbeddingIndex
+
+            base, _ = os.path.splitext(self.path)
+            self._embedding_index = EmbeddingIndex(f"{base}_embeddings.npz", backend=Config.EMBEDDING_INDEX_BACKEND)
+        return self._embedding_index
+
+    # ─── public API ──────────────────────────────────────────────────────────
+
+    def check(self, upload, register=True, **metadata):
+        """
+        Find earlier copies of an uploaded photo, then remember it
+
+        Args:
+            upload: UploadedImage (bytes are accepted too)
+            register: Add the photo to the index after checking
+            **metadata: Stored and returned with future matches (e.g. listing_id, pet_id)
+
+        Returns:
+            Dictionary with is_duplicate, matches (closest first) and the new photo_id
+        """
+        start_time = time.time()
+        if isinstance(upload, (bytes, bytearray)):
+            upload = UploadedImage(bytes(upload))
+
+        hashes = ImageProcessor.perceptual_hashes(upload)
+        self._read_new_records()
+
+        matches = {}
+        with self._lock:
+            for photo_id in self._by_digest.get(upload.digest, []):
+                matches[photo_id] = {'match_type': 'exact', 'phash_distance': 0, 'dhash_distance': 0}
+
+            for phash_distance, photo_id in self._tree.search(hashes['phash'], self.phash_threshold):
+                if photo_id in matches:
+                    continue
+                dhash_distance = hamming_distance(hashes['dhash'], int(self._records[photo_id]['dhash'], 16))
+                if dhash_distance <= self.dhash_threshold:
+                    matches[photo_id] = {
+                        'match_type': 'near',
+                        'phash_distance': phash_distance,
+                        'dhash_distance': dhash_distance
+                    }
+
+        embedding = None
+        if self.use_embeddings:
+            from utils.model_loader import ModelLoader
+
+            embedding = ModelLoader().embed_image(upload)
+            for neighbour in self._get_embedding_index().search(embedding, k=10):
+                if neighbour['similarity'] < self.embedding_threshold:
+                    break
+                if neighbour['photo_id'] >= len(self._records):
+                    continue  # Logged by another worker after our last read
+                match = matches.setdefault(neighbour['photo_id'], {'match_type': 'similar'})
+                match['similarity'] = neighbour['similarity']
+
+        results = []
+        for photo_id, match in matches.items():
+            record = self._records[photo_id]
+            results.append({
+                'photo_id': photo_id,
+                **{key: value for key, value in record.items() if key not in ('photo_id', 'sha256')},
+                **match
+            })
+        order = {'exact': 0, 'near': 1, 'similar': 2}
+        results.sort(key=lambda r: (order[r['match_type']], r.get('phash_distance', 64), -r.get('similarity', 0.0)))
+
+        photo_id = None
+        if register:
+            photo_id = self._append_record({
+                'sha256': upload.digest,
+                'phash': f"{hashes['phash']:016x}",
+                'dhash': f"{hashes['dhash']:016x}",
+                'added_at': time.time(),
+                **metadata
+            })
+            if embedding is not None:
+                self._get_embedding_index().add(embedding, {'photo_id': photo_id})
+
+        return {
+            'success': True,
+            'is_duplicate': bool(results),
+            'matches': results,
+            'photo_id': photo_id,
+            'phash': f"{hashes['phash']:016x}",
+            'dhash': f"{hashes['dhash']:016x}",
+            'total_photos': len(self._records),
+            'processing_time': f"{time.time() - start_time:.3f}s"
+        }
+
+    def get_stats(self):
+        """Index size and thresholds for monitoring"""
+        return {
+            'photos': len(self._records),
+            'phash_threshold': self.phash_threshold,
+            'dhash_threshold': self.dhash_threshold,
+            'embeddings': self.use_embeddings
+        }
+
+
+# Global instance
+_duplicate_detector = None
+_duplicate_detector_lock = threading.Lock()
+
+def get_duplicate_detector():
+    """Get the shared duplicate photo detector"""
+    global _duplicate_detector
+    if _duplicate_detector is None:
+        with _duplicate_detector_lock:
+            if _duplicate_detector is None:
+                _duplicate_detector = DuplicateDetector(
+                    Config.DUPLICATE_INDEX_PATH or os.path.join(Config.MODELS_DIR, 'photo_hashes.jsonl'),
+                    phash_threshold=Config.DUPLICATE_PHASH_THRESHOLD,
+                    dhash_threshold=Config.DUPLICATE_DHASH_THRESHOLD,
+                    use_embeddings=Config.DUPLICATE_USE_EMBEDDINGS,
+                    embedding_threshold=Config.DUPLICATE_EMBEDDING_THRESHOLD
+                )
+    return _duplicate_detector
@@ -0,0 +1,262 @@
+"""
+Nearest-neighbour index over MobileNetV2 image embeddings
+Labelled reference pets (e.g. a shelter's own animals) are stored as their
+1280-d pooled MobileNetV2 features, so a new photo can be matched to the most
+similar known pets and breeds. Adding a reference is one vector append - no
+retraining.
+"""
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+from config.settings import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: single-process writes only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 1280
+INDEX_BACKENDS = ('exact', 'hnsw')
+
+
+def _load_hnswlib():
+    """hnswlib is optional: the exact numpy search is used without it"""
+    try:
+        import hnswlib
+        return hnswlib
+    except ImportError:
+        return None
+
+
+class EmbeddingIndex:
+    """Cosine-similarity index of L2-normalised embeddings with per-item metadata"""
+
+    def __init__(self, path, backend='exact', dim=EMBEDDING_DIM):
+        """
+        Args:
+            path: .npz file the index is persisted to (vectors + metadata)
+            backend: 'exact' (numpy matrix product) or 'hnsw' (hnswlib, if installed)
+            dim: Embedding dimension
+        """
+        self.path = path
+        self.dim = dim
+        self.backend = backend if backend in INDEX_BACKENDS else 'exact'
+
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._count = 0
+        self._metadata = []
+        self._hnsw = None
+        self._mtime = None
+        self._lock = threading.RLock()
+
+        if self.backend == 'hnsw' and _load_hnswlib() is None:
+            logger.warning("⚠️ EMBEDDING_INDEX_BACKEND=hnsw but hnswlib is not installed, using exact search")
+            self.backend = 'exact'
+
+        self._load()
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def normalize(vectors):
+        """L2-normalise rows so a dot product is the cosine similarity"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    # ─── persistence ─────────────────────────────────────────────────────────
+
+    def _load(self):
+        """(Re)load the persisted index; a missing file means an empty index"""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            try:
+                with np.load(self.path) as data:
+                    vectors = np.asarray(data['vectors'], dtype=np.float32)
+                    metadata = json.loads(str(data['metadata']))
+            except Exception as e:
+                logger.warning(f"⚠️ Could not load embedding index {self.path}: {str(e)}")
+                return
+
+            self._vectors = vectors
+            self._count = len(vectors)
+            self._metadata = metadata
+            self._mtime = os.path.getmtime(self.path)
+            self._hnsw = None
+            if self.backend == 'hnsw':
+                self._build_hnsw()
+            logger.info(f"📚 Embedding index loaded: {self._count} reference images ({self.backend})")
+
+    def reload_if_changed(self):
+        """Pick up references added by other workers since the last load"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def _save(self):
+        """Write the index atomically (tmp file + rename)"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            vectors=self._vectors[:self._count],
+            metadata=np.array(json.dumps(self._metadata))
+        )
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _file_lock(self):
+        """Exclusive lock across worker processes for read-modify-write of the index file"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(f"{self.path}.lock", 'w')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    # ─── hnsw ────────────────────────────────────────────────────────────────
+
+    def _build_hnsw(self):
+        hnswlib = _load_hnswlib()
+        index = hnswlib.Index(space='ip', dim=self.dim)
+        index.init_index(max_elements=max(1024, self._count * 2), ef_construction=200, M=16)
+        if self._count:
+            index.add_items(self._vectors[:self._count], np.arange(self._count))
+        index.set_ef(64)
+        self._hnsw = index
+
+    # ─── public API ──────────────────────────────────────────────────────────
+
+    def add(self, embedding, metadata):
+        """
+        Add one labelled reference embedding and persist the index
+
+        Args:
+            embedding: Vector of length dim
+            metadata: JSON-serialisable dict (e.g. pet_id, breed, species)
+
+        Returns:
+            Id of the new item
+        """
+        vector = self.normalize(embedding)[0]
+        if len(vector) != self.dim:
+            raise ValueError(f"Expected a {self.dim}-d embedding, got {len(vector)}")
+
+        lock_file = self._file_lock()
+        try:
+            with self._lock:
+                self.reload_if_changed()
+
+                # Grow capacity geometrically so appends stay amortised O(dim)
+                if self._count == len(self._vectors):
+                    grown = np.empty((max(64, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+                    grown[:self._count] = self._vectors[:self._count]
+                    self._vectors = grown
+
+                item_id = self._count
+                self._vectors[item_id] = vector
+                self._metadata.append(dict(metadata))
+                self._count += 1
+
+                if self._hnsw is not None:
+                    if self._count > self._hnsw.get_max_elements():
+                        self._hnsw.resize_index(self._count * 2)
+                    self._hnsw.add_items(vector[np.newaxis], np.array([item_id]))
+
+                self._save()
+                return item_id
+        finally:
+            lock_file.close()
+
+    def search(self, embedding, k=5):
+        """
+        Find the k most similar reference images
+
+        Args:
+            embedding: Query vector of length dim
+            k: Number of neighbours
+
+        Returns:
+            List of dicts (metadata + 'id' and cosine 'similarity'), most similar first
+        """
+        self.reload_if_changed()
+        query = self.normalize(embedding)[0]
+
+        with self._lock:
+            k = min(int(k), self._count)
+            if k <= 0:
+                return []
+
+            if self._hnsw is not None:
+                labels, distances = self._hnsw.knn_query(query[np.newaxis], k=k)
+                ids, scores = labels[0], 1.0 - distances[0]
+            else:
+                similarities = self._vectors[:self._count] @ query
+                ids = np.argpartition(-similarities, k - 1)[:k]
+                ids = ids[np.argsort(-similarities[ids])]
+                scores = similarities[ids]
+
+            return [
+                {**self._metadata[i], 'id': int(i), 'similarity': round(float(score), 4)}
+                for i, score in zip(ids, scores)
+            ]
+
+    @staticmethod
+    def vote_breeds(neighbours):
+        """
+        Combine neighbours into a breed ranking, weighted by similarity
+
+        Args:
+            neighbours: Result of search()
+
+        Returns:
+            List of {'breed', 'species', 'score', 'count'} dicts, best first
+        """
+        votes = {}
+        for neighbour in neighbours:
+            breed = neighbour.get('breed')
+            if not breed:
+                continue
+            vote = votes.setdefault(breed, {'breed': breed, 'species': neighbour.get('species'), 'score': 0.0, 'count': 0})
+            vote['score'] += max(neighbour['similarity'], 0.0)
+            vote['count'] += 1
+
+        total = sum(vote['score'] for vote in votes.values()) or 1.0
+        ranked = sorted(votes.values(), key=lambda vote: vote['score'], reverse=True)
+        for vote in ranked:
+            vote['score'] = round(vote['score'] / total, 4)
+        return ranked
+
+    def get_stats(self):
+        """Index size and backend for /health"""
+        return {
+            'references': self._count,
+            'backend': self.backend,
+            'dim': self.dim
+        }
+
+
+# Global instance
+_embedding_index = None
+_embedding_index_lock = threading.Lock()
+
+def get_embedding_index():
+    """Get the shared reference-image embedding index"""
+    global _embedding_index
+    if _embedding_index is None:
+        with _embedding_index_lock:
+            if _embedding_index is None:
+                _embedding_index = EmbeddingIndex(
+                    Config.EMBEDDING_INDEX_PATH or os.path.join(Config.MODELS_DIR, 'pet_embeddings.npz'),
+                    backend=Config.EMBEDDING_INDEX_BACKEND
+                )
+    return _embedding_index
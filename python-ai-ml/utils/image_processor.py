@@ -5,59 +5,345 @@ import numpy as np
 from PIL import Image
 import cv2
 import io
-from tensorflow.keras.preprocessing import image as keras_image
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+import hashlib
+import threading
+from config.settings import Config
+from utils.metrics import observe_stage, UPLOAD_BYTES
+
+# Per-thread reusable batch input buffers (see ImageProcessor.get_batch_buffer)
+_thread_buffers = threading.local()
+
+# DCT-II matrices for pHash, by thumbnail size
+_dct_matrices = {}
+
+# EXIF orientation tag value -> transpose that displays the image upright
+_EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+# Storage formats of the ingest pipeline: name -> (PIL format, file extension)
+INGEST_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg')
+}
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+
+class UploadedImage:
+    """
+    One uploaded image: read once, hashed once, decoded once
+    
+    Passed through the identification services in place of raw bytes, so the
+    content hash (cache key) and the preprocessed model input are computed a
+    single time per request no matter how many views are built from it.
+    """
+    
+    def __init__(self, data, filename=None, target_size=(224, 224)):
+        """
+        Args:
+            data: Raw uploaded image bytes
+            filename: Original upload file name
+            target_size: Model input size for decode()
+        """
+        self.data = data
+        self.filename = filename
+        self.target_size = target_size
+        self._digest = None
+        self._array = None
+        self._image = None
+        self._image_max_size = 0
+        self._orientation = 1
+    
+    @property
+    def digest(self):
+        """sha256 hex digest of the upload"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+    
+    @property
+    def is_decoded(self):
+        """True once decode() has run"""
+        return self._array is not None
+    
+    @property
+    def decoded_image(self):
+        """RGB PIL Image kept by decode_full(), or None"""
+        return self._image
+    
+    def decode(self):
+        """
+        Decode and preprocess the image (validates it as a side effect)
+        
+        Returns:
+            Preprocessed 1 x H x W x 3 array (the same array on every call)
+            
+        Raises:
+            ValueError: If the upload is not a readable image
+        """
+        if self._array is None:
+            # Already decoded for storage: resize those pixels instead of decoding again
+            source = self._image if self._image is not None else self.data
+            self._array = ImageProcessor.load_and_preprocess_image(source, self.target_size)
+        return self._array
+    
+    def decode_full(self, max_size):
+        """
+        Decode the image for storage, at no less than max_size on the long side
+        
+        The decoded pixels are kept, so a later decode() for the model resizes
+        them instead of decoding the upload a second time.
+        
+        Args:
+            max_size: Longest side the stored copy will have
+            
+        Returns:
+            Tuple of (RGB PIL Image, EXIF orientation)
+            
+        Raises:
+            ValueError: If the upload is not a readable image
+        """
+        if self._image is None or self._image_max_size < max_size:
+            try:
+                self._image, self._orientation = ImageProcessor.decode_for_storage(
+                    ImageProcessor.open_image(self.data), max_size
+                )
+            except Exception as e:
+                raise ValueError(f"Error processing image: {str(e)}")
+            self._image_max_size = max_size
+        return self._image, self._orientation
 
 class ImageProcessor:
     """Handle image preprocessing for AI models"""
     
     @staticmethod
-    def load_and_preprocess_image(image_source, target_size=(224, 224)):
+    def preprocess_input(img_array):
         """
-        Load and preprocess image for MobileNetV2
+        MobileNetV2 input scaling, same as keras' mobilenet_v2.preprocess_input
+        
+        Kept in numpy so preprocessing does not import TensorFlow.
+        """
+        return img_array / 127.5 - 1.0
+    
+    @staticmethod
+    def open_image(image_source):
+        """
+        Open an image source with PIL (lazy: pixels are not decoded yet)
         
         Args:
-            image_source: Can be file path, file object, or bytes
-            target_size: Target size tuple (height, width)
+            image_source: Can be file path, file object, bytes, or a decoded PIL Image
             
         Returns:
-            Preprocessed image array ready for model input
+            PIL Image
         """
-        try:
-            # Handle different input types
-            if isinstance(image_source, bytes):
-                # Image as bytes
-                img = Image.open(io.BytesIO(image_source))
-            elif isinstance(image_source, str):
-                # Image path
-                img = Image.open(image_source)
-            elif hasattr(image_source, 'read'):
-                # File-like object
-                img = Image.open(image_source)
-            else:
-                raise ValueError("Invalid image source type")
-            
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+        # Handle different input types
+        if isinstance(image_source, Image.Image):
+            # Already decoded
+            return image_source
+        elif isinstance(image_source, UploadedImage):
+            return Image.open(io.BytesIO(image_source.data))
+        elif isinstance(image_source, bytes):
+            # Image as bytes
+            return Image.open(io.BytesIO(image_source))
+        elif isinstance(image_source, str):
+            # Image path
+            return Image.open(image_source)
+        elif hasattr(image_source, 'read'):
+            # File-like object
+            return Image.open(image_source)
+        raise ValueError("Invalid image source type")
+    
+    @staticmethod
+    def decode_image(img, target_size=(224, 224), fast=None):
+        """
+        Decode a PIL image to RGB pixels for a model input of target_size
+        
+        The fast path asks the JPEG decoder for a DCT-scaled image (1/2, 1/4
+        or 1/8 of full size) that is still at least twice the target size.
+        A 12 MP phone photo is decoded at ~750 px instead of 4000 px. The
+        exact path decodes at full resolution.
+        
+        Args:
+            img: PIL Image from open_image
+            target_size: Target size tuple (height, width)
+            fast: Use the fast path (defaults to Config.FAST_DECODE)
             
-            # Resize
-            img = img.resize(target_size, Image.Resampling.LANCZOS)
+        Returns:
+            Decoded RGB PIL Image
+        """
+        if fast is None:
+            fast = Config.FAST_DECODE
+        
+        if fast and img.format == 'JPEG':
+            img.draft('RGB', (target_size[0] * 2, target_size[1] * 2))
+        
+        # Convert to RGB if needed
+        if img.mode != 'RGB':
+            return img.convert('RGB')
+        img.load()
+        return img
+    
+    @staticmethod
+    def resize_decoded(img, target_size=(224, 224), fast=None):
+        """
+        Resize decoded pixels to the model input size
+        
+        The fast path uses a box-reduce + bilinear filter, the exact path LANCZOS.
+        """
+        if fast is None:
+            fast = Config.FAST_DECODE
+        
+        if fast:
+            return img.resize(target_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return img.resize(target_size, Image.Resampling.LANCZOS)
+    
+    @staticmethod
+    def decode_and_resize(img, target_size=(224, 224), fast=None):
+        """
+        Decode a PIL image to RGB at the model input size
+        
+        Args:
+            img: PIL Image from open_image
+            target_size: Target size tuple (height, width)
+            fast: Use reduced-size JPEG decoding (defaults to Config.FAST_DECODE)
             
-            # Convert to array
-            img_array = keras_image.img_to_array(img)
+        Returns:
+            RGB PIL Image of target_size
+        """
+        img = ImageProcessor.decode_image(img, target_size, fast)
+        return ImageProcessor.resize_decoded(img, target_size, fast)
+    
+    @staticmethod
+    def load_and_preprocess_image(image_source, target_size=(224, 224), fast=None, out=None):
+        """
+        Load and preprocess image for MobileNetV2
+        
+        Args:
+            image_source: Can be file path, file object, bytes, UploadedImage or decoded PIL Image
+            target_size: Target size tuple (height, width)
+            fast: Use reduced-size JPEG decoding (defaults to Config.FAST_DECODE)
+            out: Optional preallocated float32 1 x H x W x 3 array to write into
+                (e.g. a slot of a batch buffer); a new array is allocated otherwise
             
-            # Expand dimensions for batch
-            img_array = np.expand_dims(img_array, axis=0)
+        Returns:
+            Preprocessed image array ready for model input (out, if given)
+        """
+        if isinstance(image_source, UploadedImage) and fast is None and target_size == image_source.target_size:
+            if out is None:
+                return image_source.decode()
+            if image_source.is_decoded:
+                out[...] = image_source.decode()
+                return out
+        if isinstance(image_source, UploadedImage) and image_source.decoded_image is not None:
+            image_source = image_source.decoded_image
+        
+        try:
+            with observe_stage('decode'):
+                img = ImageProcessor.open_image(image_source)
+                img = ImageProcessor.decode_image(img, target_size, fast)
+            with observe_stage('resize'):
+                img = ImageProcessor.resize_decoded(img, target_size, fast)
             
-            # Preprocess for MobileNetV2
-            img_array = preprocess_input(img_array)
+            with observe_stage('preprocess'):
+                # uint8 H x W x 3 view of the resized pixels
+                pixels = np.asarray(img)
+                
+                # One float32 buffer with a batch dimension, scaled in place
+                if out is None:
+                    out = np.empty((1,) + pixels.shape, dtype=np.float32)
+                ImageProcessor.preprocess_into(pixels, out)
             
-            return img_array
+            return out
             
         except Exception as e:
             raise ValueError(f"Error processing image: {str(e)}")
     
+    @staticmethod
+    def preprocess_into(pixels, out):
+        """
+        Write uint8 RGB pixels into a float32 buffer and scale it in place to [-1, 1]
+        
+        Same result as preprocess_input, without the temporary arrays.
+        
+        Args:
+            pixels: uint8 array of shape H x W x 3
+            out: float32 array of shape H x W x 3 or 1 x H x W x 3
+        """
+        np.copyto(out, pixels, casting='unsafe')
+        np.divide(out, 127.5, out=out)
+        np.subtract(out, 1.0, out=out)
+    
+    @staticmethod
+    def get_batch_buffer(batch_size, target_size=(224, 224)):
+        """
+        Reusable float32 batch_size x H x W x 3 input buffer for the calling thread
+        
+        The buffer grows to the largest batch seen on the thread and is then
+        reused, so batch preprocessing does not allocate per image or per
+        request. The returned view is overwritten by the next call on the
+        same thread, so it must be consumed (run through the model) first.
+        
+        Args:
+            batch_size: Number of image slots needed
+            target_size: Target size tuple (height, width)
+            
+        Returns:
+            View of shape batch_size x H x W x 3
+        """
+        shape = (target_size[0], target_size[1], 3)
+        buffer = getattr(_thread_buffers, 'batch', None)
+        if buffer is None or buffer.shape[1:] != shape or len(buffer) < batch_size:
+            buffer = np.empty((batch_size,) + shape, dtype=np.float32)
+            _thread_buffers.batch = buffer
+        return buffer[:batch_size]
+    
+    @staticmethod
+    def load_and_preprocess_batch(image_sources, target_size=(224, 224), reuse_buffer=True):
+        """
+        Load and preprocess several images into one stacked batch tensor
+        
+        Args:
+            image_sources: List of image sources (bytes, paths, or file objects)
+            target_size: Target size tuple (height, width)
+            reuse_buffer: Fill this thread's reusable batch buffer (see get_batch_buffer)
+                instead of allocating a new array
+            
+        Returns:
+            Tuple of (batch array of shape N x H x W x 3 or None,
+            indices of the sources that made it into the batch,
+            dict mapping failed source index -> error message)
+        """
+        if reuse_buffer:
+            batch = ImageProcessor.get_batch_buffer(len(image_sources), target_size)
+        else:
+            batch = np.empty((len(image_sources), target_size[0], target_size[1], 3), dtype=np.float32)
+        
+        valid_indices = []
+        errors = {}
+        
+        for index, image_source in enumerate(image_sources):
+            # Decode straight into the next free slot; failed images leave no gap
+            slot = len(valid_indices)
+            try:
+                ImageProcessor.load_and_preprocess_image(image_source, target_size, out=batch[slot:slot + 1])
+                valid_indices.append(index)
+            except ValueError as e:
+                errors[index] = str(e)
+        
+        if not valid_indices:
+            return None, valid_indices, errors
+        
+        return batch[:len(valid_indices)], valid_indices, errors
+    
     @staticmethod
     def validate_image(file):
         """
@@ -94,6 +380,32 @@ class ImageProcessor:
         except Exception as e:
             raise ValueError(f"Invalid image file: {str(e)}")
     
+    @staticmethod
+    def read_upload(file):
+        """
+        Read an uploaded file into a single in-memory buffer
+        
+        Nothing is parsed here: the image is validated when it is decoded
+        for the model (UploadedImage.decode), so every upload is read once
+        and decoded once.
+        
+        Args:
+            file: Uploaded file object
+            
+        Returns:
+            UploadedImage wrapping the file's bytes
+        """
+        with observe_stage('upload_read'):
+            file.seek(0)
+            data = file.read()
+        UPLOAD_BYTES.inc(len(data))
+        return UploadedImage(data, filename=file.filename, target_size=Config.TARGET_SIZE)
+    
+    @staticmethod
+    def is_cacheable(image_source):
+        """True for in-memory sources whose content can key the result caches"""
+        return isinstance(image_source, (bytes, UploadedImage))
+    
     @staticmethod
     def get_image_bytes(file):
         """
@@ -108,6 +420,97 @@ class ImageProcessor:
         file.seek(0)
         return file.read()
     
+    @staticmethod
+    def decode_for_storage(img, max_size):
+        """
+        Decode a PIL image to RGB for the ingest pipeline
+        
+        JPEGs are decoded at the smallest DCT scale that still covers
+        max_size, so a 12 MP photo stored at 1024 px is decoded at ~2000 px.
+        
+        Args:
+            img: PIL Image from open_image
+            max_size: Longest side the stored copy will have
+            
+        Returns:
+            Tuple of (RGB PIL Image, EXIF orientation)
+        """
+        orientation = img.getexif().get(0x0112, 1)
+        if img.format == 'JPEG':
+            img.draft('RGB', (max_size, max_size))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        else:
+            img.load()
+        return img, orientation
+    
+    @staticmethod
+    def ingest(image_source, max_size=None, fmt=None, quality=None):
+        """
+        Prepare an image for storage or upload
+        
+        Downscales to max_size on the long side, applies the EXIF orientation
+        and re-encodes without any metadata (EXIF, GPS, ICC profiles are all
+        dropped). An UploadedImage shares its decode with the model input.
+        
+        Args:
+            image_source: Image as bytes, UploadedImage, file path, or file object
+            max_size: Longest side in pixels (defaults to Config.MAX_IMAGE_SIZE)
+            fmt: 'webp' or 'jpeg' (defaults to Config.INGEST_FORMAT)
+            quality: Encoder quality 1-100 (defaults to Config.INGEST_QUALITY)
+            
+        Returns:
+            Dictionary with data (bytes), format, extension, width, height and
+            original_bytes
+        """
+        max_size = max_size or Config.MAX_IMAGE_SIZE
+        fmt = (fmt or Config.INGEST_FORMAT).lower()
+        quality = quality or Config.INGEST_QUALITY
+        if fmt not in INGEST_FORMATS:
+            raise ValueError(f"Unsupported ingest format: {fmt}")
+        pil_format, extension = INGEST_FORMATS[fmt]
+        
+        try:
+            if isinstance(image_source, UploadedImage):
+                img, orientation = image_source.decode_full(max_size)
+                original_bytes = len(image_source.data)
+            else:
+                if isinstance(image_source, bytes):
+                    original_bytes = len(image_source)
+                else:
+                    original_bytes = None
+                img, orientation = ImageProcessor.decode_for_storage(
+                    ImageProcessor.open_image(image_source), max_size
+                )
+            
+            if max(img.size) > max_size:
+                ratio = max_size / max(img.size)
+                new_size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+                img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            if orientation in _EXIF_TRANSPOSE:
+                img = img.transpose(_EXIF_TRANSPOSE[orientation])
+            
+            # Saved without exif=/icc_profile=, so no metadata is carried over
+            output = io.BytesIO()
+            if pil_format == 'JPEG':
+                img.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+            else:
+                img.save(output, format='WEBP', quality=quality, method=4)
+            
+            return {
+                'data': output.getvalue(),
+                'format': fmt,
+                'extension': extension,
+                'width': img.width,
+                'height': img.height,
+                'original_bytes': original_bytes
+            }
+            
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Error preparing image for storage: {str(e)}")
+    
     @staticmethod
     def resize_image_bytes(image_bytes, max_size=1024):
         """
@@ -118,7 +521,7 @@ class ImageProcessor:
             max_size: Maximum dimension size
             
         Returns:
-            bytes: Resized image data
+            bytes: Resized image data (JPEG, metadata stripped)
         """
         try:
             img = Image.open(io.BytesIO(image_bytes))
@@ -127,19 +530,7 @@ class ImageProcessor:
             if max(img.size) <= max_size:
                 return image_bytes
             
-            # Calculate new size maintaining aspect ratio
-            ratio = max_size / max(img.size)
-            new_size = tuple([int(dim * ratio) for dim in img.size])
-            
-            # Resize
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
-            
-            # Save to bytes
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=85)
-            output.seek(0)
-            
-            return output.read()
+            return ImageProcessor.ingest(image_bytes, max_size=max_size, fmt='jpeg', quality=85)['data']
             
         except Exception as e:
             raise ValueError(f"Error resizing image: {str(e)}")
@@ -162,3 +553,80 @@ class ImageProcessor:
         except Exception as e:
             raise ValueError(f"Error extracting features: {str(e)}")
 
+    
+    @staticmethod
+    def _bits_to_int(bits):
+        """Pack a boolean array (row-major) into one integer hash"""
+        return int(''.join('1' if bit else '0' for bit in bits.flatten()), 2)
+    
+    @staticmethod
+    def _dct_matrix(size):
+        """Orthonormal DCT-II matrix, so dct(x) = C @ x @ C.T"""
+        matrix = _dct_matrices.get(size)
+        if matrix is None:
+            n = np.arange(size)
+            matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n[np.newaxis, :] + 1) * n[:, np.newaxis] / (2 * size))
+            matrix[0] /= np.sqrt(2.0)
+            _dct_matrices[size] = matrix
+        return matrix
+    
+    @staticmethod
+    def dhash(gray, hash_size=8):
+        """
+        Difference hash: sign of the horizontal gradient on a (hash_size+1) x hash_size thumbnail
+        
+        Args:
+            gray: PIL image in mode 'L'
+            hash_size: Hash is hash_size^2 bits
+            
+        Returns:
+            Integer hash
+        """
+        pixels = np.asarray(gray.resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+        return ImageProcessor._bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+    
+    @staticmethod
+    def phash(gray, hash_size=8, highfreq_factor=4):
+        """
+        Perceptual hash: low-frequency DCT coefficients of a 32 x 32 thumbnail vs their median
+        
+        Args:
+            gray: PIL image in mode 'L'
+            hash_size: Hash is hash_size^2 bits
+            highfreq_factor: Thumbnail is hash_size * highfreq_factor pixels square
+            
+        Returns:
+            Integer hash
+        """
+        size = hash_size * highfreq_factor
+        pixels = np.asarray(gray.resize((size, size), Image.LANCZOS), dtype=np.float64)
+        dct_matrix = ImageProcessor._dct_matrix(size)
+        low = (dct_matrix @ pixels @ dct_matrix.T)[:hash_size, :hash_size]
+        # The DC term is just mean brightness, keep it out of the threshold
+        return ImageProcessor._bits_to_int(low > np.median(low.flatten()[1:]))
+    
+    @staticmethod
+    def perceptual_hashes(image_source):
+        """
+        64-bit pHash and dHash of an image, for duplicate detection
+        
+        JPEGs are decoded straight to a small grayscale image (DCT scaling),
+        so hashing costs a fraction of a full decode.
+        
+        Args:
+            image_source: Image as bytes, UploadedImage, file path, or file object
+            
+        Returns:
+            Dictionary with integer 'phash' and 'dhash'
+        """
+        try:
+            img = ImageProcessor.open_image(image_source)
+            if img.format == 'JPEG':
+                img.draft('L', (64, 64))
+            gray = img.convert('L')
+            return {
+                'phash': ImageProcessor.phash(gray),
+                'dhash': ImageProcessor.dhash(gray)
+            }
+        except Exception as e:
+            raise ValueError(f"Error hashing image: {str(e)}")
@@ -0,0 +1,201 @@
+"""
+Alternative inference engines for MobileNetV2
+Each engine exposes predict(batch, verbose=0) like a Keras model, so the
+rest of the service does not need to know which runtime serves a request.
+The converted models have two outputs, class probabilities and the pooled
+1280-d features, so one forward pass serves identification and embeddings.
+"""
+import os
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TFLITE_QUANTIZATIONS = ('none', 'float16', 'int8')
+NUM_CLASSES = 1000  # Width of the probabilities output; the other output is the pooled features
+
+
+def _probabilities_first(widths):
+    """Output positions ordered (probabilities, features), given each output's last dimension"""
+    return sorted(range(len(widths)), key=lambda i: widths[i] != NUM_CLASSES)
+
+
+def _get_tflite_interpreter_class():
+    """Prefer the standalone tflite-runtime package, fall back to TensorFlow's interpreter"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+
+
+class TFLiteEngine:
+    """Serve a converted (optionally quantized) TFLite MobileNetV2"""
+
+    def __init__(self, model_path, num_threads=None):
+        """
+        Args:
+            model_path: Path to a .tflite flatbuffer (memory-mapped by the interpreter)
+            num_threads: Interpreter thread count (None = runtime default)
+        """
+        Interpreter = _get_tflite_interpreter_class()
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or None)
+        self.interpreter.allocate_tensors()
+
+        self._input_index = self.interpreter.get_input_details()[0]['index']
+        outputs = self.interpreter.get_output_details()
+        self._output_indices = [outputs[i]['index'] for i in _probabilities_first([int(o['shape'][-1]) for o in outputs])]
+        self._batch_size = 1
+
+        # The interpreter holds mutable tensor state, so calls must not overlap
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def model_filename(quantization):
+        """Cache file name for a given quantization mode"""
+        return f"mobilenet_v2_features_{quantization}.tflite"
+
+    @staticmethod
+    def convert(keras_model, output_path, quantization='float16'):
+        """
+        Convert a Keras model to TFLite and write it to output_path
+
+        Args:
+            keras_model: Loaded Keras model
+            output_path: Where to write the .tflite file
+            quantization: 'none' (float32), 'float16' or 'int8' (dynamic-range)
+        """
+        import tensorflow as tf
+
+        if quantization not in TFLITE_QUANTIZATIONS:
+            raise ValueError(f"Unknown TFLite quantization '{quantization}'. Use one of: {', '.join(TFLITE_QUANTIZATIONS)}")
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        if quantization == 'float16':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == 'int8':
+            # Dynamic-range quantization: int8 weights, float activations, no calibration set needed
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        tflite_model = converter.convert()
+
+        # Write then rename, so a second worker never loads a half-written file
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(tflite_model)
+        os.replace(tmp_path, output_path)
+
+        logger.info(f"✅ TFLite model ({quantization}) written to {output_path} "
+                    f"({len(tflite_model) / (1024 * 1024):.1f} MB)")
+
+    def predict_outputs(self, batch):
+        """
+        Run inference on a preprocessed batch
+
+        Args:
+            batch: Array of shape N x 224 x 224 x 3
+
+        Returns:
+            Tuple of (N x 1000 class probabilities, N x 1280 pooled features)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+
+            self.interpreter.set_tensor(self._input_index, batch)
+            self.interpreter.invoke()
+            return tuple(self.interpreter.get_tensor(index).copy() for index in self._output_indices)
+
+    def predict(self, batch, verbose=0):
+        """Class probabilities only (N x 1000); verbose is kept for Keras compatibility"""
+        return self.predict_outputs(batch)[0]
+
+    def describe(self):
+        """Short description for logs and health checks"""
+        size_mb = os.path.getsize(self.model_path) / (1024 * 1024)
+        return f"TFLite ({os.path.basename(self.model_path)}, {size_mb:.1f} MB)"
+
+
+class OnnxEngine:
+    """Serve an exported ONNX MobileNetV2 through onnxruntime's CPU provider"""
+
+    MODEL_FILENAME = 'mobilenet_v2_features.onnx'
+
+    def __init__(self, model_path, num_threads=None):
+        """
+        Args:
+            model_path: Path to a .onnx model
+            num_threads: Intra-op thread count (None = onnxruntime default)
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        self.model_path = model_path
+        # InferenceSession.run is thread-safe, so no lock is needed here
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self._input_name = self.session.get_inputs()[0].name
+        outputs = self.session.get_outputs()
+        self._output_names = [outputs[i].name for i in _probabilities_first([o.shape[-1] for o in outputs])]
+
+    @staticmethod
+    def export(keras_model, output_path, opset=13):
+        """
+        Export a Keras model to ONNX with a dynamic batch dimension
+
+        Args:
+            keras_model: Loaded Keras model
+            output_path: Where to write the .onnx file
+            opset: ONNX opset version
+        """
+        import tensorflow as tf
+        import tf2onnx
+
+        input_signature = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name='input'),)
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        tf2onnx.convert.from_keras(keras_model, input_signature=input_signature, opset=opset, output_path=tmp_path)
+        os.replace(tmp_path, output_path)
+
+        logger.info(f"✅ ONNX model written to {output_path} "
+                    f"({os.path.getsize(output_path) / (1024 * 1024):.1f} MB)")
+
+    def predict_outputs(self, batch):
+        """
+        Run inference on a preprocessed batch
+
+        Args:
+            batch: Array of shape N x 224 x 224 x 3
+
+        Returns:
+            Tuple of (N x 1000 class probabilities, N x 1280 pooled features)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        return tuple(self.session.run(self._output_names, {self._input_name: batch}))
+
+    def predict(self, batch, verbose=0):
+        """Class probabilities only (N x 1000); verbose is kept for Keras compatibility"""
+        return self.predict_outputs(batch)[0]
+
+    def describe(self):
+        """Short description for logs and health checks"""
+        size_mb = os.path.getsize(self.model_path) / (1024 * 1024)
+        return f"ONNX Runtime CPU ({os.path.basename(self.model_path)}, {size_mb:.1f} MB)"
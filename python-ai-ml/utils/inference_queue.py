@@ -0,0 +1,156 @@
+"""
+Dynamic micro-batching for model inference
+Collects concurrent prediction requests for a short window and runs them
+through the model as one batch, resolving each caller's future afterwards
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.metrics import QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueue:
+    """Batch concurrent predict calls into a single forward pass"""
+
+    def __init__(self, predict_fn, max_batch_size=16, window_ms=5.0):
+        """
+        Args:
+            predict_fn: Callable taking an N x H x W x C array and returning an N-row array,
+                or a tuple of N-row arrays (one per model output)
+            max_batch_size: Maximum number of images per forward pass
+            window_ms: How long to wait for more requests after the first one arrives
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+
+        self._requests = queue.Queue()
+        self._carry_over = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Simple counters for monitoring
+        self.batches_run = 0
+        self.images_run = 0
+        self.requests_run = 0
+        self.total_wait = 0.0
+
+    def _ensure_worker(self):
+        """Start the worker thread lazily (after any gunicorn fork)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._worker,
+                    name='inference-queue',
+                    daemon=True
+                )
+                self._thread.start()
+                logger.info(
+                    f"🧵 Inference queue started (window={self.window * 1000:.1f}ms, "
+                    f"max_batch={self.max_batch_size})"
+                )
+
+    def submit(self, batch):
+        """
+        Queue a preprocessed batch for inference
+
+        Args:
+            batch: Array of shape N x H x W x C (N is usually 1)
+
+        Returns:
+            Future resolving to the N x classes prediction array
+        """
+        self._ensure_worker()
+        future = Future()
+        self._requests.put((np.asarray(batch), future, time.perf_counter()))
+        return future
+
+    def predict(self, batch, timeout=None):
+        """Blocking helper: submit a batch and wait for its predictions"""
+        return self.submit(batch).result(timeout=timeout)
+
+    def _next_request(self, timeout=None):
+        """Get the next request, honouring one held back from the previous batch"""
+        if self._carry_over is not None:
+            item, self._carry_over = self._carry_over, None
+            return item
+        return self._requests.get(timeout=timeout)
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the window closes or the batch is full"""
+        first = self._next_request()
+        pending = [first]
+        rows = len(first[0])
+        deadline = time.perf_counter() + self.window
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._next_request(timeout=remaining)
+            except queue.Empty:
+                break
+            if rows + len(item[0]) > self.max_batch_size:
+                # Would overflow this batch - run it first thing next round
+                self._carry_over = item
+                break
+            pending.append(item)
+            rows += len(item[0])
+
+        return pending
+
+    def _worker(self):
+        """Worker loop: collect, run one forward pass, fan results back out"""
+        while True:
+            pending = self._collect_batch()
+            futures = [future for _, future, _ in pending]
+            started = time.perf_counter()
+            for _, _, enqueued in pending:
+                QUEUE_WAIT_SECONDS.observe(started - enqueued)
+
+            try:
+                batch = np.concatenate([array for array, _, _ in pending], axis=0)
+                predictions = self.predict_fn(batch)
+
+                offset = 0
+                for array, future, _ in pending:
+                    count = len(array)
+                    if isinstance(predictions, tuple):
+                        future.set_result(tuple(output[offset:offset + count] for output in predictions))
+                    else:
+                        future.set_result(predictions[offset:offset + count])
+                    offset += count
+
+                self.batches_run += 1
+                self.images_run += len(batch)
+                self.requests_run += len(pending)
+                self.total_wait += sum(started - enqueued for _, _, enqueued in pending)
+
+            except Exception as e:
+                logger.error(f"❌ Batched inference failed: {str(e)}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def get_stats(self):
+        """Get queue statistics for health/monitoring endpoints"""
+        return {
+            'window_ms': round(self.window * 1000, 2),
+            'max_batch_size': self.max_batch_size,
+            'pending_requests': self._requests.qsize(),
+            'batches_run': self.batches_run,
+            'requests_run': self.requests_run,
+            'images_run': self.images_run,
+            'avg_batch_size': round(self.images_run / self.batches_run, 2) if self.batches_run else 0.0,
+            'avg_queue_wait_ms': round(self.total_wait / self.requests_run * 1000, 3) if self.requests_run else 0.0
+        }
@@ -0,0 +1,361 @@
+"""
+Metrics in the Prometheus text exposition format
+Counters and histograms are kept in each process and rendered by GET
+/metrics. With METRICS_DIR set (gunicorn.conf.py sets it for its workers),
+every process writes its values to a file there and /metrics merges all
+files, so whichever worker answers the scrape reports the whole service.
+No client library needed.
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config.settings import Config
+
+# Latency buckets in seconds: sub-millisecond preprocessing up to slow first requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# Pipeline stages timed by observe_stage()
+STAGES = ('upload_read', 'decode', 'resize', 'preprocess', 'forward', 'decode_predictions', 'mapping')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Monotonically increasing value, optionally split by labels"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        self.on_change = None  # Set by the registry to schedule a flush to METRICS_DIR
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        if self.on_change is not None:
+            self.on_change()
+
+    def snapshot(self):
+        """Copy of the values, label values tuple -> value"""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into, values):
+        """Add another process's values into a snapshot"""
+        for key, value in values.items():
+            into[key] = into.get(key, 0.0) + value
+
+    def samples(self, values=None):
+        values = self.snapshot() if values is None else values
+        return [(self.name, key, (), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}  # label values -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+        self.on_change = None  # Set by the registry to schedule a flush to METRICS_DIR
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+        if self.on_change is not None:
+            self.on_change()
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Copy of the values, label values tuple -> [bucket counts..., sum]"""
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    @staticmethod
+    def merge(into, values):
+        """Add another process's values into a snapshot (same buckets)"""
+        for key, counts in values.items():
+            current = into.get(key)
+            into[key] = list(counts) if current is None else [a + b for a, b in zip(current, counts)]
+
+    def samples(self, values=None):
+        values = self.snapshot() if values is None else values
+        samples = []
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, (('le', _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, (), counts[-1]))
+            samples.append((f"{self.name}_count", key, (), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that report values other components already count"""
+
+    def __init__(self, directory=None, flush_seconds=5.0):
+        """
+        Args:
+            directory: Where each process writes its values for /metrics to merge
+                (None/'' = report this process only)
+            flush_seconds: Longest delay before a change reaches the directory
+        """
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.directory = directory or None
+        self.flush_seconds = flush_seconds
+        self._flush_timer = None
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            # A timer pending in the gunicorn master does not exist in its forked workers
+            os.register_at_fork(after_in_child=self._forget_flush_timer)
+            atexit.register(self.flush)
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            if self.directory:
+                metric.on_change = self._schedule_flush
+            return metric
+
+    def _forget_flush_timer(self):
+        self._flush_timer = None
+
+    def _schedule_flush(self):
+        """Write this process's values within flush_seconds of a change"""
+        if self._flush_timer is not None:
+            return
+        with self._lock:
+            if self._flush_timer is None:
+                timer = threading.Timer(self.flush_seconds, self.flush)
+                timer.daemon = True
+                self._flush_timer = timer
+                timer.start()
+
+    def _process_path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def flush(self):
+        """Write this process's metric and collector values to the shared directory (write then rename)"""
+        if not self.directory:
+            return
+        with self._lock:
+            self._flush_timer = None  # Changes from here on schedule the next flush
+            metrics = list(self._metrics.values())
+        state = {
+            'metrics': {
+                metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                for metric in metrics
+            },
+            'collected': self._collect()
+        }
+        path = self._process_path(os.getpid())
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            pass  # The next flush tries again; /metrics still reports this process
+
+    def _read_processes(self):
+        """{pid: state} of every process that wrote to the directory (including exited ones)"""
+        states = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                pid = int(os.path.splitext(os.path.basename(path))[0])
+                with open(path) as f:
+                    states[pid] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return states
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """
+        Add a callable that returns a list of (name, type, help, [(labels dict, value)])
+
+        Used for stats kept elsewhere (caches, queues) so they are not counted twice.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collect(self):
+        """Families reported by the collectors, as JSON-friendly lists"""
+        with self._lock:
+            collectors = list(self._collectors)
+        families = []
+        for collector in collectors:
+            try:
+                families.extend([name, type_name, documentation, [[dict(labels), value] for labels, value in samples]]
+                                for name, type_name, documentation, samples in collector())
+            except Exception:
+                continue  # A failing collector must not break the scrape
+        return families
+
+    def _merge_collected(self, states):
+        """
+        Collector families of all processes: counters summed per label set,
+        gauges reported per live process with a pid label
+        """
+        merged = {}
+        for pid, state in sorted(states.items()):
+            alive = _pid_alive(pid)
+            for name, type_name, documentation, samples in state.get('collected', []):
+                family = merged.setdefault(name, (type_name, documentation, {}))[2]
+                for labels, value in samples:
+                    if type_name == 'counter':
+                        key = tuple(sorted(labels.items()))
+                        family[key] = family.get(key, 0.0) + value
+                    elif alive:
+                        family[tuple(sorted(labels.items())) + (('pid', str(pid)),)] = value
+        return [
+            (name, type_name, documentation, [(dict(key), value) for key, value in samples.items()])
+            for name, (type_name, documentation, samples) in merged.items()
+        ]
+
+    def render(self):
+        """All metrics in the Prometheus text format (version 0.0.4), merged over METRICS_DIR if set"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        if self.directory:
+            self.flush()
+            states = self._read_processes()
+            families = self._merge_collected(states)
+        else:
+            states = None
+            families = self._collect()
+
+        for metric in metrics:
+            values = None
+            if states is not None:
+                values = {}
+                for state in states.values():
+                    stored = state.get('metrics', {}).get(metric.name, [])
+                    metric.merge(values, {tuple(key): value for key, value in stored})
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, key, extra, value in metric.samples(values):
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+
+        for name, type_name, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+# Global registry and the service's metrics
+registry = MetricsRegistry(Config.METRICS_DIR, Config.METRICS_FLUSH_SECONDS)
+
+STAGE_SECONDS = registry.histogram(
+    'petcare_stage_seconds',
+    'Time spent per image pipeline stage',
+    ['stage']
+)
+IDENTIFICATION_SECONDS = registry.histogram(
+    'petcare_identification_seconds',
+    'End-to-end identification time per service call',
+    ['module', 'outcome']
+)
+BATCH_SIZE = registry.histogram(
+    'petcare_forward_batch_size',
+    'Images per model forward pass',
+    buckets=BATCH_SIZE_BUCKETS
+)
+QUEUE_WAIT_SECONDS = registry.histogram(
+    'petcare_inference_queue_wait_seconds',
+    'Time a request waited in the micro-batching queue before its forward pass'
+)
+UPLOAD_BYTES = registry.counter(
+    'petcare_upload_bytes_total',
+    'Bytes of uploaded images read'
+)
+REQUEST_SECONDS = registry.histogram(
+    'petcare_http_request_seconds',
+    'HTTP request latency',
+    ['method', 'endpoint', 'status']
+)
+
+
+def observe_stage(stage):
+    """Time a with-block as one pipeline stage (see STAGES)"""
+    return STAGE_SECONDS.time(stage=stage)
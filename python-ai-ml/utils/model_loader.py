@@ -1,18 +1,40 @@
 """
 Model loading and management utilities
 """
-import tensorflow as tf
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.applications.mobilenet_v2 import decode_predictions
+import json
 import logging
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from config.settings import Config
+from utils.inference_queue import InferenceQueue
+from utils.inference_engines import TFLiteEngine, OnnxEngine
+from utils.image_processor import ImageProcessor
+from utils.result_cache import get_probability_cache
+from utils.metrics import observe_stage, STAGE_SECONDS, BATCH_SIZE
+from utils.pet_labels import PetLabelTable, SPECIES, UNKNOWN, DOG, UNKNOWN_AS_DOG_THRESHOLD
 
 logger = logging.getLogger(__name__)
 
+# TensorFlow is imported lazily so the TFLite/ONNX backends never pay its
+# import time or memory when a cached model file already exists
+CLASS_INDEX_FILENAME = 'imagenet_class_index.json'
+CLASS_INDEX_URL = 'https://storage.googleapis.com/download.tensorflow.org/data/imagenet_class_index.json'
+
 class ModelLoader:
     """Load and manage AI models"""
     
     _instance = None
     _model = None
+    _inference_queue = None
+    _forward_fn = None
+    _class_index = None
+    _label_table = None
+    _load_lock = threading.Lock()
+    _queue_lock = threading.Lock()
+    _latency = {'calls': 0, 'images': 0, 'total_ms': 0.0, 'last_ms': 0.0, 'max_ms': 0.0, 'warmup_ms': 0.0}
     
     def __new__(cls):
         """Singleton pattern to load model only once"""
@@ -34,32 +56,451 @@ class ModelLoader:
             logger.info("Using cached MobileNetV2 model")
             return self._model
         
+        # Startup initialization and early requests may race to load the model
+        with self._load_lock:
+            if self._model is None:
+                self._load_model(weights)
+        return self._model
+    
+    def _load_model(self, weights):
+        """Build the configured backend, then prepare and warm up its forward function"""
         try:
-            logger.info("Loading MobileNetV2 model...")
+            backend = self.get_backend()
+            logger.info(f"Loading MobileNetV2 model ({backend} backend)...")
             
-            # Load pre-trained MobileNetV2
-            self._model = MobileNetV2(
-                weights=weights,
-                include_top=True,
-                input_shape=(224, 224, 3)
-            )
+            if backend == 'tflite':
+                model = self._load_tflite_engine(weights)
+                logger.info(f"✅ MobileNetV2 loaded: {model.describe()}")
+            elif backend == 'onnx':
+                model = self._load_onnx_engine(weights)
+                logger.info(f"✅ MobileNetV2 loaded: {model.describe()}")
+            else:
+                # Load pre-trained MobileNetV2
+                model = self._build_keras_model(weights)
+                
+                logger.info("✅ MobileNetV2 model loaded successfully")
+                logger.info(f"Model size: ~14 MB")
+                logger.info(f"Parameters: {model.count_params():,}")
             
-            logger.info("✅ MobileNetV2 model loaded successfully")
-            logger.info(f"Model size: ~14 MB")
-            logger.info(f"Parameters: {self._model.count_params():,}")
+            self._forward_fn = self._build_forward_fn(model)
+            self.warmup()
             
-            return self._model
+            # Build the class -> species/breed table now rather than on the first request
+            try:
+                self.get_label_table()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not build the ImageNet label table yet: {str(e)}")
+            
+            # Publish the model last, so a non-None _model always means "ready to serve"
+            self._model = model
+            return model
             
         except Exception as e:
             logger.error(f"❌ Error loading model: {str(e)}")
             raise
     
+    @staticmethod
+    def get_backend():
+        """Resolve the serving backend from Config.MODEL_TYPE"""
+        model_type = Config.MODEL_TYPE.lower()
+        if 'tflite' in model_type:
+            return 'tflite'
+        if 'onnx' in model_type:
+            return 'onnx'
+        return 'keras'
+    
+    @classmethod
+    def cache_params(cls):
+        """
+        Serving settings that change a model output, for result/probability cache keys
+        
+        A disk cache tier outlives the process, so a restart on another backend,
+        quantization or decode mode must not be served the old results.
+        """
+        backend = cls.get_backend()
+        return {
+            'backend': backend,
+            'quantization': Config.TFLITE_QUANTIZATION if backend == 'tflite' else None,
+            'fast_decode': Config.FAST_DECODE
+        }
+    
+    @staticmethod
+    def _build_keras_model(weights='imagenet'):
+        """Build the full float32 Keras MobileNetV2"""
+        from tensorflow.keras.applications import MobileNetV2
+        
+        return MobileNetV2(
+            weights=weights,
+            include_top=True,
+            input_shape=(224, 224, 3)
+        )
+    
+    @staticmethod
+    def _with_features(model):
+        """
+        Two-output view of a Keras MobileNetV2 sharing its weights
+        
+        Outputs are the class probabilities and the 1280-d pooled features
+        (global average pooling, just before the classifier), so one forward
+        pass serves both identification and the embedding index.
+        """
+        import tensorflow as tf
+        
+        return tf.keras.Model(model.inputs, [model.output, model.layers[-2].output])
+    
+    def _load_tflite_engine(self, weights='imagenet'):
+        """
+        Load the cached TFLite model, converting it from Keras on first use
+        
+        The Keras model is only built when the cache file is missing and is
+        dropped right after conversion, so the worker keeps just the TFLite copy.
+        """
+        quantization = Config.TFLITE_QUANTIZATION
+        model_path = self.get_model_path()
+        
+        if not os.path.exists(model_path):
+            logger.info(f"No cached TFLite model at {model_path}, converting from Keras...")
+            keras_model = self._build_keras_model(weights)
+            TFLiteEngine.convert(self._with_features(keras_model), model_path, quantization)
+            del keras_model
+            self._clear_keras_session()
+        
+        return TFLiteEngine(model_path, num_threads=Config.INFERENCE_NUM_THREADS)
+    
+    def _load_onnx_engine(self, weights='imagenet'):
+        """
+        Load the cached ONNX model, exporting it from Keras on first use
+        
+        Once models/mobilenet_v2_features.onnx exists, TensorFlow is never imported
+        by this process.
+        """
+        model_path = self.get_model_path()
+        
+        if not os.path.exists(model_path):
+            logger.info(f"No cached ONNX model at {model_path}, exporting from Keras...")
+            keras_model = self._build_keras_model(weights)
+            OnnxEngine.export(self._with_features(keras_model), model_path)
+            del keras_model
+            self._clear_keras_session()
+        
+        return OnnxEngine(model_path, num_threads=Config.INFERENCE_NUM_THREADS)
+    
+    @staticmethod
+    def _clear_keras_session():
+        """Free the graph state left behind by a Keras model built only for conversion"""
+        import tensorflow as tf
+        
+        tf.keras.backend.clear_session()
+    
+    def get_model_path(self):
+        """Cached model file for the TFLite/ONNX backends (None for Keras)"""
+        backend = self.get_backend()
+        if backend == 'tflite':
+            return os.path.join(Config.MODELS_DIR, TFLiteEngine.model_filename(Config.TFLITE_QUANTIZATION))
+        if backend == 'onnx':
+            return os.path.join(Config.MODELS_DIR, OnnxEngine.MODEL_FILENAME)
+        return None
+    
+    def preload_model_file(self):
+        """
+        Read the cached TFLite/ONNX model file once so it sits in the page cache
+        
+        Meant for the gunicorn master with PRELOAD_MODELS. No runtime is built
+        (runtime thread pools do not survive fork) and no bytes are kept: each
+        worker loads the model from its path. The TFLite interpreter memory-maps
+        the file, so float32/int8 weights are shared page-cache pages; float16
+        weights are dequantized into every interpreter and onnxruntime copies
+        the initializers into every session, so those stay per worker.
+        
+        Returns:
+            True if the model file was read
+        """
+        model_path = self.get_model_path()
+        if model_path is None:
+            logger.warning("⚠️ PRELOAD_MODELS: the Keras backend is not fork-safe, "
+                           "each worker loads its own MobileNetV2 (use MobileNetV2-TFLite or -ONNX to share it)")
+            return False
+        if not os.path.exists(model_path):
+            logger.warning(f"⚠️ PRELOAD_MODELS: {model_path} not found yet, workers will create it on first load")
+            return False
+        
+        size = 0
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                size += len(chunk)
+        logger.info(f"📦 Preloaded {os.path.basename(model_path)} into the page cache ({size / (1024 * 1024):.1f} MB)")
+        return True
+    
     def get_model(self):
         """Get loaded model or load if not loaded"""
         if self._model is None:
             return self.load_mobilenet_v2()
         return self._model
     
+    @staticmethod
+    def _build_forward_fn(model):
+        """
+        Build the callable used for forward passes, according to Config.INFERENCE_MODE
+        
+        The callable returns (N x 1000 probabilities, N x 1280 pooled features).
+        'graph' traces the model once into a tf.function with a fixed
+        N x 224 x 224 x 3 float32 signature, so every call after warm-up
+        runs the compiled graph without Keras' predict-loop setup.
+        """
+        if hasattr(model, 'describe'):
+            # TFLite/ONNX engines already run a compiled graph
+            logger.info(f"Inference engine: {model.describe()}")
+            return model.predict_outputs
+        
+        import tensorflow as tf
+        
+        mode = Config.INFERENCE_MODE
+        model = ModelLoader._with_features(model)
+        
+        if mode == 'graph':
+            graph_fn = tf.function(
+                lambda x: model(x, training=False),
+                input_signature=[tf.TensorSpec(shape=(None, 224, 224, 3), dtype=tf.float32)]
+            )
+            forward = lambda batch: tuple(t.numpy() for t in graph_fn(tf.convert_to_tensor(batch, dtype=tf.float32)))
+        elif mode == 'direct':
+            forward = lambda batch: tuple(t.numpy() for t in model(batch, training=False))
+        else:
+            if mode != 'predict':
+                logger.warning(f"⚠️ Unknown INFERENCE_MODE '{mode}', falling back to 'predict'")
+            mode = 'predict'
+            forward = lambda batch: tuple(model.predict(batch, verbose=0))
+        
+        logger.info(f"Inference mode: {mode}")
+        return forward
+    
+    def warmup(self, batch_size=1):
+        """
+        Run a dummy batch through the model so graph tracing and memory
+        allocation happen at load time instead of on the first request
+        """
+        dummy = np.zeros((batch_size, 224, 224, 3), dtype=np.float32)
+        start = time.perf_counter()
+        self._forward_fn(dummy)
+        warmup_ms = (time.perf_counter() - start) * 1000
+        self._latency['warmup_ms'] = round(warmup_ms, 2)
+        logger.info(f"🔥 Model warmed up in {warmup_ms:.1f}ms")
+    
+    def _forward(self, batch):
+        """Run the forward function and record per-call latency; returns (probabilities, features)"""
+        if self._forward_fn is None:
+            self.get_model()
+        
+        start = time.perf_counter()
+        outputs = self._forward_fn(batch)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        stats = self._latency
+        stats['calls'] += 1
+        stats['images'] += len(batch)
+        stats['total_ms'] += elapsed_ms
+        stats['last_ms'] = elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        STAGE_SECONDS.observe(elapsed_ms / 1000, stage='forward')
+        BATCH_SIZE.observe(len(batch))
+        
+        return outputs
+    
+    def get_inference_stats(self):
+        """Per-call forward pass latency statistics"""
+        stats = self._latency
+        return {
+            'backend': self.get_backend(),
+            'mode': Config.INFERENCE_MODE if self.get_backend() == 'keras' else None,
+            'model_loaded': self._model is not None,
+            'calls': stats['calls'],
+            'images': stats['images'],
+            'avg_ms': round(stats['total_ms'] / stats['calls'], 3) if stats['calls'] else 0.0,
+            'last_ms': round(stats['last_ms'], 3),
+            'max_ms': round(stats['max_ms'], 3),
+            'warmup_ms': stats['warmup_ms']
+        }
+    
+    def predict_outputs(self, img_array):
+        """
+        Run a forward pass on a preprocessed batch
+        
+        When micro-batching is enabled the batch is queued and merged with
+        other concurrent requests into one model call; otherwise the forward
+        function is called directly.
+        
+        Args:
+            img_array: Preprocessed array of shape N x 224 x 224 x 3
+            
+        Returns:
+            Tuple of (N x 1000 class probabilities, N x 1280 pooled features)
+        """
+        inference_queue = self.get_inference_queue()
+        if inference_queue is not None:
+            return inference_queue.predict(img_array)
+        return self._forward(img_array)
+    
+    def predict(self, img_array):
+        """
+        Class probabilities for a preprocessed batch
+        
+        Args:
+            img_array: Preprocessed array of shape N x 224 x 224 x 3
+            
+        Returns:
+            Array of shape N x 1000 with class probabilities
+        """
+        return self.predict_outputs(img_array)[0]
+    
+    def embed(self, img_array):
+        """
+        Pooled MobileNetV2 features for a preprocessed batch
+        
+        Args:
+            img_array: Preprocessed array of shape N x 224 x 224 x 3
+            
+        Returns:
+            Array of shape N x 1280
+        """
+        return np.asarray(self.predict_outputs(img_array)[1], dtype=np.float32)
+    
+    def predict_image(self, image_source):
+        """
+        Class probabilities for a single image
+        
+        For uploaded bytes the raw vector is cached by content hash, so
+        identify-breed, identify-species, breed-suggestions and adoption
+        identify on the same photo share one forward pass.
+        
+        Args:
+            image_source: Image as bytes, file path, or file object
+            
+        Returns:
+            Array of shape (1000,) with class probabilities
+        """
+        return self._image_output(image_source, 0)
+    
+    def embed_image(self, image_source):
+        """
+        Pooled MobileNetV2 features for a single image (cached by content hash like predict_image)
+        
+        Args:
+            image_source: Image as bytes, file path, or file object
+            
+        Returns:
+            Array of shape (1280,)
+        """
+        return self._image_output(image_source, 1)
+    
+    def _image_output(self, image_source, output):
+        """
+        One output of a single-image forward pass (0 = probabilities, 1 = embedding)
+        
+        Both outputs of the pass are cached, so identifying a photo and then
+        indexing or searching with it runs the backbone once.
+        """
+        cache = get_probability_cache() if ImageProcessor.is_cacheable(image_source) else None
+        if cache is not None:
+            params = self.cache_params()
+            cache_keys = (cache.make_key(image_source, **params),
+                          cache.make_key(image_source, output='embedding', **params))
+            cached = cache.get(cache_keys[output])
+            if cached is not None:
+                return cached
+        
+        img_array = ImageProcessor.load_and_preprocess_image(image_source)
+        # Copy the rows so a cached vector does not keep a whole micro-batch alive
+        outputs = [np.array(batch_output[0], dtype=np.float32) for batch_output in self.predict_outputs(img_array)]
+        
+        if cache is not None:
+            for cache_key, value in zip(cache_keys, outputs):
+                cache.set(cache_key, value)
+        return outputs[output]
+    
+    def get_inference_queue(self):
+        """Get the shared micro-batching queue, or None if micro-batching is disabled"""
+        if not Config.ENABLE_MICRO_BATCHING:
+            return None
+        
+        if self._inference_queue is None:
+            self.get_model()
+            # Concurrent first requests must not each start a queue and worker thread
+            with self._queue_lock:
+                if self._inference_queue is None:
+                    if Config.BATCH_SIZE <= 1:
+                        logger.warning("⚠️ Micro-batching enabled but BATCH_SIZE is 1 - requests will not be merged")
+                    ModelLoader._inference_queue = InferenceQueue(
+                        self._forward,
+                        max_batch_size=Config.BATCH_SIZE,
+                        window_ms=Config.MICRO_BATCH_WINDOW_MS
+                    )
+        return self._inference_queue
+    
+    def get_batching_stats(self):
+        """Micro-batching statistics without forcing the model to load"""
+        if not Config.ENABLE_MICRO_BATCHING:
+            return {'enabled': False}
+        if self._inference_queue is None:
+            return {'enabled': True, 'started': False}
+        return {'enabled': True, 'started': True, **self._inference_queue.get_stats()}
+    
+    @classmethod
+    def get_class_index(cls):
+        """
+        Load the ImageNet class index (class number -> (wnid, name))
+        
+        The JSON is cached in Config.MODELS_DIR. It is copied from the Keras
+        cache when available, otherwise downloaded once.
+        """
+        if cls._class_index is not None:
+            return cls._class_index
+        
+        path = os.path.join(Config.MODELS_DIR, CLASS_INDEX_FILENAME)
+        if not os.path.exists(path):
+            os.makedirs(Config.MODELS_DIR, exist_ok=True)
+            keras_copy = os.path.join(os.path.expanduser('~'), '.keras', 'models', CLASS_INDEX_FILENAME)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            if os.path.exists(keras_copy):
+                shutil.copyfile(keras_copy, tmp_path)
+            else:
+                import requests
+                logger.info(f"Downloading ImageNet class index to {path}...")
+                response = requests.get(CLASS_INDEX_URL, timeout=30)
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    f.write(response.content)
+            os.replace(tmp_path, path)
+        
+        with open(path) as f:
+            raw = json.load(f)
+        ModelLoader._class_index = [tuple(raw[str(i)]) for i in range(len(raw))]
+        return cls._class_index
+    
+    @staticmethod
+    def decode_batch_predictions(predictions, top=5):
+        """
+        Decode a batch of model predictions, one entry per image
+        
+        Args:
+            predictions: Model output of shape (N, 1000)
+            top: Number of top predictions to return per image
+            
+        Returns:
+            List of N lists of (class_id, class_name, probability) tuples
+        """
+        try:
+            class_index = ModelLoader.get_class_index()
+            with observe_stage('decode_predictions'):
+                predictions = np.asarray(predictions)
+                top_indices = np.argsort(-predictions, axis=1)[:, :top]
+                return [
+                    [(*class_index[i], row[i]) for i in indices]
+                    for row, indices in zip(predictions, top_indices)
+                ]
+        except Exception as e:
+            logger.error(f"Error decoding batch predictions: {str(e)}")
+            return [[] for _ in range(len(predictions))]
+    
     @staticmethod
     def decode_predictions(predictions, top=5):
         """
@@ -72,12 +513,31 @@ class ModelLoader:
         Returns:
             List of (class_id, class_name, probability) tuples
         """
-        try:
-            decoded = decode_predictions(predictions, top=top)
-            return decoded[0]  # Return first batch
-        except Exception as e:
-            logger.error(f"Error decoding predictions: {str(e)}")
-            return []
+        decoded = ModelLoader.decode_batch_predictions(predictions, top=top)
+        return decoded[0] if decoded else []  # Return first batch
+    
+    @classmethod
+    def get_label_table(cls):
+        """Species/breed lookup table for every ImageNet class (built once)"""
+        if cls._label_table is None:
+            ModelLoader._label_table = PetLabelTable(cls.get_class_index())
+        return cls._label_table
+    
+    @classmethod
+    def species_probabilities(cls, probabilities):
+        """
+        Probability mass per species, summed over every ImageNet class of that species
+        
+        Args:
+            probabilities: Softmax output for one image, shape (1000,)
+            
+        Returns:
+            Dictionary of species name -> probability (includes 'Unknown')
+        """
+        table = cls.get_label_table()
+        with observe_stage('mapping'):
+            mass = table.species_mass(probabilities)
+            return {species: float(mass[i]) for i, species in enumerate(SPECIES)}
     
     @staticmethod
     def map_to_pet_info(predictions):
@@ -90,107 +550,23 @@ class ModelLoader:
         Returns:
             List of pet information dictionaries
         """
-        # ImageNet class mapping to pet species
-        dog_breeds = [
-            'golden_retriever', 'labrador_retriever', 'german_shepherd',
-            'beagle', 'bulldog', 'poodle', 'rottweiler', 'yorkshire_terrier',
-            'boxer', 'dachshund', 'siberian_husky', 'great_dane', 'doberman',
-            'shih-tzu', 'boston_bull', 'chihuahua', 'pug', 'pomeranian',
-            'saint_bernard', 'collie', 'malamute', 'chow', 'keeshond',
-            'samoyed', 'afghan_hound', 'basset', 'bloodhound', 'bluetick',
-            'borzoi', 'bouvier_des_flandres', 'briard', 'bull_mastiff',
-            'cairn', 'cardigan', 'chesapeake_bay_retriever', 'cocker_spaniel',
-            'border_collie', 'border_terrier', 'english_setter', 'english_springer',
-            'flat-coated_retriever', 'german_short-haired_pointer', 'gordon_setter',
-            'groenendael', 'ibizan_hound', 'irish_setter', 'irish_terrier',
-            'irish_water_spaniel', 'irish_wolfhound', 'italian_greyhound',
-            'japanese_spaniel', 'kelpie', 'kerry_blue_terrier', 'komondor',
-            'kuvasz', 'lakeland_terrier', 'leonberg', 'lhasa', 'maltese_dog',
-            'mexican_hairless', 'newfoundland', 'norfolk_terrier', 'norwegian_elkhound',
-            'norwich_terrier', 'old_english_sheepdog', 'otterhound', 'papillon',
-            'pekinese', 'pembroke', 'pomeranian', 'pug', 'redbone',
-            'rhodesian_ridgeback', 'saluki', 'schipperke', 'scotch_terrier',
-            'scottish_deerhound', 'sealyham_terrier', 'shetland_sheepdog',
-            'shih-tzu', 'silky_terrier', 'soft-coated_wheaten_terrier',
-            'staffordshire_bullterrier', 'sussex_spaniel', 'tibetan_mastiff',
-            'tibetan_terrier', 'toy_poodle', 'toy_terrier', 'vizsla',
-            'walker_hound', 'weimaraner', 'welsh_springer_spaniel',
-            'west_highland_white_terrier', 'whippet', 'wire-haired_fox_terrier',
-            'yorkshire_terrier'
-        ]
-        
-        cat_breeds = [
-            'tabby', 'tiger_cat', 'persian_cat', 'siamese_cat',
-            'egyptian_cat', 'cougar', 'lynx', 'leopard'
-        ]
-        
-        bird_species = [
-            'cock', 'hen', 'ostrich', 'brambling', 'goldfinch',
-            'house_finch', 'junco', 'indigo_bunting', 'robin',
-            'bulbul', 'jay', 'magpie', 'chickadee', 'water_ouzel',
-            'kite', 'bald_eagle', 'vulture', 'great_grey_owl',
-            'european_fire_salamander', 'common_newt', 'eft',
-            'spotted_salamander', 'axolotl', 'bullfrog', 'tree_frog',
-            'tailed_frog', 'loggerhead', 'leatherback_turtle',
-            'mud_turtle', 'terrapin', 'box_turtle', 'banded_gecko',
-            'common_iguana', 'american_chameleon', 'whiptail',
-            'agama', 'frilled_lizard', 'alligator_lizard',
-            'gila_monster', 'green_lizard', 'african_chameleon',
-            'komodo_dragon', 'african_crocodile', 'american_alligator',
-            'triceratops', 'thunder_snake', 'ringneck_snake',
-            'hognose_snake', 'green_snake', 'king_snake',
-            'garter_snake', 'water_snake', 'vine_snake',
-            'night_snake', 'boa_constrictor', 'rock_python',
-            'indian_cobra', 'green_mamba', 'sea_snake',
-            'horned_viper', 'diamondback', 'sidewinder'
-        ]
-        
+        table = ModelLoader.get_label_table()
         results = []
         
-        for pred in predictions:
-            class_id, class_name, probability = pred
-            
-            # Determine species with better logic
-            species = 'Unknown'
-            breed = class_name.replace('_', ' ').title()
-            
-            # Check if it's a dog breed
-            if class_name in dog_breeds:
-                species = 'Dog'
-            # Check if it's a cat breed
-            elif class_name in cat_breeds:
-                species = 'Cat'
-                if 'cat' in class_name.lower():
-                    breed = breed.replace(' Cat', '')
-            # Check if it's a bird
-            elif class_name in bird_species:
-                species = 'Bird'
-            # Fallback: Check for common keywords in the class name
-            else:
-                class_lower = class_name.lower()
-                # Dog-related keywords
-                if any(keyword in class_lower for keyword in ['dog', 'hound', 'terrier', 'retriever', 'shepherd', 'spaniel', 'poodle', 'bulldog', 'mastiff', 'collie']):
-                    species = 'Dog'
-                # Cat-related keywords
-                elif any(keyword in class_lower for keyword in ['cat', 'feline']):
-                    species = 'Cat'
-                    if 'cat' in class_name.lower():
-                        breed = breed.replace(' Cat', '')
-                # Bird-related keywords
-                elif any(keyword in class_lower for keyword in ['bird', 'parrot', 'eagle', 'owl', 'finch', 'sparrow']):
-                    species = 'Bird'
-                # If still unknown, try to infer from ImageNet class structure
-                # Most dog breeds in ImageNet don't have 'dog' in the name
-                # So if it's not explicitly a cat or bird, assume it's a dog
-                elif probability > 0.3:  # Only if confidence is reasonable
-                    species = 'Dog'  # Default to Dog for unknown high-confidence predictions
-            
-            results.append({
-                'breed': breed,
-                'species': species,
-                'confidence': float(probability),
-                'class_id': class_id,
-                'raw_class': class_name
-            })
+        with observe_stage('mapping'):
+            for class_id, class_name, probability in predictions:
+                species_id, breed = table.lookup(class_name)
+                
+                # Unknown high-confidence classes are reported as Dog (see pet_labels)
+                if species_id == UNKNOWN and probability > UNKNOWN_AS_DOG_THRESHOLD:
+                    species_id = DOG
+                
+                results.append({
+                    'breed': breed,
+                    'species': SPECIES[species_id],
+                    'confidence': float(probability),
+                    'class_id': class_id,
+                    'raw_class': class_name
+                })
         
         return results
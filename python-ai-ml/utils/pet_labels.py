@@ -0,0 +1,172 @@
+"""
+ImageNet class -> pet species/breed lookup table
+Built once from the class index, so mapping a prediction is an array lookup
+and species aggregation is a single numpy reduction over the softmax vector.
+Aggregation only counts classes that are explicitly listed (by index range
+or exact name); the keyword fallback only labels individual predictions.
+"""
+import numpy as np
+
+# Species ids used in PetLabelTable.species_ids
+SPECIES = ('Unknown', 'Dog', 'Cat', 'Bird')
+UNKNOWN, DOG, CAT, BIRD = range(len(SPECIES))
+
+# ImageNet class ids of every dog breed (Chihuahua .. Mexican_hairless),
+# domestic cat (tabby .. Egyptian_cat) and bird (cock .. great_grey_owl,
+# black_grouse .. black_swan, white_stork .. albatross); the class index is
+# fixed, so these ranges cover classes whose names match no rule below
+DOG_CLASS_IDS = range(151, 269)
+CAT_CLASS_IDS = range(281, 286)
+BIRD_CLASS_IDS = (range(7, 25), range(80, 101), range(127, 147))
+
+# ImageNet class mapping to pet species (lower-cased names)
+DOG_BREEDS = frozenset([
+    'golden_retriever', 'labrador_retriever', 'german_shepherd',
+    'beagle', 'bulldog', 'poodle', 'rottweiler', 'yorkshire_terrier',
+    'boxer', 'dachshund', 'siberian_husky', 'great_dane', 'doberman',
+    'shih-tzu', 'boston_bull', 'chihuahua', 'pug', 'pomeranian',
+    'saint_bernard', 'collie', 'malamute', 'chow', 'keeshond',
+    'samoyed', 'afghan_hound', 'basset', 'bloodhound', 'bluetick',
+    'borzoi', 'bouvier_des_flandres', 'briard', 'bull_mastiff',
+    'cairn', 'cardigan', 'chesapeake_bay_retriever', 'cocker_spaniel',
+    'border_collie', 'border_terrier', 'english_setter', 'english_springer',
+    'flat-coated_retriever', 'german_short-haired_pointer', 'gordon_setter',
+    'groenendael', 'ibizan_hound', 'irish_setter', 'irish_terrier',
+    'irish_water_spaniel', 'irish_wolfhound', 'italian_greyhound',
+    'japanese_spaniel', 'kelpie', 'kerry_blue_terrier', 'komondor',
+    'kuvasz', 'lakeland_terrier', 'leonberg', 'lhasa', 'maltese_dog',
+    'mexican_hairless', 'newfoundland', 'norfolk_terrier', 'norwegian_elkhound',
+    'norwich_terrier', 'old_english_sheepdog', 'otterhound', 'papillon',
+    'pekinese', 'pembroke', 'redbone',
+    'rhodesian_ridgeback', 'saluki', 'schipperke', 'scotch_terrier',
+    'scottish_deerhound', 'sealyham_terrier', 'shetland_sheepdog',
+    'silky_terrier', 'soft-coated_wheaten_terrier',
+    'staffordshire_bullterrier', 'sussex_spaniel', 'tibetan_mastiff',
+    'tibetan_terrier', 'toy_poodle', 'toy_terrier', 'vizsla',
+    'walker_hound', 'weimaraner', 'welsh_springer_spaniel',
+    'west_highland_white_terrier', 'whippet', 'wire-haired_fox_terrier'
+])
+
+CAT_BREEDS = frozenset([
+    'tabby', 'tiger_cat', 'persian_cat', 'siamese_cat',
+    'egyptian_cat', 'cougar', 'lynx', 'leopard'
+])
+
+BIRD_SPECIES = frozenset([
+    'cock', 'hen', 'ostrich', 'brambling', 'goldfinch',
+    'house_finch', 'junco', 'indigo_bunting', 'robin',
+    'bulbul', 'jay', 'magpie', 'chickadee', 'water_ouzel',
+    'kite', 'bald_eagle', 'vulture', 'great_grey_owl'
+])
+
+# Reptiles and amphibians: Unknown in the species distribution, but still
+# labelled Bird in individual predictions as before (API compatibility)
+LEGACY_BIRD_SPECIES = frozenset([
+    'european_fire_salamander', 'common_newt', 'eft',
+    'spotted_salamander', 'axolotl', 'bullfrog', 'tree_frog',
+    'tailed_frog', 'loggerhead', 'leatherback_turtle',
+    'mud_turtle', 'terrapin', 'box_turtle', 'banded_gecko',
+    'common_iguana', 'american_chameleon', 'whiptail',
+    'agama', 'frilled_lizard', 'alligator_lizard',
+    'gila_monster', 'green_lizard', 'african_chameleon',
+    'komodo_dragon', 'african_crocodile', 'american_alligator',
+    'triceratops', 'thunder_snake', 'ringneck_snake',
+    'hognose_snake', 'green_snake', 'king_snake',
+    'garter_snake', 'water_snake', 'vine_snake',
+    'night_snake', 'boa_constrictor', 'rock_python',
+    'indian_cobra', 'green_mamba', 'sea_snake',
+    'horned_viper', 'diamondback', 'sidewinder'
+])
+
+# Fallback keywords for class names not in the lists above (individual predictions
+# only: substrings also hit e.g. hotdog, catamaran or soup_bowl)
+DOG_KEYWORDS = ('dog', 'hound', 'terrier', 'retriever', 'shepherd', 'spaniel', 'poodle', 'bulldog', 'mastiff', 'collie')
+CAT_KEYWORDS = ('cat', 'feline')
+BIRD_KEYWORDS = ('bird', 'parrot', 'eagle', 'owl', 'finch', 'sparrow')
+
+# Unknown classes predicted above this probability are reported as Dog in breed
+# predictions: a safety net for class names looked up outside the class index
+UNKNOWN_AS_DOG_THRESHOLD = 0.3
+
+
+def classify_class_name(class_name, class_id=None, fallback=True):
+    """
+    Map one ImageNet class name to (species_id, display breed)
+
+    Args:
+        class_name: ImageNet class name (e.g. 'Great_Dane'), compared case-insensitively
+        class_id: Position of the class in the ImageNet index, if known
+        fallback: Also apply the keyword rules and LEGACY_BIRD_SPECIES (prediction
+            labels); without it only explicitly listed classes get a species
+
+    Returns:
+        Tuple of (species id, breed label); species is UNKNOWN when no rule matches
+    """
+    breed = class_name.replace('_', ' ').title()
+    class_lower = class_name.lower()
+
+    if class_id in DOG_CLASS_IDS or class_lower in DOG_BREEDS:
+        return DOG, breed
+    if class_id in CAT_CLASS_IDS or class_lower in CAT_BREEDS:
+        return CAT, breed.replace(' Cat', '') if 'cat' in class_lower else breed
+    if any(class_id in ids for ids in BIRD_CLASS_IDS) or class_lower in BIRD_SPECIES:
+        return BIRD, breed
+    if not fallback:
+        return UNKNOWN, breed
+
+    if class_lower in LEGACY_BIRD_SPECIES:
+        return BIRD, breed
+    if any(keyword in class_lower for keyword in DOG_KEYWORDS):
+        return DOG, breed
+    if any(keyword in class_lower for keyword in CAT_KEYWORDS):
+        return CAT, breed.replace(' Cat', '') if 'cat' in class_lower else breed
+    if any(keyword in class_lower for keyword in BIRD_KEYWORDS):
+        return BIRD, breed
+    return UNKNOWN, breed
+
+
+class PetLabelTable:
+    """Per-class species ids and breed labels for the whole ImageNet head"""
+
+    def __init__(self, class_index):
+        """
+        Args:
+            class_index: List of (wnid, class_name) tuples, indexed by class number
+        """
+        labels = [classify_class_name(class_name, i) for i, (_, class_name) in enumerate(class_index)]
+        listed = [classify_class_name(class_name, i, fallback=False)[0] for i, (_, class_name) in enumerate(class_index)]
+
+        self.class_index = class_index
+        # Species counted by species_mass: explicitly listed classes only
+        self.species_ids = np.array(listed, dtype=np.intp)
+        # Species of an individual prediction label (keyword fallback included)
+        self.label_species_ids = np.array([species for species, _ in labels], dtype=np.intp)
+        self.breed_labels = [breed for _, breed in labels]
+        # One-hot class -> species matrix for batched reductions
+        self._species_matrix = np.eye(len(SPECIES))[self.species_ids]
+        self._by_name = {class_name.lower(): i for i, (_, class_name) in enumerate(class_index)}
+
+    def __len__(self):
+        return len(self.species_ids)
+
+    def lookup(self, class_name):
+        """(species_id, breed) for a class name; names outside the index are classified on the fly"""
+        i = self._by_name.get(class_name.lower())
+        if i is None:
+            return classify_class_name(class_name)
+        return int(self.label_species_ids[i]), self.breed_labels[i]
+
+    def species_mass(self, probabilities):
+        """
+        Total probability assigned to each species
+
+        Args:
+            probabilities: Softmax output of shape (1000,) or (N, 1000)
+
+        Returns:
+            Array of shape (len(SPECIES),) or (N, len(SPECIES)), indexed by species id
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if probabilities.ndim == 1:
+            return np.bincount(self.species_ids, weights=probabilities, minlength=len(SPECIES))
+        return probabilities @ self._species_matrix
@@ -0,0 +1,233 @@
+"""
+Content-hash result cache for image identification
+Repeat uploads of the same photo (or backend retries) return the stored
+result instead of decoding the image and running inference again
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config.settings import Config
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Size-bounded LRU cache with per-entry TTL and an optional on-disk tier"""
+
+    def __init__(self, max_entries=512, ttl_seconds=3600, disk_dir=None):
+        """
+        Args:
+            max_entries: Maximum number of results kept in memory (LRU eviction)
+            ttl_seconds: How long a result stays valid (0 = no expiry)
+            disk_dir: Directory for the on-disk tier (None/'' = memory only)
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = max(0.0, float(ttl_seconds))
+        self.disk_dir = disk_dir or None
+
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image, **params):
+        """
+        Build a cache key from the image content and the request parameters
+
+        Args:
+            image: Raw uploaded image bytes, or an UploadedImage (hashed once per request)
+            **params: Parameters that change the result (e.g. top_k, module)
+
+        Returns:
+            Hex key string
+        """
+        content_digest = getattr(image, 'digest', None) or hashlib.sha256(image).hexdigest()
+        digest = hashlib.sha256(content_digest.encode())
+        for name in sorted(params):
+            digest.update(f"|{name}={params[name]}".encode())
+        return digest.hexdigest()
+
+    def _expired(self, stored_at):
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        Look up a result
+
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_set(key, value[1], stored_at=value[0])
+        return copy.deepcopy(value[1])
+
+    def set(self, key, value):
+        """Store a result under key (must be JSON-serialisable when the disk tier is on)"""
+        stored_at = time.time()
+        self._memory_set(key, copy.deepcopy(value), stored_at)
+        self._disk_set(key, value, stored_at)
+
+    def _memory_set(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(record['stored_at']):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record['stored_at'], record['value']
+
+    def _disk_set(self, key, value, stored_at):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'stored_at': stored_at, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Could not write result cache entry to disk: {str(e)}")
+
+    def clear(self):
+        """Drop all in-memory entries (the disk tier expires by TTL)"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Hit/miss counters for health/monitoring endpoints"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'enabled': True,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'disk_tier': bool(self.disk_dir),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+# Global instances
+_result_cache = None
+_probability_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """Get the shared identification result cache, or None if disabled"""
+    global _result_cache
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+                    ttl_seconds=Config.RESULT_CACHE_TTL_SECONDS,
+                    disk_dir=Config.RESULT_CACHE_DIR
+                )
+    return _result_cache
+
+
+def get_probability_cache():
+    """
+    Get the shared cache of raw 1000-class probability vectors, or None if disabled
+
+    Every view of an image (top-k breeds, species only, filtered suggestions,
+    adoption identify) is derived from the same vector, so one upload costs
+    one forward pass. Memory only: vectors are numpy arrays, not JSON.
+    """
+    global _probability_cache
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+    if _probability_cache is None:
+        with _result_cache_lock:
+            if _probability_cache is None:
+                _probability_cache = ResultCache(
+                    max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+                    ttl_seconds=Config.RESULT_CACHE_TTL_SECONDS
+                )
+    return _probability_cache
+
+
+def get_result_cache_stats():
+    """Cache statistics for /health"""
+    cache = get_result_cache()
+    if cache is None:
+        return {'enabled': False}
+    return {**cache.get_stats(), 'probabilities': get_probability_cache().get_stats()}
+
+
+def collect_cache_metrics():
+    """Hit/miss counters of both caches for /metrics"""
+    families = {
+        'petcare_cache_hits_total': ('counter', 'Cache lookups answered from memory or disk', []),
+        'petcare_cache_misses_total': ('counter', 'Cache lookups that missed', []),
+        'petcare_cache_hit_ratio': ('gauge', 'Fraction of cache lookups that hit since start', []),
+        'petcare_cache_entries': ('gauge', 'Entries held in memory', [])
+    }
+    for name, cache in (('result', _result_cache), ('probabilities', _probability_cache)):
+        if cache is None:
+            continue
+        stats = cache.get_stats()
+        labels = {'cache': name}
+        families['petcare_cache_hits_total'][2].append((labels, stats['hits'] + stats['disk_hits']))
+        families['petcare_cache_misses_total'][2].append((labels, stats['misses']))
+        families['petcare_cache_hit_ratio'][2].append((labels, stats['hit_rate']))
+        families['petcare_cache_entries'][2].append((labels, stats['entries']))
+    return [(name, type_name, documentation, samples) for name, (type_name, documentation, samples) in families.items()]
+
+
+registry.register_collector(collect_cache_metrics)
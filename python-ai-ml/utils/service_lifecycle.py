@@ -0,0 +1,170 @@
+"""
+Service startup lifecycle
+Loads and warms every model once per process (dev server or gunicorn worker)
+and tracks readiness so /health reports what is actually loaded
+"""
+import gc
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_state_lock = threading.Lock()
+_state = {
+    'status': 'not_started',  # not_started | starting | ready | degraded
+    'started_at': None,
+    'finished_at': None,
+    'components': {
+        'breed_model': 'pending',
+        'adoption_ml': 'pending',
+        'mongodb': 'pending'
+    },
+    'errors': {}
+}
+
+
+def _set_component(name, status, error=None):
+    with _state_lock:
+        _state['components'][name] = status
+        if error:
+            _state['errors'][name] = error
+
+
+def initialize_services(identifiers):
+    """
+    Load, warm up and verify everything the service needs before traffic
+
+    Args:
+        identifiers: Image identifiers exposing initialize() (they share one ModelLoader)
+
+    Returns:
+        Readiness dictionary (same shape as get_readiness())
+    """
+    with _state_lock:
+        already_started = _state['status'] != 'not_started'
+        if not already_started:
+            _state['status'] = 'starting'
+            _state['started_at'] = time.time()
+    if already_started:
+        return get_readiness()
+
+    logger.info("=" * 60)
+    logger.info("🤖 Initializing AI/ML services...")
+    logger.info("=" * 60)
+
+    # MobileNetV2: load + warm-up with a dummy batch (see ModelLoader.load_mobilenet_v2)
+    try:
+        for identifier in identifiers:
+            identifier.initialize()
+        _set_component('breed_model', 'ready')
+        logger.info("✅ Breed identification model loaded and warmed up")
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize breed model: {str(e)}")
+        logger.error("Model will load on first request")
+        _set_component('breed_model', 'failed', str(e))
+
+    # Adoption ML: loads persisted SVD/XGBoost/K-Means, trains only what is missing
+    try:
+        from modules.adoption.bootstrap_training import bootstrap_train_all_models
+        train_results = bootstrap_train_all_models()
+        trained = sum(1 for r in train_results.values() if r.get('trained', False))
+        logger.info(f"✅ Adoption ML: {trained}/3 algorithms active")
+        _set_component('adoption_ml', 'ready' if trained == len(train_results) else 'partial')
+    except Exception as e:
+        logger.error(f"❌ Adoption ML bootstrap failed: {str(e)}")
+        logger.error("Hybrid recommender will use content-based fallback")
+        _set_component('adoption_ml', 'failed', str(e))
+
+    # MongoDB is only needed by the recommendation routes, so it does not gate readiness
+    try:
+        from config.database import get_db
+        get_db()
+        _set_component('mongodb', 'ready')
+    except Exception as e:
+        logger.warning(f"⚠️ MongoDB connection failed: {str(e)}")
+        _set_component('mongodb', 'failed', str(e))
+
+    with _state_lock:
+        _state['finished_at'] = time.time()
+        model_ready = _state['components']['breed_model'] == 'ready'
+        _state['status'] = 'ready' if model_ready else 'degraded'
+        elapsed = _state['finished_at'] - _state['started_at']
+
+    logger.info(f"🚀 Service initialization finished in {elapsed:.1f}s ({_state['status']})")
+    return get_readiness()
+
+
+def preload_shared_models(model_loader):
+    """
+    Load model data in the gunicorn master before workers are forked
+
+    Only data is loaded here - no inference runtime and no training - because
+    TensorFlow, onnxruntime and OpenMP thread pools do not survive fork().
+    Workers inherit the adoption models copy-on-write (their large arrays are
+    memory-mapped) and build their own MobileNetV2 runtime in
+    initialize_services(); the breed model file is only read into the page cache.
+
+    Args:
+        model_loader: The shared ModelLoader
+    """
+    start = time.time()
+    logger.info("📦 Preloading model weights in the master process...")
+
+    try:
+        model_loader.preload_model_file()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not preload breed model: {str(e)}")
+
+    # Persisted SVD/XGBoost/K-Means models (the big SVD/K-Means arrays are memory-mapped)
+    try:
+        from modules.adoption.collaborative_filter import get_collaborative_filter
+        from modules.adoption.success_predictor import get_success_predictor
+        from modules.adoption.pet_clustering import get_pet_clusterer
+        get_collaborative_filter()
+        get_success_predictor()
+        get_pet_clusterer()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not preload adoption models: {str(e)}")
+
+    # Move everything loaded so far out of the GC's tracked generations, so
+    # collections in the workers do not write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"📦 Preload finished in {time.time() - start:.1f}s ({gc.get_freeze_count()} objects frozen)")
+
+
+def start_background_initialization(identifiers):
+    """
+    Run initialize_services in a daemon thread
+
+    Used from gunicorn worker hooks so a slow model download or bootstrap
+    training does not block the worker past its boot timeout; /health
+    answers 503 until the thread finishes.
+    """
+    thread = threading.Thread(
+        target=initialize_services,
+        args=(identifiers,),
+        name='service-init',
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def is_ready():
+    """True once the breed model is loaded and warmed up"""
+    return _state['status'] == 'ready'
+
+
+def get_readiness():
+    """Snapshot of the startup state for /health"""
+    with _state_lock:
+        started, finished = _state['started_at'], _state['finished_at']
+        return {
+            'ready': _state['status'] == 'ready',
+            'status': _state['status'],
+            'components': dict(_state['components']),
+            'errors': dict(_state['errors']),
+            'startup_seconds': round(finished - started, 2) if started and finished else None
+        }
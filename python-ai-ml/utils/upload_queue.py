@@ -0,0 +1,245 @@
+"""
+Background image upload queue
+Identification responds as soon as inference is done; the image upload
+(a third-party network round trip) runs on a small bounded thread pool with
+retry/backoff, and its outcome is polled through a job id
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class UploadQueueFull(Exception):
+    """Raised when the number of pending uploads has reached its bound"""
+
+
+class UploadQueue:
+    """Bounded pool of upload workers with per-job status tracking"""
+
+    def __init__(self, uploader, max_workers=2, max_pending=100, max_retries=3,
+                 backoff_seconds=1.0, job_ttl_seconds=3600, status_dir=None):
+        """
+        Args:
+            uploader: Object with upload(image_bytes, filename, metadata) that raises on failure
+            max_workers: Concurrent uploads
+            max_pending: Queued + running uploads accepted before submit() refuses new ones
+            max_retries: Retries after the first failed attempt
+            backoff_seconds: Base delay, doubled per retry (with jitter)
+            job_ttl_seconds: How long finished job statuses are kept
+            status_dir: Directory mirroring job statuses so any worker process can
+                answer a status request (None/'' = this process only)
+        """
+        self.uploader = uploader
+        self.max_pending = max(1, int(max_pending))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = max(0.0, float(backoff_seconds))
+        self.job_ttl = job_ttl_seconds
+        self.status_dir = status_dir or None
+
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix='upload')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+
+        if self.status_dir:
+            os.makedirs(self.status_dir, exist_ok=True)
+            self._sweep_status_dir()
+
+    def submit(self, image_bytes, filename, metadata=None):
+        """
+        Queue an upload
+
+        Returns:
+            Job id
+
+        Raises:
+            UploadQueueFull: max_pending uploads are already queued or running
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise UploadQueueFull(f"Upload queue is full ({self.max_pending} pending)")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'filename': filename,
+            'attempts': 0,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._persist(job)
+
+        future = self._executor.submit(self._run, job_id, image_bytes, filename, metadata)
+        with self._lock:
+            self._futures[job_id] = future
+        return job_id
+
+    def _run(self, job_id, image_bytes, filename, metadata):
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._update(job_id, status='uploading', attempts=attempt + 1)
+                try:
+                    result = self.uploader.upload(image_bytes, filename, metadata)
+                    self._update(job_id, status='done', result=result, error=None, finished_at=time.time())
+                    with self._lock:
+                        self.completed += 1
+                    return result
+                except Exception as e:
+                    self._update(job_id, error=str(e))
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    logger.warning(f"⚠️ Upload {job_id} failed (attempt {attempt + 1}), retrying in {delay:.1f}s: {str(e)}")
+                    with self._lock:
+                        self.retries += 1
+                    time.sleep(delay)
+        except Exception as e:
+            logger.error(f"❌ Upload {job_id} failed after {self.max_retries + 1} attempts: {str(e)}")
+            self._update(job_id, status='failed', finished_at=time.time())
+            with self._lock:
+                self.failed += 1
+        finally:
+            self._slots.release()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            snapshot = dict(job)
+        self._persist(snapshot)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.status_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        """Mirror a job status to status_dir (write then rename)"""
+        if not self.status_dir:
+            return
+        path = self._status_path(job['job_id'])
+        try:
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ Could not write upload job status: {str(e)}")
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl (called with the lock held)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in [job_id for job_id, future in self._futures.items() if future.done()]:
+            del self._futures[job_id]
+        for job_id in expired:
+            del self._jobs[job_id]
+            if self.status_dir:
+                try:
+                    os.remove(self._status_path(job_id))
+                except OSError:
+                    pass
+
+    def _sweep_status_dir(self):
+        """Remove status files older than job_ttl, e.g. left by a worker that has since exited"""
+        cutoff = time.time() - self.job_ttl
+        for name in os.listdir(self.status_dir):
+            path = os.path.join(self.status_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def get_job(self, job_id):
+        """
+        Status of an upload job
+
+        Returns:
+            Job dictionary (status: queued | uploading | done | failed), or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+
+        # Submitted to another worker process
+        if self.status_dir and all(c in '0123456789abcdef' for c in job_id):
+            try:
+                with open(self._status_path(job_id)) as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return None
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job submitted by this process finishes (or timeout), then return its status"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.get_job(job_id)
+
+    def get_stats(self):
+        """Queue counters for /health"""
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'uploading'))
+            return {
+                'uploader': type(self.uploader).__name__,
+                'pending': active,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'retries': self.retries
+            }
+
+
+# Global instance
+_upload_queue = None
+_upload_queue_lock = threading.Lock()
+
+def get_upload_queue(uploader):
+    """Get the shared upload queue, created around uploader on first use"""
+    global _upload_queue
+    if _upload_queue is None:
+        with _upload_queue_lock:
+            if _upload_queue is None:
+                _upload_queue = UploadQueue(
+                    uploader,
+                    max_workers=Config.UPLOAD_WORKERS,
+                    max_pending=Config.UPLOAD_MAX_PENDING,
+                    max_retries=Config.UPLOAD_MAX_RETRIES,
+                    backoff_seconds=Config.UPLOAD_BACKOFF_SECONDS,
+                    # Shared by default: the status request may reach another worker
+                    status_dir=Config.UPLOAD_STATUS_DIR or os.path.join(Config.UPLOAD_DIR, '.upload_status')
+                )
+    return _upload_queue